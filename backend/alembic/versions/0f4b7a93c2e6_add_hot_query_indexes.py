@@ -0,0 +1,40 @@
+"""add_hot_query_indexes
+
+Revision ID: 0f4b7a93c2e6
+Revises: e2a9c4d71b38
+Create Date: 2026-10-17 10:48:22.317460
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0f4b7a93c2e6'
+down_revision: Union[str, None] = 'e2a9c4d71b38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('idx_messages_channel_created_at', 'messages',
+                    ['channel_id', sa.text('created_at DESC')], unique=False)
+    op.create_index('idx_messages_user_created_at', 'messages',
+                    ['user_id', sa.text('created_at DESC')], unique=False)
+    op.create_index('idx_user_channels_channel_id', 'user_channels', ['channel_id'], unique=False)
+    op.create_index('idx_channel_roles_channel_user', 'channel_roles', ['channel_id', 'user_id'], unique=False)
+    op.create_index('idx_ai_conversations_channel_user_last_message', 'ai_conversations',
+                    ['channel_id', 'user_id', sa.text('last_message DESC')], unique=False)
+    op.create_index('idx_ai_messages_conversation_created_at', 'ai_messages',
+                    ['conversation_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_ai_messages_conversation_created_at', table_name='ai_messages')
+    op.drop_index('idx_ai_conversations_channel_user_last_message', table_name='ai_conversations')
+    op.drop_index('idx_channel_roles_channel_user', table_name='channel_roles')
+    op.drop_index('idx_user_channels_channel_id', table_name='user_channels')
+    op.drop_index('idx_messages_user_created_at', table_name='messages')
+    op.drop_index('idx_messages_channel_created_at', table_name='messages')
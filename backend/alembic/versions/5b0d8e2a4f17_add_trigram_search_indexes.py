@@ -0,0 +1,39 @@
+"""add_trigram_search_indexes
+
+Revision ID: 5b0d8e2a4f17
+Revises: c3e1f07b9d52
+Create Date: 2026-10-16 14:26:48.530912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b0d8e2a4f17'
+down_revision: Union[str, None] = 'c3e1f07b9d52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGRAM_INDEXES = [
+    ('idx_users_name_trgm', 'users', 'name'),
+    ('idx_users_email_trgm', 'users', 'email'),
+    ('idx_channels_name_trgm', 'channels', 'name'),
+    ('idx_channels_description_trgm', 'channels', 'description'),
+    ('idx_file_uploads_file_name_trgm', 'file_uploads', 'file_name'),
+]
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for index_name, table_name, column_name in TRIGRAM_INDEXES:
+        op.create_index(index_name, table_name, [column_name], unique=False,
+                        postgresql_using='gin', postgresql_ops={column_name: 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    for index_name, table_name, _ in reversed(TRIGRAM_INDEXES):
+        op.drop_index(index_name, table_name=table_name, postgresql_using='gin')
+    # pg_trgm is left installed; other objects may depend on it
@@ -0,0 +1,50 @@
+"""add_message_thread_columns
+
+Revision ID: 6d3f2b8e91a4
+Revises: 0f4b7a93c2e6
+Create Date: 2026-10-17 12:05:51.782093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d3f2b8e91a4'
+down_revision: Union[str, None] = '0f4b7a93c2e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('thread_root_id', sa.Integer(), nullable=True))
+    op.add_column('messages', sa.Column('thread_position', sa.Integer(), nullable=True))
+    op.create_foreign_key('messages_thread_root_id_fkey', 'messages', 'messages', ['thread_root_id'], ['id'])
+
+    # Walk every existing parent_id chain once from its root
+    op.execute("""
+        WITH RECURSIVE chain AS (
+            SELECT id, id AS root_id, 0 AS position
+            FROM messages
+            WHERE parent_id IS NULL
+            UNION ALL
+            SELECT m.id, chain.root_id, chain.position + 1
+            FROM messages m
+            JOIN chain ON m.parent_id = chain.id
+        )
+        UPDATE messages
+        SET thread_root_id = chain.root_id, thread_position = chain.position
+        FROM chain
+        WHERE messages.id = chain.id AND chain.position > 0
+    """)
+
+    op.create_unique_constraint('unique_thread_position', 'messages', ['thread_root_id', 'thread_position'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('unique_thread_position', 'messages', type_='unique')
+    op.drop_constraint('messages_thread_root_id_fkey', 'messages', type_='foreignkey')
+    op.drop_column('messages', 'thread_position')
+    op.drop_column('messages', 'thread_root_id')
@@ -0,0 +1,40 @@
+"""add_embedding_outbox
+
+Revision ID: 7e6e644c4b41
+Revises: bd2a85d1cd26
+Create Date: 2026-10-16 10:12:41.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e6e644c4b41'
+down_revision: Union[str, None] = 'bd2a85d1cd26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('embedding_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('message_id', sa.Integer(), nullable=False),
+    sa.Column('operation', sa.String(length=16), nullable=False),
+    sa.Column('vector_id', sa.String(length=36), nullable=True),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_embedding_outbox_id'), 'embedding_outbox', ['id'], unique=False)
+    op.create_index('idx_embedding_outbox_next_attempt_at', 'embedding_outbox', ['next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_embedding_outbox_next_attempt_at', table_name='embedding_outbox')
+    op.drop_index(op.f('ix_embedding_outbox_id'), table_name='embedding_outbox')
+    op.drop_table('embedding_outbox')
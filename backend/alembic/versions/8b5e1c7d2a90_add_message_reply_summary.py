@@ -0,0 +1,40 @@
+"""add_message_reply_summary
+
+Revision ID: 8b5e1c7d2a90
+Revises: 6d3f2b8e91a4
+Create Date: 2026-10-17 13:20:14.958301
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b5e1c7d2a90'
+down_revision: Union[str, None] = '6d3f2b8e91a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('reply_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('messages', sa.Column('last_reply_at', sa.DateTime(timezone=True), nullable=True))
+
+    op.execute("""
+        UPDATE messages
+        SET reply_count = threads.reply_count, last_reply_at = threads.last_reply_at
+        FROM (
+            SELECT thread_root_id, count(*) AS reply_count, max(created_at) AS last_reply_at
+            FROM messages
+            WHERE thread_root_id IS NOT NULL
+            GROUP BY thread_root_id
+        ) AS threads
+        WHERE messages.id = threads.thread_root_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('messages', 'last_reply_at')
+    op.drop_column('messages', 'reply_count')
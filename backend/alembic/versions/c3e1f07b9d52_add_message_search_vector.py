@@ -0,0 +1,35 @@
+"""add_message_search_vector
+
+Revision ID: c3e1f07b9d52
+Revises: a7c75bc6602e
+Create Date: 2026-10-16 13:41:09.215774
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e1f07b9d52'
+down_revision: Union[str, None] = 'a7c75bc6602e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Stored generated column: Postgres fills it for existing rows and keeps it in
+    # step with content on every insert and update
+    op.add_column('messages', sa.Column(
+        'content_tsv',
+        postgresql.TSVECTOR(),
+        sa.Computed("to_tsvector('english', coalesce(content, ''))", persisted=True),
+        nullable=True
+    ))
+    op.create_index('idx_messages_content_tsv', 'messages', ['content_tsv'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('idx_messages_content_tsv', table_name='messages', postgresql_using='gin')
+    op.drop_column('messages', 'content_tsv')
@@ -0,0 +1,27 @@
+"""add_channel_history_index
+
+Revision ID: e2a9c4d71b38
+Revises: 5b0d8e2a4f17
+Create Date: 2026-10-17 09:12:35.604218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a9c4d71b38'
+down_revision: Union[str, None] = '5b0d8e2a4f17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('idx_messages_channel_parent_created_at', 'messages',
+                    ['channel_id', 'parent_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_messages_channel_parent_created_at', table_name='messages')
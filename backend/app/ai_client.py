@@ -0,0 +1,107 @@
+"""Non-blocking OpenAI client.
+
+Request handlers and the websocket loop share one event loop, so every model round trip
+made from async code goes through here. Requests are bounded by a timeout and a
+concurrency limit so a burst of slow AI requests queues up instead of exhausting
+sockets. Vector index access lives in vector_store.py.
+"""
+import asyncio
+import os
+import logging
+from typing import AsyncIterator, Dict, List, Optional
+
+from openai import AsyncOpenAI
+from dotenv import load_dotenv
+
+from .embedding_cache import embedding_cache
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+# Environment variables
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+CHAT_MODEL = "gpt-4o-mini-2024-07-18"
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Seconds to wait for a single OpenAI request, and how often the client retries it
+AI_REQUEST_TIMEOUT = float(os.getenv('AI_REQUEST_TIMEOUT', '30'))
+AI_MAX_RETRIES = int(os.getenv('AI_MAX_RETRIES', '2'))
+# Concurrent OpenAI requests per worker; the rest wait their turn
+AI_MAX_CONCURRENT_REQUESTS = int(os.getenv('AI_MAX_CONCURRENT_REQUESTS', '10'))
+
+class AsyncAIClient:
+    """Async OpenAI chat and embedding calls with a per-worker concurrency limit"""
+    def __init__(self, api_key: Optional[str] = OPENAI_API_KEY):
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            timeout=AI_REQUEST_TIMEOUT,
+            max_retries=AI_MAX_RETRIES
+        )
+        self._semaphore = asyncio.Semaphore(AI_MAX_CONCURRENT_REQUESTS)
+
+    async def chat(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = CHAT_MODEL,
+        temperature: float = 0.7,
+        max_tokens: int = 200
+    ) -> str:
+        """Run a chat completion and return the text of the first choice"""
+        async with self._semaphore:
+            completion = await self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        return completion.choices[0].message.content
+
+    async def chat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = CHAT_MODEL,
+        temperature: float = 0.7,
+        max_tokens: int = 200
+    ) -> AsyncIterator[str]:
+        """Run a streaming chat completion, yielding the text of the first choice as it arrives.
+
+        The concurrency slot is held until the stream finishes or the caller stops iterating.
+        """
+        async with self._semaphore:
+            stream = await self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                await stream.close()
+
+    async def embed(self, text: str, model: str = EMBEDDING_MODEL) -> List[float]:
+        """Generate the embedding for a single text"""
+        return (await self.embed_many([text], model=model))[0]
+
+    async def embed_many(self, texts: List[str], model: str = EMBEDDING_MODEL) -> List[List[float]]:
+        """Generate embeddings for several texts in input order.
+
+        Cached texts are served from the embedding cache; the rest are embedded in one request.
+        """
+        cached = await embedding_cache.get_many_async(texts, model)
+        missing = list(dict.fromkeys(text for text, embedding in zip(texts, cached) if embedding is None))
+        fresh = {}
+        if missing:
+            async with self._semaphore:
+                response = await self.client.embeddings.create(input=missing, model=model)
+            ordered = sorted(response.data, key=lambda item: item.index)
+            fresh = {text: item.embedding for text, item in zip(missing, ordered)}
+            await embedding_cache.put_many_async(fresh, model)
+        return [embedding if embedding is not None else fresh[text] for text, embedding in zip(texts, cached)]
+
+# Create a singleton instance
+ai_client = AsyncAIClient()
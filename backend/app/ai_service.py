@@ -1,37 +1,34 @@
 import os
 import logging
-from pinecone import Pinecone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from openai import OpenAI
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
 
 from .models import Message, User
 from .crud.channels import get_common_channels
 from .crud.messages import get_channel_messages
+from .ai_client import ai_client
+from .vector_store import vector_store
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 # Environment variables
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-INDEX_NAME = os.getenv("PINECONE_INDEX")
-# Initialize OpenAI
+# Sync OpenAI client, only for work that already runs off the event loop (persona profiles)
 openai_client = OpenAI(api_key=OPENAI_API_KEY)
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(INDEX_NAME)
 
-def retrieve_vector_results(prompt: str, user_id: int = None, channel_ids: list[int] = [], num_results: int = 10, trigger_message_id: int = None):
+AI_UNAVAILABLE_MESSAGE = "The AI is currently experiencing technical difficulties. Please try again later."
+
+async def retrieve_vector_results(prompt: str, user_id: int = None, channel_ids: list[int] = [], num_results: int = 10, trigger_message_id: int = None):
     """
     Retrieves vector search results from Pinecone based on prompt embedding.
     """
     try:
         # Get embeddings for the prompt
-        response = openai_client.embeddings.create(
-            input=prompt,
-            model="text-embedding-3-small"
-        )
-        query_embedding = response.data[0].embedding
+        query_embedding = await ai_client.embed(prompt)
 
         # Build filter dict
         filter_dict = {}
@@ -43,7 +40,7 @@ def retrieve_vector_results(prompt: str, user_id: int = None, channel_ids: list[
             filter_dict["message_id"] = {"$ne": trigger_message_id}
 
         # Search Pinecone index
-        search_results = index.query(
+        search_results = await vector_store.query(
             vector=query_embedding,
             top_k=num_results,
             include_metadata=True,
@@ -56,101 +53,138 @@ def retrieve_vector_results(prompt: str, user_id: int = None, channel_ids: list[
         logger.error(f"Error retrieving vector results: {e}")
         return None
 
-def ai_query_response(prompt: str, channel_id: int=None, user_id: int=None, chat_history: list[dict]=None):
+async def _stream_chat(messages: List[Dict[str, str]], fallback: str) -> AsyncIterator[str]:
+    """Yield a completion's text as it streams, or `fallback` if it fails before any text arrives.
+
+    A failure after text has been yielded is re-raised, so callers never mistake a
+    truncated completion for a complete one.
+    """
+    started = False
+    try:
+        async for delta in ai_client.chat_stream(messages, temperature=0.7, max_tokens=200):
+            started = True
+            yield delta
+    except Exception as e:
+        logger.error(f"Error streaming AI response: {e}")
+        if started:
+            raise
+        yield fallback
+
+async def _query_prompt(prompt: str, channel_id: int = None, user_id: int = None, chat_history: list[dict] = None) -> Tuple[Optional[List[Dict[str, str]]], list]:
+    """Chat messages and search results for a RAG query; messages are None when retrieval failed"""
+    # Use retrieve_vector_results to get search results
+    channel_ids = [channel_id] if channel_id else []
+    search_results = await retrieve_vector_results(prompt, user_id, channel_ids)
+    if not search_results:
+        return None, []
+
+    # save the search results to a variable to pass back to the frontend
+    search_results_list = []
+    for match in search_results['matches']:
+        search_results_list.append(match['metadata'])
+
+    context = ""
+    for match in search_results['matches']:
+        if 'content' in match['metadata']:
+            channel = match['metadata']['channel_name']
+            user = match['metadata']['user_name']
+            content = match['metadata']['content']
+            context += f"In the {channel} channel, {user} said: {content}\n"
+
+    system_prompt = "You are a gossipy assistant at a company. Use the provided context to answer questions, but speculate about the company and its employees. Please keep your responses concise, but make sure to include any juicy details."
+    
+    # Build messages list starting with system prompt
+    messages = [{"role": "system", "content": system_prompt}]
+    
+    # Add chat history if provided
+    if chat_history:
+        messages.extend(chat_history)
+        
+    # Add current context and prompt
+    messages.append({"role": "user", "content": f"Context:\n{context}\n\nQuestion: {prompt}"})
+    
+    return messages, search_results_list
+
+async def ai_query_response(prompt: str, channel_id: int=None, user_id: int=None, chat_history: list[dict]=None):
     """
     This function takes a prompt and returns a response from the AI.
     It uses RAG to search for relevant messages.
     """
     try:
-        # Use retrieve_vector_results to get search results
-        channel_ids = [channel_id] if channel_id else []
-        search_results = retrieve_vector_results(prompt, user_id, channel_ids)
-        if not search_results:
-            return "The AI is currently experiencing technical difficulties. Please try again later.", []
-
-        # save the search results to a variable to pass back to the frontend
-        search_results_list = []
-        for match in search_results['matches']:
-            search_results_list.append(match['metadata'])
-
-        context = ""
-        for match in search_results['matches']:
-            if 'content' in match['metadata']:
-                channel = match['metadata']['channel_name']
-                user = match['metadata']['user_name']
-                content = match['metadata']['content']
-                context += f"In the {channel} channel, {user} said: {content}\n"
-
-        system_prompt = "You are a gossipy assistant at a company. Use the provided context to answer questions, but speculate about the company and its employees. Please keep your responses concise, but make sure to include any juicy details."
-        
-        # Build messages list starting with system prompt
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        # Add chat history if provided
-        if chat_history:
-            messages.extend(chat_history)
-            
-        # Add current context and prompt
-        messages.append({"role": "user", "content": f"Context:\n{context}\n\nQuestion: {prompt}"})
+        messages, search_results_list = await _query_prompt(prompt, channel_id, user_id, chat_history)
+        if messages is None:
+            return AI_UNAVAILABLE_MESSAGE, []
 
-        completion = openai_client.chat.completions.create(
-            model="gpt-4o-mini-2024-07-18",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=200
-        )
+        response = await ai_client.chat(messages, temperature=0.7, max_tokens=200)
 
-        return completion.choices[0].message.content, search_results_list
+        return response, search_results_list
 
     except Exception as e:
-        return "The AI is currently experiencing technical difficulties. Please try again later.", []
+        return AI_UNAVAILABLE_MESSAGE, []
 
-def dm_persona_response(db: Session, prompt: str, sender_id: int, receiver_id: int, channel_id: int, trigger_message_id: int):
-    """
-    This function takes a prompt and returns a response from the AI for DMs.
-    It uses RAG to search for relevant messages from channels both users share.
-    """
+async def ai_query_response_stream(prompt: str, channel_id: int = None, user_id: int = None, chat_history: list[dict] = None) -> AsyncIterator[str]:
+    """Streaming version of ai_query_response, yielding the answer as it is generated"""
     try:
-        # Get receiver's AI persona profile
-        receiver = db.query(User).filter(User.id == receiver_id).first()
-        
-        # get common channels between sender and receiver
-        common_channels = get_common_channels(db, sender_id, receiver_id)
-        common_channels_list = [channel.id for channel in common_channels]
-
-        # Use retrieve_vector_results to get search results
-        search_results = retrieve_vector_results(prompt, channel_ids=common_channels_list, trigger_message_id=trigger_message_id)
-        if not search_results:
-            return "The AI is currently experiencing technical difficulties. Please try again later.", []
+        messages, _ = await _query_prompt(prompt, channel_id, user_id, chat_history)
+    except Exception as e:
+        logger.error(f"Error building AI query prompt: {e}")
+        messages = None
+    if messages is None:
+        yield AI_UNAVAILABLE_MESSAGE
+        return
+    async for delta in _stream_chat(messages, AI_UNAVAILABLE_MESSAGE):
+        yield delta
+
+def _persona_context(db: Session, sender_id: int, receiver_id: int, channel_id: int) -> Tuple[Optional[str], List[int], List[Dict[str, str]]]:
+    """The database reads behind a DM persona reply: the receiver's persona profile, the
+    channels both users share and the DM's recent history in chat format"""
+    # Get receiver's AI persona profile
+    receiver = db.query(User).filter(User.id == receiver_id).first()
+    
+    # get common channels between sender and receiver
+    common_channels = get_common_channels(db, sender_id, receiver_id)
+    common_channels_list = [channel.id for channel in common_channels]
 
-        # Build context from search results
-        context = ""
-        search_results_list = []
-        for match in search_results['matches']:
-            search_results_list.append(match['metadata'])
-            if 'content' in match['metadata']:
-                user = match['metadata']['user_name']
-                content = match['metadata']['content']
-                channel = match['metadata']['channel_name']
-                context += f"In the {channel} channel, {user} said: {content}\n"
-
-        # Get the last 20 messages from the current DM channel
-        recent_messages = get_channel_messages(db, channel_id, skip=0, limit=20, include_reactions=False, parent_only=True)
-        
-        # Add recent messages to context
-        message_history = []
-        for message in reversed(recent_messages.messages):  # Reverse to show in chronological order
-            if message.user.id == sender_id:
-                message_history.append({"role": "user", "content": message.content})
-            else:
-                message_history.append({"role": "assistant", "content": message.content})
+    # Get the last 20 messages from the current DM channel
+    recent_messages = get_channel_messages(db, channel_id, skip=0, limit=20, include_reactions=False, parent_only=True, include_total=False)
     
-        # Determine which system prompt to use based on profile availability
-        if receiver and receiver.ai_persona_profile:
-            system_prompt = f"""You are an AI assistant mimicking the communication style, tone, personality, and expertise of a specific user in a direct message conversation.
+    # Add recent messages to context
+    message_history = []
+    for message in reversed(recent_messages.messages):  # Reverse to show in chronological order
+        if message.user.id == sender_id:
+            message_history.append({"role": "user", "content": message.content})
+        else:
+            message_history.append({"role": "assistant", "content": message.content})
+
+    return receiver.ai_persona_profile if receiver else None, common_channels_list, message_history
+
+async def _persona_prompt(db: AsyncSession, prompt: str, sender_id: int, receiver_id: int, channel_id: int, trigger_message_id: int) -> Tuple[Optional[List[Dict[str, str]]], list]:
+    """Chat messages and search results for a DM persona reply; messages are None when retrieval failed"""
+    # The database reads run through run_sync so they never block the event loop
+    persona_profile, common_channels_list, message_history = await db.run_sync(_persona_context, sender_id, receiver_id, channel_id)
+
+    # Use retrieve_vector_results to get search results
+    search_results = await retrieve_vector_results(prompt, channel_ids=common_channels_list, trigger_message_id=trigger_message_id)
+    if not search_results:
+        return None, []
+
+    # Build context from search results
+    context = ""
+    search_results_list = []
+    for match in search_results['matches']:
+        search_results_list.append(match['metadata'])
+        if 'content' in match['metadata']:
+            user = match['metadata']['user_name']
+            content = match['metadata']['content']
+            channel = match['metadata']['channel_name']
+            context += f"In the {channel} channel, {user} said: {content}\n"
+
+    # Determine which system prompt to use based on profile availability
+    if persona_profile:
+        system_prompt = f"""You are an AI assistant mimicking the communication style, tone, personality, and expertise of a specific user in a direct message conversation.
 
 Here is the detailed profile of the user you are mimicking:
-{receiver.ai_persona_profile}
+{persona_profile}
 
 Use this profile to inform your responses, matching their:
 1. Writing style and tone
@@ -164,9 +198,9 @@ While maintaining their style, ensure responses are:
 - Appropriate for a professional setting
 - Informed by the context of previous messages
 - Natural and consistent with the user's normal communication patterns"""
-        else:
-            system_prompt = """You are an AI assistant engaging in a direct message conversation. 
-            
+    else:
+        system_prompt = """You are an AI assistant engaging in a direct message conversation. 
+        
 Your responses should be:
 - Professional and courteous
 - Clear and concise
@@ -176,25 +210,31 @@ Your responses should be:
 - Based on the available context and message history
 
 Maintain a consistent, friendly professional tone while focusing on providing helpful and accurate responses."""
-        
-        # Generate response
-        messages = [
-            {"role": "system", "content": system_prompt},
-        ]
-        messages.extend(message_history)  # Add the message history between system and final user message
-        messages.append({"role": "user", "content": f"Context:\n{context}\n\nPrompt: {prompt}"})
-        
-        completion = openai_client.chat.completions.create(
-            model="gpt-4o-mini-2024-07-18",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=200
-        )
-
-        return completion.choices[0].message.content, search_results_list
+    
+    # Generate response
+    messages = [
+        {"role": "system", "content": system_prompt},
+    ]
+    messages.extend(message_history)  # Add the message history between system and final user message
+    messages.append({"role": "user", "content": f"Context:\n{context}\n\nPrompt: {prompt}"})
+    
+    return messages, search_results_list
 
+async def dm_persona_response_stream(db: AsyncSession, prompt: str, sender_id: int, receiver_id: int, channel_id: int, trigger_message_id: int) -> AsyncIterator[str]:
+    """
+    Stream a reply from the AI for DMs, yielding it as it is generated.
+    It uses RAG to search for relevant messages from channels both users share.
+    """
+    try:
+        messages, _ = await _persona_prompt(db, prompt, sender_id, receiver_id, channel_id, trigger_message_id)
     except Exception as e:
-        return f"The AI is currently experiencing technical difficulties: {str(e)}", []
+        logger.error(f"Error building DM persona prompt: {e}")
+        messages = None
+    if messages is None:
+        yield AI_UNAVAILABLE_MESSAGE
+        return
+    async for delta in _stream_chat(messages, AI_UNAVAILABLE_MESSAGE):
+        yield delta
 
 def generate_user_persona_profile(db: Session, user_id: int) -> str:
     """
@@ -252,26 +292,32 @@ def generate_user_persona_profile(db: Session, user_id: int) -> str:
         logger.error(f"Error generating user persona profile: {e}")
         return None 
     
-def summarize_messages(messages: list[Message]):
+def _summary_prompt(messages: list[Message]) -> List[Dict[str, str]]:
+    context = ""
+    for message in messages:
+        context += f"User: {message.user.name}\nMessage: {message.content}\n\n"
+
+    prompt = "Summarize the following messages. Identify any important tasks, events, or topics. Create a bulleted list of your summary:"
+    system_prompt = "You are a helpful assistant that summarizes messages. Keep things concise and to the point."
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Prompt: {prompt}\n\nMessages:\n{context}"}
+    ]
+
+async def summarize_messages(messages: list[Message]):
     """This function takes a list of messages and returns a summary of the messages.
     It is intended to be used by summarizing the messages in a channel, not look up with RAG"""
     try:
-        context = ""
-        for message in messages:
-            context += f"User: {message.user.name}\nMessage: {message.content}\n\n"
-
-        prompt = "Summarize the following messages. Identify any important tasks, events, or topics. Create a bulleted list of your summary:"
-        system_prompt = "You are a helpful assistant that summarizes messages. Keep things concise and to the point."
-
-        completion = openai_client.chat.completions.create(
-            model="gpt-4o-mini-2024-07-18", # Using GPT-4 since 4o mini not available
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Prompt: {prompt}\n\nMessages:\n{context}"}
-            ],
+        return await ai_client.chat(
+            _summary_prompt(messages),
             temperature=0.7,
             max_tokens=200
         )
-        return completion.choices[0].message.content
     except Exception as e:
-        return "The AI is currently experiencing technical difficulties. Please try again later."
\ No newline at end of file
+        return AI_UNAVAILABLE_MESSAGE
+
+async def summarize_messages_stream(messages: list[Message]) -> AsyncIterator[str]:
+    """Streaming version of summarize_messages, yielding the summary as it is generated"""
+    async for delta in _stream_chat(_summary_prompt(messages), AI_UNAVAILABLE_MESSAGE):
+        yield delta
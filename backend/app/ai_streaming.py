@@ -0,0 +1,59 @@
+"""Delivering streamed AI completions to clients.
+
+Completions arrive as many small text deltas. They are coalesced into chunks, flushed
+at most every AI_STREAM_FLUSH_SECONDS (or once AI_STREAM_FLUSH_CHARS have piled up),
+so a reply costs a handful of websocket broadcasts or SSE frames rather than one per
+token. The first delta is always flushed immediately, since time to first token is
+what users notice. Chat replies are broadcast as `ai_message_delta` events tagged with
+a stream id; the persisted message is then broadcast as `new_message` carrying the same
+stream id so clients can swap the partial text for the real message.
+"""
+import json
+import logging
+import os
+import time
+import uuid
+from typing import AsyncIterator
+
+from .events_manager import events
+
+logger = logging.getLogger(__name__)
+
+AI_STREAM_FLUSH_SECONDS = float(os.getenv('AI_STREAM_FLUSH_SECONDS', '0.1'))
+AI_STREAM_FLUSH_CHARS = int(os.getenv('AI_STREAM_FLUSH_CHARS', '200'))
+
+def new_stream_id() -> str:
+    return uuid.uuid4().hex
+
+async def coalesce(
+    deltas: AsyncIterator[str],
+    interval: float = AI_STREAM_FLUSH_SECONDS,
+    max_chars: int = AI_STREAM_FLUSH_CHARS
+) -> AsyncIterator[str]:
+    """Group consecutive deltas into chunks of at most `interval` seconds or `max_chars` characters"""
+    buffer = []
+    size = 0
+    last_flush = 0.0
+    async for delta in deltas:
+        buffer.append(delta)
+        size += len(delta)
+        now = time.monotonic()
+        if size >= max_chars or now - last_flush >= interval:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+            last_flush = now
+    if buffer:
+        yield "".join(buffer)
+
+async def stream_to_channel(deltas: AsyncIterator[str], channel_id: int, user_id: int, stream_id: str) -> str:
+    """Broadcast a completion to a channel as ai_message_delta events and return its full text"""
+    parts = []
+    async for chunk in coalesce(deltas):
+        parts.append(chunk)
+        await events.broadcast_ai_message_delta(channel_id, stream_id, user_id, chunk)
+    return "".join(parts)
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Events frame with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
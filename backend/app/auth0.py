@@ -4,11 +4,11 @@ from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt
 from jose.exceptions import JWTError
-import requests
-from functools import lru_cache
 from sqlalchemy.orm import Session
 from . import crud
 from .database import SessionLocal
+from .auth_cache import token_cache, user_cache
+from .jwks import JWKSManager, ALGORITHM
 from dotenv import load_dotenv
 import logging
 
@@ -25,17 +25,8 @@ if not AUTH0_DOMAIN or not AUTH0_API_IDENTIFIER:
 
 security = HTTPBearer()
 
-@lru_cache(maxsize=1)
-def get_auth0_public_key():
-    """Fetch and cache Auth0 public key for token verification"""
-    jwks_url = f"https://{AUTH0_DOMAIN}/.well-known/jwks.json"
-    try:
-        response = requests.get(jwks_url)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        logger.error(f"Error fetching Auth0 public key: {str(e)}")
-        raise
+# Create a singleton instance
+jwks_manager = JWKSManager(f"https://{AUTH0_DOMAIN}/.well-known/jwks.json")
 
 def get_db():
     db = SessionLocal()
@@ -45,24 +36,16 @@ def get_db():
         db.close()
 
 async def verify_token(token: str) -> dict:
-    """Verify the Auth0 token and return its payload"""
+    """Verify the Auth0 token and return its payload.
+    Payloads of tokens verified earlier are served from the token cache."""
+    payload = token_cache.get_payload(token)
+    if payload is not None:
+        return payload
     try:
-        jwks = get_auth0_public_key()
         unverified_header = jwt.get_unverified_header(token)
-        rsa_key = {}
-        
-        for key in jwks["keys"]:
-            if key["kid"] == unverified_header["kid"]:
-                rsa_key = {
-                    "kty": key["kty"],
-                    "kid": key["kid"],
-                    "use": key["use"],
-                    "n": key["n"],
-                    "e": key["e"]
-                }
-                break
+        rsa_key = await jwks_manager.get_key(unverified_header.get("kid"))
 
-        if not rsa_key:
+        if rsa_key is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Unable to find appropriate key",
@@ -72,12 +55,15 @@ async def verify_token(token: str) -> dict:
         payload = jwt.decode(
             token,
             rsa_key,
-            algorithms=["RS256"],
+            algorithms=[ALGORITHM],
             audience=AUTH0_API_IDENTIFIER,
             issuer=f"https://{AUTH0_DOMAIN}/"
         )
+        token_cache.put_payload(token, payload)
         return payload
 
+    except HTTPException:
+        raise
     except JWTError as e:
         logger.error(f"JWT Error during token verification: {str(e)}")
         raise HTTPException(
@@ -104,12 +90,15 @@ async def get_current_user(
         payload = await verify_token(token)
         auth0_id = payload["sub"]
         
-        user = crud.get_user_by_auth0_id(db, auth0_id)
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
-            )
+        user = user_cache.get_user(db, auth0_id)
+        if user is None:
+            user = crud.get_user_by_auth0_id(db, auth0_id)
+            if not user:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="User not found"
+                )
+            user_cache.put_user(user)
         
         return user
     except Exception as e:
@@ -0,0 +1,115 @@
+"""Caches that let get_current_user skip JWT verification and the user lookup.
+
+Verified token payloads are cached under a hash of the token until the token
+expires (capped by AUTH_TOKEN_CACHE_SECONDS), so a token is only RSA-verified
+once per worker. User rows are cached by auth0_id for a few seconds as detached
+snapshots; each request merges a snapshot into its own session without a query.
+The user CRUD functions invalidate the entry when they change a user, which
+covers this worker. Other workers pick the change up when their entry expires.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on how long a verified token is trusted without re-verifying
+AUTH_TOKEN_CACHE_SECONDS = float(os.getenv('AUTH_TOKEN_CACHE_SECONDS', '300'))
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '10000'))
+# How stale a user row may be on workers that didn't make the change
+AUTH_USER_CACHE_SECONDS = float(os.getenv('AUTH_USER_CACHE_SECONDS', '30'))
+AUTH_USER_CACHE_SIZE = int(os.getenv('AUTH_USER_CACHE_SIZE', '10000'))
+
+class ExpiringCache:
+    """Bounded LRU whose entries each carry their own expiry time"""
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value, ttl: float):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None
+        }
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+class TokenCache(ExpiringCache):
+    def __init__(self, max_size: int = AUTH_TOKEN_CACHE_SIZE, max_age: float = AUTH_TOKEN_CACHE_SECONDS):
+        super().__init__(max_size)
+        self.max_age = max_age
+
+    def get_payload(self, token: str) -> Optional[dict]:
+        return self.get(_token_key(token))
+
+    def put_payload(self, token: str, payload: dict):
+        """Cache a verified payload until the token's exp claim, at most max_age"""
+        ttl = self.max_age
+        if "exp" in payload:
+            ttl = min(ttl, payload["exp"] - time.time())
+        self.put(_token_key(token), payload, ttl)
+
+class UserCache(ExpiringCache):
+    def __init__(self, max_size: int = AUTH_USER_CACHE_SIZE, ttl: float = AUTH_USER_CACHE_SECONDS):
+        super().__init__(max_size)
+        self.ttl = ttl
+
+    def get_user(self, db: Session, auth0_id: str) -> Optional[User]:
+        """The cached user merged into `db` without loading it, or None on a miss"""
+        snapshot = self.get(auth0_id)
+        if snapshot is None:
+            return None
+        return db.merge(snapshot, load=False)
+
+    def put_user(self, user: User):
+        """Cache a detached copy of the user's column values"""
+        values = {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+        snapshot = User(**values)
+        make_transient_to_detached(snapshot)
+        self.put(user.auth0_id, snapshot, self.ttl)
+
+# Create singleton instances
+token_cache = TokenCache()
+user_cache = UserCache()
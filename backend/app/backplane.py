@@ -0,0 +1,208 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Handler invoked for every event on the bus: handler(event, origin_node_id)
+EventHandler = Callable[[dict, str], Awaitable[None]]
+
+BACKPLANE_CHANNEL = os.getenv('WEBSOCKET_BACKPLANE_CHANNEL', 'chatgenius_events')
+# NOTIFY payloads are capped at 8000 bytes; chunk well below that to leave room for JSON escaping
+NOTIFY_CHUNK_SIZE = 3500
+MAX_PARTIAL_EVENTS = 1000
+RECONNECT_DELAY_SECONDS = 2
+
+class Backplane(ABC):
+    """Shared event bus that fans channel events and presence changes out to every worker.
+
+    publish() delivers the event to the handler of every node on the bus, including this one.
+    """
+    def __init__(self):
+        self.node_id = str(uuid.uuid4())
+        self._handler: Optional[EventHandler] = None
+
+    def set_handler(self, handler: EventHandler):
+        self._handler = handler
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    async def publish(self, event: dict):
+        pass
+
+    async def _dispatch(self, event: dict, origin: str):
+        if self._handler is None:
+            return
+        try:
+            await self._handler(event, origin)
+        except Exception as e:
+            logger.error(f"Error handling backplane event {event.get('kind')}: {e}")
+
+class InProcessBackplane(Backplane):
+    """Single-worker backplane: events are delivered straight to the local handler"""
+    async def publish(self, event: dict):
+        await self._dispatch(event, self.node_id)
+
+class PostgresBackplane(Backplane):
+    """Multi-worker backplane on Postgres LISTEN/NOTIFY.
+
+    Events are delivered locally right away and NOTIFYed to the other workers, which skip
+    their own notifications. Payloads larger than a single NOTIFY are split into chunks
+    and reassembled by event id on the receiving side.
+    """
+    def __init__(self, dsn: str, channel: str = BACKPLANE_CHANNEL):
+        super().__init__()
+        # psycopg2 does not understand SQLAlchemy driver suffixes such as postgresql+psycopg2://
+        scheme, sep, rest = dsn.partition('://')
+        self.dsn = f"{scheme.split('+')[0]}{sep}{rest}"
+        self.channel = channel
+        self._listen_conn = None
+        self._publish_conn = None
+        self._publish_lock = threading.Lock()
+        self._inbound: asyncio.Queue = asyncio.Queue()
+        self._partials: "OrderedDict[str, Dict[int, str]]" = OrderedDict()
+        self._consumer_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+
+    def _connect(self):
+        import psycopg2
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        return conn
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopping = False
+        self._consumer_task = asyncio.create_task(self._consume())
+        await self._listen()
+        logger.info(f"Postgres backplane listening on '{self.channel}' as node {self.node_id}")
+
+    async def stop(self):
+        self._stopping = True
+        self._close_listener()
+        if self._consumer_task:
+            self._consumer_task.cancel()
+        if self._publish_conn is not None:
+            self._publish_conn.close()
+            self._publish_conn = None
+
+    async def _listen(self):
+        conn = await asyncio.to_thread(self._connect)
+        with conn.cursor() as cur:
+            cur.execute(f'LISTEN "{self.channel}"')
+        self._listen_conn = conn
+        self._loop.add_reader(conn.fileno(), self._on_readable)
+
+    def _close_listener(self):
+        if self._listen_conn is not None:
+            try:
+                self._loop.remove_reader(self._listen_conn.fileno())
+                self._listen_conn.close()
+            except Exception:
+                pass
+            self._listen_conn = None
+
+    async def _reconnect_listener(self):
+        self._close_listener()
+        while not self._stopping:
+            try:
+                await self._listen()
+                logger.info("Postgres backplane listener reconnected")
+                return
+            except Exception as e:
+                logger.error(f"Backplane listener reconnect failed: {e}")
+                await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+    def _on_readable(self):
+        try:
+            self._listen_conn.poll()
+        except Exception as e:
+            logger.error(f"Backplane listener connection lost: {e}")
+            asyncio.ensure_future(self._reconnect_listener())
+            return
+        while self._listen_conn.notifies:
+            notify = self._listen_conn.notifies.pop(0)
+            self._receive_frame(notify.payload)
+
+    def _receive_frame(self, raw: str):
+        try:
+            frame = json.loads(raw)
+        except ValueError:
+            logger.error("Dropping malformed backplane frame")
+            return
+        if frame["origin"] == self.node_id:
+            return
+
+        if frame["count"] == 1:
+            data = frame["data"]
+        else:
+            chunks = self._partials.setdefault(frame["id"], {})
+            chunks[frame["index"]] = frame["data"]
+            if len(chunks) < frame["count"]:
+                # Bound memory held by events whose remaining chunks never arrive
+                while len(self._partials) > MAX_PARTIAL_EVENTS:
+                    self._partials.popitem(last=False)
+                return
+            del self._partials[frame["id"]]
+            data = "".join(chunks[i] for i in range(frame["count"]))
+
+        self._inbound.put_nowait((json.loads(data), frame["origin"]))
+
+    async def _consume(self):
+        """Apply remote events one at a time so per-channel ordering is preserved"""
+        while True:
+            event, origin = await self._inbound.get()
+            await self._dispatch(event, origin)
+
+    def _encode_frames(self, event: dict) -> List[str]:
+        data = json.dumps(event)
+        chunks = [data[i:i + NOTIFY_CHUNK_SIZE] for i in range(0, len(data), NOTIFY_CHUNK_SIZE)] or [""]
+        event_id = str(uuid.uuid4())
+        return [
+            json.dumps({
+                "origin": self.node_id,
+                "id": event_id,
+                "index": index,
+                "count": len(chunks),
+                "data": chunk
+            })
+            for index, chunk in enumerate(chunks)
+        ]
+
+    def _notify(self, frames: List[str]):
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publish_conn is None or self._publish_conn.closed:
+                        self._publish_conn = self._connect()
+                    with self._publish_conn.cursor() as cur:
+                        for frame in frames:
+                            cur.execute("SELECT pg_notify(%s, %s)", (self.channel, frame))
+                    return
+                except Exception as e:
+                    logger.error(f"Backplane publish failed (attempt {attempt + 1}): {e}")
+                    self._publish_conn = None
+
+    async def publish(self, event: dict):
+        await self._dispatch(event, self.node_id)
+        await asyncio.to_thread(self._notify, self._encode_frames(event))
+
+def create_backplane() -> Backplane:
+    """Build the backplane selected by WEBSOCKET_BACKPLANE ('memory' or 'postgres')"""
+    kind = os.getenv('WEBSOCKET_BACKPLANE', 'memory').lower()
+    if kind == 'postgres':
+        from .database import DB_URL
+        return PostgresBackplane(DB_URL)
+    return InProcessBackplane()
@@ -0,0 +1,250 @@
+"""Bulk (re-)embedding of the messages table, used by the bulk_embed_* scripts.
+
+Messages are read in id order with keyset pagination (channel, user and files loaded
+in the same query) and handed to a pool of workers. Each worker embeds a whole page
+with one multi-input embeddings request and writes it with one index upsert, paced by
+token buckets for OpenAI's request and token limits. Progress is checkpointed to a
+JSON file as a watermark below which every page is done, so an interrupted run can
+resume where it stopped.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from .models import Message
+from .database import AsyncSessionLocal
+from .ai_client import ai_client
+from .vector_store import vector_store
+from .embedding_pipeline import build_embedding_job, EmbeddingJob
+
+logger = logging.getLogger(__name__)
+
+MISSING = 'missing'
+UPDATE = 'update'
+
+MAX_BATCH_ATTEMPTS = 4
+# Rough characters-per-token ratio for pacing against the tokens-per-minute limit
+CHARS_PER_TOKEN = 4
+
+class TokenBucket:
+    """Allows `rate` units per second on average with bursts of up to `capacity`"""
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+@dataclass
+class BulkEmbedStats:
+    started_at: float = field(default_factory=time.monotonic)
+    messages: int = 0
+    batches: int = 0
+    requests: int = 0
+    estimated_tokens: int = 0
+    retries: int = 0
+    failed_ids: List[int] = field(default_factory=list)
+
+    def report(self) -> str:
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        return (
+            f"{self.messages} messages in {elapsed:.1f}s ({self.messages / elapsed:.1f} msg/s), "
+            f"{self.batches} batches, {self.requests} embedding requests, "
+            f"~{self.estimated_tokens / elapsed * 60:.0f} tokens/min, "
+            f"{self.retries} retries, {len(self.failed_ids)} failed"
+        )
+
+class Checkpoint:
+    """Tracks the highest message id below which every page has finished.
+
+    Pages finish out of order across workers, so the watermark only moves past a page
+    once all earlier pages are done.
+    """
+    def __init__(self, path: Optional[str], mode: str):
+        self.path = path
+        self.mode = mode
+        self.last_id = 0
+        self.failed_ids: List[int] = []
+        self._pending: List[int] = []  # last ids of pages in flight, in read order
+        self._finished = set()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            data = json.load(f)
+        if data.get("mode") != self.mode:
+            raise ValueError(f"Checkpoint {self.path} was written by a '{data.get('mode')}' run")
+        self.last_id = data["last_id"]
+        self.failed_ids = data.get("failed_ids", [])
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"mode": self.mode, "last_id": self.last_id, "failed_ids": self.failed_ids}, f)
+        os.replace(tmp_path, self.path)
+
+    def page_started(self, page_last_id: int):
+        self._pending.append(page_last_id)
+
+    def page_finished(self, page_last_id: int):
+        self._finished.add(page_last_id)
+        advanced = False
+        while self._pending and self._pending[0] in self._finished:
+            self.last_id = self._pending.pop(0)
+            self._finished.discard(self.last_id)
+            advanced = True
+        if advanced:
+            self.save()
+
+def _load_page(db: Session, mode: str, after_id: int, limit: int) -> List[EmbeddingJob]:
+    """Next page of messages after `after_id` in id order"""
+    query = (db.query(Message)
+             .filter(Message.id > after_id, Message.from_ai == False)
+             .options(
+                 joinedload(Message.channel),
+                 joinedload(Message.user),
+                 selectinload(Message.files)
+             ))
+    if mode == MISSING:
+        query = query.filter(Message.vector_id.is_(None))
+    else:
+        query = query.filter(Message.vector_id.isnot(None))
+    return [build_embedding_job(message) for message in query.order_by(Message.id).limit(limit).all()]
+
+def _claim_vector_ids(db: Session, vector_ids: Dict[int, str]) -> List[str]:
+    """Store new vector ids on messages that still have none. Returns the vector ids
+    that lost the race (the live outbox drainer embedded the message first)."""
+    lost = []
+    for message_id, vector_id in vector_ids.items():
+        result = db.execute(
+            update(Message)
+            .where(Message.id == message_id, Message.vector_id.is_(None))
+            .values(vector_id=vector_id)
+        )
+        if result.rowcount == 0:
+            lost.append(vector_id)
+    db.commit()
+    return lost
+
+class BulkEmbedder:
+    def __init__(
+        self,
+        mode: str,
+        batch_size: int = 100,
+        workers: int = 4,
+        requests_per_minute: float = 3000,
+        tokens_per_minute: float = 1_000_000,
+        checkpoint_path: Optional[str] = None,
+        resume: bool = False,
+        report_interval: float = 10
+    ):
+        self.mode = mode
+        self.batch_size = batch_size
+        self.workers = workers
+        self.report_interval = report_interval
+        self.request_bucket = TokenBucket(requests_per_minute / 60, max(1, requests_per_minute / 60))
+        self.token_bucket = TokenBucket(tokens_per_minute / 60, max(1, tokens_per_minute / 60))
+        self.checkpoint = Checkpoint(checkpoint_path, mode)
+        if resume:
+            self.checkpoint.load()
+        self.stats = BulkEmbedStats()
+
+    async def run(self) -> BulkEmbedStats:
+        logger.info(f"Bulk embedding ({self.mode}) starting after message id {self.checkpoint.last_id}")
+        await vector_store.start()
+        pages: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 2)
+        workers = [asyncio.create_task(self._worker(pages)) for _ in range(self.workers)]
+        reporter = asyncio.create_task(self._report_progress())
+        try:
+            await self._read_pages(pages)
+            for _ in workers:
+                await pages.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            reporter.cancel()
+            for worker in workers:
+                worker.cancel()
+            await vector_store.stop()
+        self.checkpoint.failed_ids = sorted(set(self.checkpoint.failed_ids) | set(self.stats.failed_ids))
+        self.checkpoint.save()
+        logger.info(f"Bulk embedding ({self.mode}) complete: {self.stats.report()}")
+        return self.stats
+
+    async def _read_pages(self, pages: asyncio.Queue):
+        after_id = self.checkpoint.last_id
+        while True:
+            async with AsyncSessionLocal() as db:
+                jobs = await db.run_sync(_load_page, self.mode, after_id, self.batch_size)
+            if not jobs:
+                return
+            after_id = jobs[-1][0]
+            self.checkpoint.page_started(after_id)
+            await pages.put(jobs)
+
+    async def _worker(self, pages: asyncio.Queue):
+        while True:
+            jobs = await pages.get()
+            if jobs is None:
+                return
+            for attempt in range(1, MAX_BATCH_ATTEMPTS + 1):
+                try:
+                    await self._embed_page(jobs)
+                    self.stats.messages += len(jobs)
+                    self.stats.batches += 1
+                    break
+                except Exception as e:
+                    if attempt == MAX_BATCH_ATTEMPTS:
+                        logger.error(f"Giving up on messages {jobs[0][0]}-{jobs[-1][0]}: {e}")
+                        self.stats.failed_ids.extend(message_id for message_id, _, _, _ in jobs)
+                        break
+                    self.stats.retries += 1
+                    logger.warning(f"Retrying messages {jobs[0][0]}-{jobs[-1][0]} (attempt {attempt}): {e}")
+                    await asyncio.sleep(2 ** attempt)
+            self.checkpoint.page_finished(jobs[-1][0])
+
+    async def _embed_page(self, jobs: List[EmbeddingJob]):
+        texts = [text for _, _, text, _ in jobs]
+        tokens = sum(len(text) for text in texts) // CHARS_PER_TOKEN + 1
+        await self.request_bucket.acquire()
+        await self.token_bucket.acquire(tokens)
+        self.stats.requests += 1
+        self.stats.estimated_tokens += tokens
+        embeddings = await ai_client.embed_many(texts)
+
+        await vector_store.upsert(vectors=[
+            (vector_id, embedding, metadata)
+            for (_, vector_id, _, metadata), embedding in zip(jobs, embeddings)
+        ])
+
+        if self.mode == MISSING:
+            async with AsyncSessionLocal() as db:
+                lost = await db.run_sync(_claim_vector_ids, {message_id: vector_id for message_id, vector_id, _, _ in jobs})
+            if lost:
+                await vector_store.delete(ids=lost)
+
+    async def _report_progress(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            logger.info(f"Progress (checkpoint at message id {self.checkpoint.last_id}): {self.stats.report()}")
@@ -33,6 +33,7 @@ from .messages import (
     delete_message,
     get_channel_messages,
     get_message,
+    get_thread_root,
     find_last_reply_in_chain,
     create_reply,
     get_message_reply_chain,
@@ -41,6 +42,8 @@ from .messages import (
 from .reactions import (
     get_all_reactions,
     get_reaction,
+    get_reaction_summaries,
+    get_message_reactions,
     add_reaction_to_message,
     remove_reaction_from_message,
 )
@@ -4,7 +4,6 @@ from typing import List, Optional
 import logging
 
 from .. import models, schemas
-from ..ai_service import ai_query_response
 
 logger = logging.getLogger(__name__)
 
@@ -57,7 +56,10 @@ def create_conversation(
     user_id: int,
     initial_message: str
 ) -> models.AIConversation:
-    """Create a new AI conversation with initial message"""
+    """Create a new AI conversation with its initial user message.
+
+    The AI response is generated by the caller and saved with create_ai_message.
+    """
     # Create conversation
     conversation = models.AIConversation(
         channel_id=channel_id,
@@ -75,25 +77,7 @@ def create_conversation(
         message=initial_message
     )
     db.add(user_message)
-    db.commit()  # Commit immediately to get accurate timestamp
-    
-    # Get AI response after user message is committed
-    ai_response_message, search_results_list = ai_query_response(prompt=initial_message, channel_id=channel_id)
-    
-    # Create AI message with its own timestamp
-    ai_message = models.AIMessage(
-        conversation_id=conversation.id,
-        channel_id=channel_id,
-        user_id=user_id,
-        role='assistant',
-        message=ai_response_message
-    )
-    db.add(ai_message)
-    
-    # Update conversation last_message timestamp
-    conversation.last_message = ai_message.created_at
-    
-    db.commit()
+    db.commit()  # Commit immediately so the AI response gets a later timestamp
     db.refresh(conversation)
     return conversation
 
@@ -133,7 +117,10 @@ def add_message_to_conversation(
     user_id: int,
     message: str
 ) -> models.AIConversation:
-    """Add a new message to an existing conversation"""
+    """Add a new user message to an existing conversation.
+
+    The AI response is generated by the caller and saved with create_ai_message.
+    """
     # Add user message and commit immediately
     user_message = models.AIMessage(
         conversation_id=conversation_id,
@@ -145,41 +132,12 @@ def add_message_to_conversation(
     db.add(user_message)
     db.commit()
 
-    # Get conversation history
-    chat_history = []
+    return get_conversation(db, conversation_id, user_id)
+
+def get_chat_history(db: Session, conversation_id: int) -> List[dict]:
+    """Get the messages of a conversation in the role/content format used by the LLM"""
     previous_messages = (db.query(models.AIMessage)
                         .filter(models.AIMessage.conversation_id == conversation_id)
                         .order_by(models.AIMessage.created_at)
                         .all())
-    
-    for msg in previous_messages:
-        chat_history.append({
-            "role": msg.role,
-            "content": msg.message
-        })
-
-    # Get AI response with chat history context
-    ai_response_message, search_results_list = ai_query_response(
-        prompt=message, 
-        channel_id=channel_id,
-        chat_history=chat_history
-    )
-    
-    # Create AI message with its own timestamp
-    ai_message = models.AIMessage(
-        conversation_id=conversation_id,
-        channel_id=channel_id,
-        user_id=user_id,
-        message=ai_response_message,
-        role='assistant'
-    )
-    db.add(ai_message)
-    
-    # Update conversation last_message timestamp
-    conversation = get_conversation(db, conversation_id, user_id)
-    if conversation:
-        conversation.last_message = ai_message.created_at
-    
-    db.commit()
-    return conversation
-
+    return [{"role": msg.role, "content": msg.message} for msg in previous_messages]
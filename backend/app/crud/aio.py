@@ -0,0 +1,82 @@
+"""Async versions of the CRUD functions for use with an AsyncSession.
+
+Each function runs the matching sync CRUD function through AsyncSession.run_sync, so the
+queries go through asyncpg without blocking the event loop and the query logic lives in
+one place. Pass response_model to serialize the result inside the same greenlet: ORM
+objects returned to async code must not lazy-load relationships afterwards.
+"""
+import functools
+from typing import Any, Callable, Optional
+
+from pydantic import parse_obj_as
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import users, channels, messages, reactions, ai
+
+async def run_crud(db: AsyncSession, fn: Callable, *args, response_model: Optional[Any] = None, **kwargs):
+    """Run a sync CRUD function on an AsyncSession, optionally serializing its result"""
+    def call(session):
+        result = fn(session, *args, **kwargs)
+        if response_model is not None and result is not None:
+            return parse_obj_as(response_model, result)
+        return result
+    return await db.run_sync(call)
+
+def _async_version(fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    async def wrapper(db: AsyncSession, *args, response_model: Optional[Any] = None, **kwargs):
+        return await run_crud(db, fn, *args, response_model=response_model, **kwargs)
+    return wrapper
+
+# Users
+get_user = _async_version(users.get_user)
+get_user_by_email = _async_version(users.get_user_by_email)
+get_user_by_auth0_id = _async_version(users.get_user_by_auth0_id)
+get_users = _async_version(users.get_users)
+get_users_by_last_dm = _async_version(users.get_users_by_last_dm)
+sync_auth0_user = _async_version(users.sync_auth0_user)
+update_user_bio = _async_version(users.update_user_bio)
+update_user_name = _async_version(users.update_user_name)
+
+# Channels
+create_channel = _async_version(channels.create_channel)
+get_channel = _async_version(channels.get_channel)
+get_user_channels = _async_version(channels.get_user_channels)
+update_channel = _async_version(channels.update_channel)
+delete_channel = _async_version(channels.delete_channel)
+get_channel_members = _async_version(channels.get_channel_members)
+remove_channel_member = _async_version(channels.remove_channel_member)
+update_channel_privacy = _async_version(channels.update_channel_privacy)
+join_channel = _async_version(channels.join_channel)
+leave_channel = _async_version(channels.leave_channel)
+get_available_channels = _async_version(channels.get_available_channels)
+user_in_channel = _async_version(channels.user_in_channel)
+create_dm = _async_version(channels.create_dm)
+get_user_dms = _async_version(channels.get_user_dms)
+get_existing_dm_channel = _async_version(channels.get_existing_dm_channel)
+get_common_channels = _async_version(channels.get_common_channels)
+get_or_create_ai_dm = _async_version(channels.get_or_create_ai_dm)
+
+# Messages
+create_message = _async_version(messages.create_message)
+update_message = _async_version(messages.update_message)
+delete_message = _async_version(messages.delete_message)
+get_channel_messages = _async_version(messages.get_channel_messages)
+get_message = _async_version(messages.get_message)
+get_thread_root = _async_version(messages.get_thread_root)
+find_last_reply_in_chain = _async_version(messages.find_last_reply_in_chain)
+create_reply = _async_version(messages.create_reply)
+get_message_reply_chain = _async_version(messages.get_message_reply_chain)
+
+# Reactions
+get_all_reactions = _async_version(reactions.get_all_reactions)
+get_reaction = _async_version(reactions.get_reaction)
+get_reaction_summaries = _async_version(reactions.get_reaction_summaries)
+get_message_reactions = _async_version(reactions.get_message_reactions)
+add_reaction_to_message = _async_version(reactions.add_reaction_to_message)
+remove_reaction_from_message = _async_version(reactions.remove_reaction_from_message)
+
+# AI conversations
+get_conversation = _async_version(ai.get_conversation)
+get_channel_conversations = _async_version(ai.get_channel_conversations)
+delete_conversation = _async_version(ai.delete_conversation)
@@ -5,6 +5,7 @@ from typing import List, Optional
 
 from .. import models, schemas
 from .users import get_user
+from ..membership import membership
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +23,7 @@ def create_channel(db: Session, channel: schemas.ChannelCreate, creator_id: int)
     db_user_channel = models.UserChannel(user_id=creator_id, channel_id=db_channel.id)
     db.add(db_user_channel)
     db.commit()
+    membership.invalidate(creator_id)
     
     return db_channel
 
@@ -49,6 +51,8 @@ def update_channel(db: Session, channel_id: int, channel_update: schemas.Channel
 def delete_channel(db: Session, channel_id: int):
     db_channel = get_channel(db, channel_id)
     if db_channel:
+        member_ids = [row.user_id for row in
+                      db.query(models.UserChannel.user_id).filter(models.UserChannel.channel_id == channel_id)]
         # Delete all user_channel associations first
         db.query(models.UserChannel).filter(models.UserChannel.channel_id == channel_id).delete()
         # Delete all messages in the channel
@@ -56,6 +60,7 @@ def delete_channel(db: Session, channel_id: int):
         # Delete the channel
         db.delete(db_channel)
         db.commit()
+        membership.invalidate(*member_ids)
     return db_channel
 
 def get_channel_members(db: Session, channel_id: int):
@@ -79,6 +84,7 @@ def remove_channel_member(db: Session, channel_id: int, user_id: int):
         # Delete the user-channel association
         db.delete(db_user_channel)
         db.commit()
+        membership.invalidate(user_id)
         return True
     return False
 
@@ -98,13 +104,14 @@ def join_channel(db: Session, channel_id: int, user_id: int) -> Optional[models.
         return None
     
     # Check if user is already a member
-    if any(user.id == user_id for user in channel.users):
+    if user_in_channel(db, user_id, channel_id):
         return channel
     
     # Add user to channel
     db_user_channel = models.UserChannel(user_id=user_id, channel_id=channel_id)
     db.add(db_user_channel)
     db.commit()
+    membership.invalidate(user_id)
     
     # Refresh the channel to get updated users list
     db.refresh(channel)
@@ -185,14 +192,18 @@ def create_dm(db: Session, creator_id: int, dm: schemas.DMCreate) -> models.Chan
         db.add(db_user_channel)
     
     db.commit()
+    membership.invalidate(*[user.id for user in valid_users])
     db.refresh(db_channel)
     return db_channel
 
 def get_user_dms(db: Session, user_id: int, skip: int = 0, limit: int = 100):
     """Get user's DM channels ordered by most recent message."""
-    # Subquery to get the latest message timestamp for each channel
+    # Subquery to get the latest message timestamp for each of the user's channels
+    member_channel_ids = (db.query(models.UserChannel.channel_id)
+                          .filter(models.UserChannel.user_id == user_id))
     latest_messages = (db.query(models.Message.channel_id,
                               func.max(models.Message.created_at).label('latest_message_at'))
+                      .filter(models.Message.channel_id.in_(member_channel_ids))
                       .group_by(models.Message.channel_id)
                       .subquery())
     
@@ -277,6 +288,7 @@ def get_or_create_ai_dm(db: Session, user_id: int) -> models.Channel:
     db_user_channel = models.UserChannel(user_id=user_id, channel_id=db_channel.id)
     db.add(db_user_channel)
     db.commit()
+    membership.invalidate(user_id)
     db.refresh(db_channel)
     
     return db_channel
@@ -1,16 +1,59 @@
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, noload
+from sqlalchemy import func, or_, select, tuple_
+import base64
+import json
 import logging
-from typing import List, Optional, Tuple
+import os
+import time
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
-from ..models import Message, User, MessageReaction, Channel
+from ..models import Message, MessageReaction
 from .. import schemas
-from ..embedding_service import embedding_service
+from ..embedding_pipeline import embedding_pipeline
+from .reactions import get_reaction_summaries
 
 logger = logging.getLogger(__name__)
 
+# Seconds a channel's message count is reused before it is counted again
+MESSAGE_COUNT_CACHE_SECONDS = float(os.getenv('MESSAGE_COUNT_CACHE_SECONDS', '30'))
+
+# (channel_id, parent_only) -> (expires_at, count)
+_message_count_cache: Dict[Tuple[int, bool], Tuple[float, int]] = {}
+
+def encode_message_cursor(message: Message) -> str:
+    """Opaque cursor pointing just past `message` in (created_at, id) order"""
+    payload = json.dumps({"created_at": message.created_at.isoformat(), "id": message.id})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_message_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_message_cursor. Raises ValueError for malformed cursors."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(payload["created_at"]), int(payload["id"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def count_channel_messages(db: Session, channel_id: int, parent_only: bool = True) -> int:
+    """Number of messages in a channel, cached for MESSAGE_COUNT_CACHE_SECONDS.
+
+    The count is approximate by design: it can trail new messages by the cache
+    lifetime, which is fine for display and avoids a COUNT(*) on every page.
+    """
+    key = (channel_id, parent_only)
+    cached = _message_count_cache.get(key)
+    now = time.monotonic()
+    if cached and cached[0] > now:
+        return cached[1]
+    query = db.query(func.count(Message.id)).filter(Message.channel_id == channel_id)
+    if parent_only:
+        query = query.filter(Message.parent_id.is_(None))
+    total = query.scalar()
+    _message_count_cache[key] = (now + MESSAGE_COUNT_CACHE_SECONDS, total)
+    return total
+
 def create_message(db: Session, channel_id: int, user_id: int, message: schemas.MessageCreate, from_ai: bool=False):
-    """Create a new message and generate its embedding"""
+    """Create a new message and queue its embedding in the same transaction"""
     db_message = Message(
         content=message.content,
         channel_id=channel_id,
@@ -18,88 +61,34 @@ def create_message(db: Session, channel_id: int, user_id: int, message: schemas.
         from_ai=from_ai
     )
     db.add(db_message)
+    db.flush()  # Get the ID without committing
+
+    # Embedding happens in the background so the response doesn't wait on OpenAI and Pinecone
+    if not from_ai:
+        embedding_pipeline.queue_upsert(db, db_message.id)
     db.commit()
     db.refresh(db_message)
-
-    if from_ai:
-        return db_message
-
-    try:
-        # Get channel and user information
-        channel = db.query(Channel).filter(Channel.id == channel_id).first()
-        user = db.query(User).filter(User.id == user_id).first()
-        
-        # Generate embedding and get vector_id
-        vector_id = embedding_service.create_message_embedding(
-            message_content=db_message.content,
-            channel_name=channel.name,
-            user_name=user.name,
-            message_id=db_message.id,
-            user_id=user_id,
-            channel_id=channel_id,
-            parent_id=None,  # This is a parent message
-            file_name=None  # Add file handling later if needed
-        )
-        
-        # Update message with vector_id
-        db_message.vector_id = vector_id
-        db.commit()
-        db.refresh(db_message)
-        logger.info(f"Created message {db_message.id} with vector_id {vector_id}")
-    except Exception as e:
-        logger.error(f"Error creating message embedding: {e}")
-        # Don't fail the message creation if embedding fails
-        # We can add a background task to retry later if needed
     
     return db_message
 
 def update_message(db: Session, message_id: int, message_update: schemas.MessageCreate) -> Message:
-    """Update a message and its embedding"""
+    """Update a message and queue its re-embedding in the same transaction"""
     db_message = db.query(Message).filter(Message.id == message_id).first()
     if not db_message:
         return None
     
-    # Store old content in case we need to rollback
-    old_content = db_message.content
-    
-    try:
-        # Update message content and set edited_at
-        db_message.content = message_update.content
-        db_message.edited_at = datetime.utcnow()  # Set edited_at timestamp
-        db.commit()
-        db.refresh(db_message)
-
-        # Only update embedding if we have a vector_id
-        if db_message.vector_id:
-            # Get channel and user information
-            channel = db.query(Channel).filter(Channel.id == db_message.channel_id).first()
-            user = db.query(User).filter(User.id == db_message.user_id).first()
-            
-            # Update the embedding
-            embedding_service.update_message_embedding(
-                vector_id=db_message.vector_id,
-                new_content=message_update.content,
-                channel_name=channel.name,
-                user_name=user.name,
-                message_id=message_id,
-                has_file=bool(db_message.files),
-                file_name=db_message.files[0].file_name if db_message.files else None,
-                parent_id=db_message.parent_id
-            )
-            logger.info(f"Updated message {message_id} embedding")
-    except Exception as e:
-        logger.error(f"Error updating message embedding: {e}")
-        # Rollback content update if embedding update fails
-        db_message.content = old_content
-        db_message.edited_at = None  # Reset edited_at on rollback
-        db.commit()
-        db.refresh(db_message)
-        raise
+    # Update message content and set edited_at
+    db_message.content = message_update.content
+    db_message.edited_at = datetime.utcnow()  # Set edited_at timestamp
+    if not db_message.from_ai:
+        embedding_pipeline.queue_upsert(db, message_id)
+    db.commit()
+    db.refresh(db_message)
     
     return db_message
 
 def delete_message(db: Session, message_id: int) -> Message:
-    """Delete a message and its embedding"""
+    """Delete a message and queue removal of its embedding in the same transaction"""
     db_message = (db.query(Message)
                  .filter(Message.id == message_id)
                  .options(joinedload(Message.user))
@@ -110,24 +99,91 @@ def delete_message(db: Session, message_id: int) -> Message:
     # Create a copy of the message with its relationships
     message_copy = schemas.Message.from_orm(db_message)
     
-    try:
-        # Delete embedding first if it exists
-        if db_message.vector_id:
-            embedding_service.delete_message_embedding(db_message.vector_id)
-            logger.info(f"Deleted embedding for message {message_id}")
-        
-        # Then delete the message
-        db.delete(db_message)
-        db.commit()
-    except Exception as e:
-        logger.error(f"Error deleting message embedding: {e}")
-        # Continue with message deletion even if embedding deletion fails
-        db.delete(db_message)
-        db.commit()
+    if db_message.thread_root_id is not None:
+        _detach_reply(db, db_message)
+    else:
+        _detach_root(db, db_message)
+    
+    embedding_pipeline.queue_delete(db, message_id, db_message.vector_id)
+    db.delete(db_message)
+    db.commit()
     
     return message_copy
 
-def get_channel_messages(db: Session, channel_id: int, skip: int = 0, limit: int = 50, include_reactions: bool = False, parent_only: bool = True):
+def _detach_reply(db: Session, reply: Message):
+    """Unlink a reply that is about to be deleted from its thread: the next reply in the
+    chain takes over its parent, and the root's reply summary drops it."""
+    root_message = (db.query(Message)
+                    .filter(Message.id == reply.thread_root_id)
+                    .with_for_update()
+                    .first())
+    next_reply = db.query(Message).filter(Message.parent_id == reply.id).first()
+    if next_reply:
+        # parent_id is unique, so free it before handing it on
+        parent_id, reply.parent_id = reply.parent_id, None
+        db.flush()
+        next_reply.parent_id = parent_id
+        db.flush()
+        # Otherwise the delete cascade nulls next_reply's parent_id through the stale backref
+        db.expire(reply, ['reply'])
+    
+    root_message.reply_count = max((root_message.reply_count or 0) - 1, 0)
+    root_message.last_reply_at = (db.query(func.max(Message.created_at))
+                                  .filter(Message.thread_root_id == root_message.id,
+                                          Message.id != reply.id)
+                                  .scalar())
+
+def _detach_root(db: Session, root_message: Message):
+    """Hand the thread of a root that is about to be deleted to its first reply, which
+    becomes a top-level message with the remaining replies as its own thread."""
+    first_reply = db.query(Message).filter(Message.parent_id == root_message.id).first()
+    if not first_reply:
+        return
+    
+    # Renumber the rest of the chain under the new root before it leaves the thread
+    (db.query(Message)
+     .filter(Message.thread_root_id == root_message.id, Message.id != first_reply.id)
+     .update({
+         Message.thread_root_id: first_reply.id,
+         Message.thread_position: Message.thread_position - 1
+     }, synchronize_session=False))
+    
+    first_reply.parent_id = None
+    first_reply.thread_root_id = None
+    first_reply.thread_position = None
+    first_reply.reply_count = max((root_message.reply_count or 0) - 1, 0)
+    db.flush()
+    first_reply.last_reply_at = (db.query(func.max(Message.created_at))
+                                 .filter(Message.thread_root_id == first_reply.id)
+                                 .scalar())
+    db.flush()
+    # The renumbered replies and the root's backref are stale now
+    db.expire_all()
+
+def get_channel_messages(
+    db: Session,
+    channel_id: int,
+    skip: int = 0,
+    limit: int = 50,
+    include_reactions: bool = False,
+    parent_only: bool = True,
+    before: Optional[str] = None,
+    include_total: bool = True,
+    reaction_summary: bool = False,
+    current_user_id: Optional[int] = None
+):
+    """Newest-first page of channel messages.
+
+    Pass the previous page's next_cursor as `before` to continue further back; that
+    seeks straight to the cursor on the (channel_id, parent_id, created_at, id) index,
+    so deep pages cost the same as the first. `skip` is still honoured when no cursor
+    is given. The total comes from count_channel_messages and is omitted entirely
+    when include_total is False.
+    
+    With reaction_summary, each message carries per-reaction counts from a single
+    grouped query instead of every reaction row with its user; reacted_by_me is
+    relative to current_user_id. include_reactions is ignored in that mode.
+    """
     # Start with base query
     query = db.query(Message).filter(Message.channel_id == channel_id)
     
@@ -135,13 +191,21 @@ def get_channel_messages(db: Session, channel_id: int, skip: int = 0, limit: int
     if parent_only:
         query = query.filter(Message.parent_id.is_(None))
     
+    if before:
+        cursor_created_at, cursor_id = decode_message_cursor(before)
+        query = query.filter(tuple_(Message.created_at, Message.id) < tuple_(cursor_created_at, cursor_id))
+    elif skip:
+        query = query.offset(skip)
+    
     # Add eager loading for user and parent
     query = query.options(
         joinedload(Message.user),
         joinedload(Message.parent).joinedload(Message.user)
     )
     
-    if include_reactions:
+    if reaction_summary:
+        query = query.options(noload(Message.reactions))
+    elif include_reactions:
         # Add eager loading for reactions and their related data
         query = query.options(
             joinedload(Message.reactions)
@@ -152,117 +216,97 @@ def get_channel_messages(db: Session, channel_id: int, skip: int = 0, limit: int
     
     # Get messages with pagination
     messages = (query
-               .order_by(Message.created_at.desc())
-               .offset(skip)
+               .order_by(Message.created_at.desc(), Message.id.desc())
                .limit(limit + 1)  # Get one extra to check if there are more
                .all())
     
     # Check if there are more messages
     has_more = len(messages) > limit
     messages = messages[:limit]  # Trim to requested limit
+    next_cursor = encode_message_cursor(messages[-1]) if has_more and messages else None
     
-    # Get total count (respecting parent_only filter)
-    total_query = db.query(Message).filter(Message.channel_id == channel_id)
-    if parent_only:
-        total_query = total_query.filter(Message.parent_id.is_(None))
-    total = total_query.count()
-    
-    # Add has_replies information for each message
-    message_ids = [m.id for m in messages]
-    replies_exist = (
-        db.query(Message.parent_id)
-        .filter(Message.parent_id.in_(message_ids))
-        .distinct()
-        .all()
-    )
-    messages_with_replies = {r[0] for r in replies_exist}
+    total = count_channel_messages(db, channel_id, parent_only) if include_total else None
     
-    # Set has_replies flag for each message
-    for message in messages:
-        message.has_replies = message.id in messages_with_replies
+    if reaction_summary:
+        summaries = get_reaction_summaries(db, [m.id for m in messages], current_user_id)
+        for message in messages:
+            message.reaction_summary = summaries.get(message.id, [])
     
     return schemas.MessageList(
         messages=messages,
         total=total,
-        has_more=has_more
+        has_more=has_more,
+        next_cursor=next_cursor
     )
 
 def get_message(db: Session, message_id: int) -> Message:
     return db.query(Message).filter(Message.id == message_id).first()
 
+def _thread_root_id(message_id: int):
+    """Scalar subquery resolving any message in a thread to the thread's root id"""
+    return (select(func.coalesce(Message.thread_root_id, Message.id))
+            .where(Message.id == message_id)
+            .scalar_subquery())
+
+def _thread_query(db: Session, message_id: int):
+    """All messages in the thread containing `message_id`, root first"""
+    root_id = _thread_root_id(message_id)
+    return (db.query(Message)
+            .filter(or_(Message.id == root_id, Message.thread_root_id == root_id))
+            .order_by(func.coalesce(Message.thread_position, 0)))
+
+def get_thread_root(db: Session, message_id: int) -> Optional[Message]:
+    """The top-level message of the thread containing `message_id`"""
+    return db.query(Message).filter(Message.id == _thread_root_id(message_id)).first()
+
 def find_last_reply_in_chain(db: Session, message_id: int) -> Message:
     """
-    Recursively find the last message in a reply chain.
-    Returns the last message that doesn't have a reply.
+    Find the last message in the reply chain containing `message_id`.
+    Returns the root itself when the thread has no replies yet.
     """
-    current_message = db.query(Message).filter(Message.id == message_id).first()
-    if not current_message:
-        return None
-    
-    # Follow the reply chain until we find a message with no reply
-    while True:
-        reply = db.query(Message).filter(Message.parent_id == current_message.id).first()
-        if not reply:
-            return current_message
-        current_message = reply
+    return (_thread_query(db, message_id)
+            .order_by(None)
+            .order_by(func.coalesce(Message.thread_position, 0).desc())
+            .first())
 
 def create_reply(db: Session, parent_id: int, user_id: int, message: schemas.MessageReplyCreate) -> Tuple[Message, Message]:
     """
     Create a reply to a message. If the parent message already has a reply,
     the new message will be attached to the last message in the chain.
     Returns a tuple of (reply_message, root_message).
-    Create a reply message with embedding
+    The reply is queued for embedding.
     """
-    # First check if parent message exists
-    parent_message = db.query(Message).filter(Message.id == parent_id).first()
-    if not parent_message:
+    # Lock the thread's root so concurrent replies append one after another
+    root_message = (db.query(Message)
+                    .filter(Message.id == _thread_root_id(parent_id))
+                    .with_for_update()
+                    .first())
+    if not root_message:
         return None, None
     
     # Find the last message in the reply chain
-    last_message = find_last_reply_in_chain(db, parent_id)
+    last_message = find_last_reply_in_chain(db, root_message.id)
     
     # Create the new reply message
     db_message = Message(
         content=message.content,
-        channel_id=parent_message.channel_id,
+        channel_id=root_message.channel_id,
         user_id=user_id,
-        parent_id=last_message.id
+        parent_id=last_message.id,
+        thread_root_id=root_message.id,
+        thread_position=(last_message.thread_position or 0) + 1
     )
     
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
+    db.flush()  # Get the ID without committing
     
-    try:
-        # Get channel and user information
-        channel = db.query(Channel).filter(Channel.id == parent_message.channel_id).first()
-        user = db.query(User).filter(User.id == user_id).first()
-        
-        # Generate embedding for the reply
-        vector_id = embedding_service.create_message_embedding(
-            message_content=db_message.content,
-            channel_name=channel.name,
-            user_name=user.name,
-            message_id=db_message.id,
-            user_id=user_id,
-            channel_id=parent_message.channel_id,
-            parent_id=last_message.id,
-            file_name=None
-        )
-        
-        # Update message with vector_id
-        db_message.vector_id = vector_id
-        db.commit()
-        db.refresh(db_message)
-        logger.info(f"Created reply message {db_message.id} with vector_id {vector_id}")
-    except Exception as e:
-        logger.error(f"Error creating reply message embedding: {e}")
-        # Don't fail the reply creation if embedding fails
+    # The root row is locked, so the counter can't lose a concurrent increment
+    root_message.reply_count = (root_message.reply_count or 0) + 1
+    root_message.last_reply_at = func.now()  # the reply's created_at: now() is per transaction
     
-    # Get the root message (the one with no parent)
-    root_message = parent_message
-    while root_message.parent_id is not None:
-        root_message = db.query(Message).filter(Message.id == root_message.parent_id).first()
+    embedding_pipeline.queue_upsert(db, db_message.id)
+    db.commit()
+    db.refresh(db_message)
     
     # Refresh root message to ensure we have the latest data
     db.refresh(root_message)
@@ -275,44 +319,6 @@ def get_message_reply_chain(db: Session, message_id: int) -> List[Message]:
     1. The original message
     2. All parent messages (if the given message is a reply)
     3. All reply messages (if any message has replies)
-    Returns messages ordered by created_at date.
+    Returns messages in chain order, which is also created_at order.
     """
-    # First, get the original message
-    message = db.query(Message).filter(Message.id == message_id).first()
-    if not message:
-        return []
-    
-    # Get all messages in the chain
-    chain_messages = []
-    
-    # If this message has a parent, traverse up to find the root
-    current = message
-    while current.parent_id is not None:
-        parent = db.query(Message).filter(Message.id == current.parent_id).first()
-        if not parent:
-            break
-        chain_messages.append(parent)
-        current = parent
-    
-    # Add the original message
-    chain_messages.append(message)
-    
-    # Find all replies in the chain
-    current = message
-    while True:
-        reply = db.query(Message).filter(Message.parent_id == current.id).first()
-        if not reply:
-            break
-        chain_messages.append(reply)
-        current = reply
-    
-    # Sort all messages by created_at
-    chain_messages.sort(key=lambda x: x.created_at)
-    
-    # Eager load user data for each message
-    message_ids = [m.id for m in chain_messages]
-    return (db.query(Message)
-            .filter(Message.id.in_(message_ids))
-            .options(joinedload(Message.user))
-            .order_by(Message.created_at)
-            .all()) 
\ No newline at end of file
+    return _thread_query(db, message_id).options(joinedload(Message.user)).all()
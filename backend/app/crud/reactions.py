@@ -1,5 +1,7 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import case, func
 import logging
+from typing import Dict, List, Optional
 
 from .. import models, schemas
 
@@ -11,6 +13,48 @@ def get_all_reactions(db: Session, skip: int = 0, limit: int = 100):
 def get_reaction(db: Session, reaction_id: int) -> models.Reaction:
     return db.query(models.Reaction).filter(models.Reaction.id == reaction_id).first()
 
+def get_reaction_summaries(db: Session, message_ids: List[int], user_id: Optional[int] = None) -> Dict[int, List[schemas.ReactionSummary]]:
+    """Per-message reaction counts for a set of messages in one grouped query.
+    reacted_by_me marks the reactions `user_id` has added."""
+    if not message_ids:
+        return {}
+    rows = (db.query(
+                models.MessageReaction.message_id,
+                models.MessageReaction.reaction_id,
+                models.Reaction.code,
+                models.Reaction.image_url,
+                func.count().label('count'),
+                func.max(case((models.MessageReaction.user_id == user_id, 1), else_=0)).label('reacted_by_me'))
+            .join(models.Reaction, models.Reaction.id == models.MessageReaction.reaction_id)
+            .filter(models.MessageReaction.message_id.in_(message_ids))
+            .group_by(models.MessageReaction.message_id, models.MessageReaction.reaction_id,
+                      models.Reaction.code, models.Reaction.image_url)
+            .order_by(models.MessageReaction.message_id, models.MessageReaction.reaction_id)
+            .all())
+    summaries: Dict[int, List[schemas.ReactionSummary]] = {}
+    for row in rows:
+        summaries.setdefault(row.message_id, []).append(schemas.ReactionSummary(
+            reaction_id=row.reaction_id,
+            code=row.code,
+            image_url=row.image_url,
+            count=row.count,
+            reacted_by_me=bool(row.reacted_by_me)
+        ))
+    return summaries
+
+def get_message_reactions(db: Session, message_id: int, reaction_id: Optional[int] = None, skip: int = 0, limit: int = 100):
+    """Individual reactions on a message with their users, optionally for one reaction"""
+    query = (db.query(models.MessageReaction)
+             .filter(models.MessageReaction.message_id == message_id)
+             .options(joinedload(models.MessageReaction.reaction),
+                      joinedload(models.MessageReaction.user)))
+    if reaction_id is not None:
+        query = query.filter(models.MessageReaction.reaction_id == reaction_id)
+    return (query.order_by(models.MessageReaction.created_at, models.MessageReaction.id)
+            .offset(skip)
+            .limit(limit)
+            .all())
+
 def add_reaction_to_message(db: Session, message_id: int, reaction_id: int, user_id: int) -> models.MessageReaction:
     # Check if the reaction already exists
     existing_reaction = (db.query(models.MessageReaction)
@@ -4,6 +4,9 @@ import logging
 from typing import Optional
 
 from .. import models, schemas
+from ..auth_cache import user_cache
+from ..search_cache import search_cache, USERS_TAG
+from ..membership import membership
 
 logger = logging.getLogger(__name__)
 
@@ -51,6 +54,7 @@ def create_personal_channel(db: Session, user: models.User) -> models.Channel:
         user_channel = models.UserChannel(user_id=user.id, channel_id=personal_channel.id)
         db.add(user_channel)
         db.commit()
+        membership.invalidate(user.id)
         db.refresh(personal_channel)
 
         logger.info(f"Created personal channel for user {user.name}")
@@ -72,6 +76,8 @@ def sync_auth0_user(db: Session, user_data: schemas.UserCreate):
             db_user.picture = user_data.picture
             db.commit()
             db.refresh(db_user)
+            user_cache.invalidate(db_user.auth0_id)
+            search_cache.invalidate(USERS_TAG)
             return db_user
         
         # Create new user
@@ -84,6 +90,7 @@ def sync_auth0_user(db: Session, user_data: schemas.UserCreate):
         db.add(db_user)
         db.commit()
         db.refresh(db_user)
+        search_cache.invalidate(USERS_TAG)
 
         # Create personal channel for new user
         create_personal_channel(db, db_user)
@@ -99,6 +106,8 @@ def update_user_bio(db: Session, user_id: int, bio: str):
         db_user.bio = bio
         db.commit()
         db.refresh(db_user)
+        user_cache.invalidate(db_user.auth0_id)
+        search_cache.invalidate(USERS_TAG)
     return db_user
 
 def update_user_name(db: Session, user_id: int, name: str):
@@ -107,6 +116,8 @@ def update_user_name(db: Session, user_id: int, name: str):
         db_user.name = name
         db.commit()
         db.refresh(db_user)
+        user_cache.invalidate(db_user.auth0_id)
+        search_cache.invalidate(USERS_TAG)
     return db_user 
 
 def get_users_by_last_dm(db: Session, current_user_id: int, skip: int = 0, limit: int = 100):
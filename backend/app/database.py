@@ -1,8 +1,12 @@
 import os
+import threading
+import time
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, exc
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 load_dotenv()  # Load environment variables from .env file
 
@@ -11,13 +15,111 @@ DB_URL = os.getenv("DB_URL")
 if not DB_URL:
     raise ValueError("DB_URL is not set in the environment variables")
 
+def to_async_url(url: str) -> str:
+    """Swap the sync driver in a Postgres URL for asyncpg"""
+    scheme, sep, rest = url.partition("://")
+    return f"{scheme.split('+')[0]}+asyncpg{sep}{rest}"
+
+# Async routes use their own engine on asyncpg so queries don't block the event loop
+ASYNC_DB_URL = os.getenv("ASYNC_DB_URL") or to_async_url(DB_URL)
+
+# Connection pool settings, applied to both the sync and the async engine
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds before a connection is replaced
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+class PoolStats:
+    """Counters for how long callers wait on a pool for a connection"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, waited: float, timed_out: bool):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            return {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": DB_MAX_OVERFLOW,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+def _instrumented(pool_class):
+    """Subclass a queue pool so every checkout records how long it waited for a connection"""
+    class InstrumentedPool(pool_class):
+        stats = None
+
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                self.stats.record(time.perf_counter() - started, timed_out=True)
+                raise
+            self.stats.record(time.perf_counter() - started, timed_out=False)
+            return connection
+
+        def recreate(self):
+            new_pool = super().recreate()
+            new_pool.stats = self.stats
+            return new_pool
+
+    InstrumentedPool.__name__ = f"Instrumented{pool_class.__name__}"
+    return InstrumentedPool
+
+InstrumentedQueuePool = _instrumented(QueuePool)
+InstrumentedAsyncQueuePool = _instrumented(AsyncAdaptedQueuePool)
+
+sync_pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
 try:
-    engine = create_engine(DB_URL)
+    engine = create_engine(DB_URL, poolclass=InstrumentedQueuePool, **POOL_OPTIONS)
+    engine.pool.stats = sync_pool_stats
 except Exception as e:
     print(f"Error creating engine: {e}")
 
+# Fail the import with the real error: everything below needs the async engine
+async_engine = create_async_engine(ASYNC_DB_URL, poolclass=InstrumentedAsyncQueuePool, **POOL_OPTIONS)
+async_engine.pool.stats = async_pool_stats
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# expire_on_commit=False keeps loaded attributes readable after commit without another round trip
+AsyncSessionLocal = sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
 def get_db():
@@ -27,3 +129,13 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_pool_stats() -> dict:
+    """Current pool usage and wait-time counters for both engines"""
+    return {
+        "sync": sync_pool_stats.snapshot(engine.pool),
+        "async": async_pool_stats.snapshot(async_engine.pool),
+    }
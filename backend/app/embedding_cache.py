@@ -0,0 +1,161 @@
+"""Two-tier cache of embedding vectors keyed by a hash of the model and the text.
+
+Lookups check an in-process LRU first and then the embedding_cache table, so identical
+texts (repeated AI prompts, re-embedding a message whose text did not change) are only
+sent to the embeddings API once. Vectors are stored packed as float32 in both tiers.
+Cache failures are logged and treated as misses; they never fail an embedding call.
+"""
+import hashlib
+import logging
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from .models import EmbeddingCacheEntry
+from .database import SessionLocal, AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Vectors kept in memory per worker (a 1536-dimension vector packs to 6 KB)
+EMBEDDING_CACHE_SIZE = int(os.getenv('EMBEDDING_CACHE_SIZE', '2000'))
+# Whether misses in memory fall through to the embedding_cache table
+EMBEDDING_CACHE_DB = os.getenv('EMBEDDING_CACHE_DB', 'true').lower() == 'true'
+
+def content_hash(text: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\n{text}".encode()).hexdigest()
+
+def _pack(embedding: List[float]) -> bytes:
+    return array('f', embedding).tobytes()
+
+def _unpack(data: bytes) -> List[float]:
+    values = array('f')
+    values.frombytes(data)
+    return values.tolist()
+
+class EmbeddingCache:
+    def __init__(self, max_size: int = EMBEDDING_CACHE_SIZE, use_db: bool = EMBEDDING_CACHE_DB):
+        self.max_size = max_size
+        self.use_db = use_db
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _get_local(self, keys: List[str]) -> Dict[str, bytes]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                data = self._entries.get(key)
+                if data is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = data
+        return found
+
+    def _put_local(self, packed: Dict[str, bytes]):
+        with self._lock:
+            for key, data in packed.items():
+                self._entries[key] = data
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _lookup_query(self, keys: List[str]):
+        return select(EmbeddingCacheEntry.content_hash, EmbeddingCacheEntry.embedding).where(
+            EmbeddingCacheEntry.content_hash.in_(keys)
+        )
+
+    def _insert_statement(self, packed: Dict[str, bytes], model: str):
+        return insert(EmbeddingCacheEntry).values([
+            {"content_hash": key, "model": model, "embedding": data}
+            for key, data in packed.items()
+        ]).on_conflict_do_nothing(index_elements=["content_hash"])
+
+    def _resolve(self, keys: List[str], found: Dict[str, bytes], local_hits: int) -> List[Optional[List[float]]]:
+        self.memory_hits += local_hits
+        self.db_hits += len(found) - local_hits
+        self.misses += len(set(keys) - set(found))
+        return [_unpack(found[key]) if key in found else None for key in keys]
+
+    def get_many(self, texts: List[str], model: str) -> List[Optional[List[float]]]:
+        """Cached vectors for `texts` in order, None where not cached"""
+        keys = [content_hash(text, model) for text in texts]
+        found = self._get_local(keys)
+        local_hits = len(found)
+        missing = [key for key in set(keys) if key not in found]
+        if missing and self.use_db:
+            try:
+                db = SessionLocal()
+                try:
+                    rows = db.execute(self._lookup_query(missing)).all()
+                finally:
+                    db.close()
+                from_db = {row.content_hash: row.embedding for row in rows}
+                self._put_local(from_db)
+                found.update(from_db)
+            except Exception as e:
+                logger.warning(f"Embedding cache lookup failed: {e}")
+        return self._resolve(keys, found, local_hits)
+
+    async def get_many_async(self, texts: List[str], model: str) -> List[Optional[List[float]]]:
+        """Same as get_many, querying the table through the async engine"""
+        keys = [content_hash(text, model) for text in texts]
+        found = self._get_local(keys)
+        local_hits = len(found)
+        missing = [key for key in set(keys) if key not in found]
+        if missing and self.use_db:
+            try:
+                async with AsyncSessionLocal() as db:
+                    rows = (await db.execute(self._lookup_query(missing))).all()
+                from_db = {row.content_hash: row.embedding for row in rows}
+                self._put_local(from_db)
+                found.update(from_db)
+            except Exception as e:
+                logger.warning(f"Embedding cache lookup failed: {e}")
+        return self._resolve(keys, found, local_hits)
+
+    def put_many(self, embeddings: Dict[str, List[float]], model: str):
+        """Cache freshly generated vectors, keyed by the text they embed"""
+        packed = {content_hash(text, model): _pack(embedding) for text, embedding in embeddings.items()}
+        self._put_local(packed)
+        if packed and self.use_db:
+            try:
+                db = SessionLocal()
+                try:
+                    db.execute(self._insert_statement(packed, model))
+                    db.commit()
+                finally:
+                    db.close()
+            except Exception as e:
+                logger.warning(f"Embedding cache write failed: {e}")
+
+    async def put_many_async(self, embeddings: Dict[str, List[float]], model: str):
+        """Same as put_many, writing the table through the async engine"""
+        packed = {content_hash(text, model): _pack(embedding) for text, embedding in embeddings.items()}
+        self._put_local(packed)
+        if packed and self.use_db:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(self._insert_statement(packed, model))
+                    await db.commit()
+            except Exception as e:
+                logger.warning(f"Embedding cache write failed: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.db_hits) / lookups, 4) if lookups else None
+        }
+
+# Create a singleton instance
+embedding_cache = EmbeddingCache()
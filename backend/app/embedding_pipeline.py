@@ -0,0 +1,230 @@
+"""Background embedding of messages through a transactional outbox.
+
+Message writes call queue_upsert / queue_delete, which add an embedding_outbox row to
+the session so the vector operation commits or rolls back together with the message
+change. A drainer on every worker claims due rows in batches (FOR UPDATE SKIP LOCKED,
+so workers never process the same row), embeds upserts with one multi-input
+embeddings request, writes them with one Pinecone upsert, stores the vector ids back
+and deletes the rows in a single commit. When a batch fails, its rows are retried one
+at a time so a single bad row only costs itself an attempt. Failed rows are retried
+with exponential backoff; rows that run out of attempts stay in the table with their
+last error.
+"""
+import asyncio
+import os
+import logging
+import uuid
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.sql import func
+
+from .models import Message, EmbeddingOutbox
+from .database import AsyncSessionLocal
+from .ai_client import ai_client
+from .vector_store import vector_store
+from .embedding_service import EmbeddingService
+
+logger = logging.getLogger(__name__)
+
+# Outbox rows per embeddings request / index upsert
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))
+# Seconds to let a batch fill up after the drainer is woken
+EMBEDDING_BATCH_WAIT = float(os.getenv('EMBEDDING_BATCH_WAIT', '0.5'))
+EMBEDDING_MAX_ATTEMPTS = int(os.getenv('EMBEDDING_MAX_ATTEMPTS', '5'))
+# Seconds between outbox checks when nothing was committed on this worker
+EMBEDDING_OUTBOX_POLL_INTERVAL = float(os.getenv('EMBEDDING_OUTBOX_POLL_INTERVAL', '5'))
+EMBEDDING_RETRY_BASE_DELAY = 2
+
+UPSERT = 'upsert'
+DELETE = 'delete'
+
+# Session.info key marking sessions that added outbox rows
+_OUTBOX_PENDING = 'embedding_outbox_pending'
+
+# (outbox id, message_id, operation, vector_id, attempts)
+OutboxEntry = Tuple[int, int, str, Optional[str], int]
+# (message_id, vector_id, embedded text, metadata)
+EmbeddingJob = Tuple[int, str, str, Dict]
+
+def _claim_entries(db: Session, limit: int, entry_id: Optional[int] = None) -> List[OutboxEntry]:
+    """Lock the oldest due outbox rows, or just row `entry_id`, for this transaction"""
+    query = (db.query(EmbeddingOutbox)
+             .filter(EmbeddingOutbox.next_attempt_at <= func.now(),
+                     EmbeddingOutbox.attempts < EMBEDDING_MAX_ATTEMPTS))
+    if entry_id is not None:
+        query = query.filter(EmbeddingOutbox.id == entry_id)
+    rows = (query
+            .order_by(EmbeddingOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all())
+    return [(row.id, row.message_id, row.operation, row.vector_id, row.attempts) for row in rows]
+
+def build_embedding_job(message: Message) -> EmbeddingJob:
+    """Embedding text, metadata and vector id for a message with channel, user and files loaded"""
+    file_name = message.files[0].file_name if message.files else None
+    embedded_message = EmbeddingService.format_message(message.channel.name, message.user.name, message.content)
+    metadata = EmbeddingService.message_metadata(
+        embedded_message, message.content, message.channel.name, message.user.name,
+        message.id, message.user_id, message.channel_id, message.parent_id, file_name
+    )
+    return (message.id, message.vector_id or str(uuid.uuid4()), embedded_message, metadata)
+
+def _load_jobs(db: Session, message_ids: List[int]) -> List[EmbeddingJob]:
+    """Build embedding jobs for the messages that still exist.
+
+    A message keeps its vector id once it has one, so embedding it again overwrites
+    the same vector instead of creating a duplicate.
+    """
+    messages = (db.query(Message)
+                .filter(Message.id.in_(message_ids), Message.from_ai == False)
+                .options(
+                    joinedload(Message.channel),
+                    joinedload(Message.user),
+                    joinedload(Message.files)
+                )
+                .all())
+
+    return [build_embedding_job(message) for message in messages]
+
+def _save_vector_ids(db: Session, vector_ids: Dict[int, str]) -> List[str]:
+    """Store vector ids on their messages. Returns the vector ids whose message was
+    deleted while it was being embedded, so the caller can remove them again."""
+    found = set()
+    for message in db.query(Message).filter(Message.id.in_(list(vector_ids))).all():
+        message.vector_id = vector_ids[message.id]
+        found.add(message.id)
+    return [vector_id for message_id, vector_id in vector_ids.items() if message_id not in found]
+
+def _complete_entries(db: Session, entry_ids: List[int]):
+    db.query(EmbeddingOutbox).filter(EmbeddingOutbox.id.in_(entry_ids)).delete(synchronize_session=False)
+    db.commit()
+
+def _record_failure(db: Session, entry_ids: List[int], error: str):
+    for row in db.query(EmbeddingOutbox).filter(EmbeddingOutbox.id.in_(entry_ids)).all():
+        row.attempts += 1
+        row.last_error = error[:1000]
+        row.next_attempt_at = func.now() + timedelta(seconds=EMBEDDING_RETRY_BASE_DELAY ** row.attempts)
+        if row.attempts >= EMBEDDING_MAX_ATTEMPTS:
+            logger.error(f"Giving up on {row.operation} of message {row.message_id} after {row.attempts} attempts: {error}")
+    db.commit()
+
+class EmbeddingPipeline:
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._worker: Optional[asyncio.Task] = None
+        event.listen(Session, 'after_commit', self._after_commit)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            self._worker = None
+        self._loop = None
+
+    def queue_upsert(self, db: Session, message_id: int):
+        """(Re-)embed a message when the session commits"""
+        db.add(EmbeddingOutbox(message_id=message_id, operation=UPSERT))
+        db.info[_OUTBOX_PENDING] = True
+
+    def queue_delete(self, db: Session, message_id: int, vector_id: Optional[str]):
+        """Remove a message's vector when the session commits"""
+        if not vector_id:
+            return
+        db.add(EmbeddingOutbox(message_id=message_id, operation=DELETE, vector_id=vector_id))
+        db.info[_OUTBOX_PENDING] = True
+
+    def _after_commit(self, session: Session):
+        # Wake the drainer as soon as outbox rows are visible instead of waiting for the next poll
+        if session.info.pop(_OUTBOX_PENDING, False) and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                drained = await self._drain_once()
+            except Exception as e:
+                logger.error(f"Error draining embedding outbox: {e}")
+                drained = 0
+            if drained >= EMBEDDING_BATCH_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=EMBEDDING_OUTBOX_POLL_INTERVAL)
+                await asyncio.sleep(EMBEDDING_BATCH_WAIT)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _drain_once(self) -> int:
+        """Process one batch of due outbox rows. Returns the number of rows completed."""
+        async with AsyncSessionLocal() as db:
+            entries = await db.run_sync(_claim_entries, EMBEDDING_BATCH_SIZE)
+            if not entries:
+                await db.commit()
+                return 0
+
+            single = len(entries) == 1
+            if await self._process(db, entries, record_failure=single):
+                logger.info(f"Processed {len(entries)} embedding outbox rows")
+                return len(entries)
+        if single:
+            return 0
+
+        # Retry the batch row by row so only the rows that actually fail use up an attempt
+        completed = 0
+        for entry_id, _, _, _, _ in entries:
+            async with AsyncSessionLocal() as db:
+                # Re-claim the row: its lock was released with the failed batch
+                claimed = await db.run_sync(_claim_entries, 1, entry_id)
+                if not claimed:
+                    await db.commit()
+                    continue
+                if await self._process(db, claimed, record_failure=True):
+                    completed += 1
+        logger.info(f"Processed {completed} of {len(entries)} embedding outbox rows one at a time")
+        return completed
+
+    async def _process(self, db, entries: List[OutboxEntry], record_failure: bool) -> bool:
+        """Apply and complete claimed rows in one commit. On failure the transaction is
+        rolled back and, if `record_failure` is set, the rows are charged an attempt."""
+        entry_ids = [entry_id for entry_id, _, _, _, _ in entries]
+        try:
+            await self._apply(db, entries)
+            await db.run_sync(_complete_entries, entry_ids)
+            return True
+        except Exception as e:
+            logger.error(f"Error processing {len(entries)} embedding outbox rows: {e}")
+            await db.rollback()
+            if record_failure:
+                await db.run_sync(_record_failure, entry_ids, str(e))
+            return False
+
+    async def _apply(self, db, entries: List[OutboxEntry]):
+        upsert_ids = list(dict.fromkeys(message_id for _, message_id, operation, _, _ in entries if operation == UPSERT))
+        delete_vector_ids = [vector_id for _, _, operation, vector_id, _ in entries if operation == DELETE]
+
+        if upsert_ids:
+            jobs = await db.run_sync(_load_jobs, upsert_ids)
+            if jobs:
+                embeddings = await ai_client.embed_many([text for _, _, text, _ in jobs])
+                await vector_store.upsert(vectors=[
+                    (vector_id, embedding, metadata)
+                    for (_, vector_id, _, metadata), embedding in zip(jobs, embeddings)
+                ])
+                orphaned = await db.run_sync(
+                    _save_vector_ids, {message_id: vector_id for message_id, vector_id, _, _ in jobs}
+                )
+                delete_vector_ids.extend(orphaned)
+
+        if delete_vector_ids:
+            await vector_store.delete(ids=delete_vector_ids)
+
+# Create a singleton instance
+embedding_pipeline = EmbeddingPipeline()
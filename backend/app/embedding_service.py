@@ -6,6 +6,9 @@ from typing import List, Dict, Optional
 import logging
 from dotenv import load_dotenv
 
+from .ai_client import ai_client, EMBEDDING_MODEL
+from .embedding_cache import embedding_cache
+
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
@@ -20,22 +23,42 @@ openai_client = OpenAI(api_key=OPENAI_API_KEY)
 
 class EmbeddingService:
     def __init__(self):
-        if not all([PINECONE_API_KEY, OPENAI_API_KEY, INDEX_NAME]):
+        if not OPENAI_API_KEY:
             raise ValueError("Missing required environment variables for EmbeddingService")
-        
-        # Initialize pinecone
-        pc = Pinecone(api_key=PINECONE_API_KEY)
-        self.index = pc.Index(INDEX_NAME)
-        logger.info(f"Initialized Pinecone index: {INDEX_NAME}")
+        self._index = None
+
+    @property
+    def index(self):
+        """Pinecone index, connected on first use so the app can run on the local vector store"""
+        if self._index is None:
+            if not all([PINECONE_API_KEY, INDEX_NAME]):
+                raise ValueError("Missing Pinecone environment variables for EmbeddingService")
+            pc = Pinecone(api_key=PINECONE_API_KEY)
+            self._index = pc.Index(INDEX_NAME)
+            logger.info(f"Initialized Pinecone index: {INDEX_NAME}")
+        return self._index
 
     def generate_embedding(self, text: str) -> List[float]:
         """Generate embedding using OpenAI's text-embedding-3-small model"""
         try:
+            cached = embedding_cache.get_many([text], EMBEDDING_MODEL)[0]
+            if cached is not None:
+                return cached
             response = openai_client.embeddings.create(
                 input=text,
-                model="text-embedding-3-small"
+                model=EMBEDDING_MODEL
             )
-            return response.data[0].embedding
+            embedding = response.data[0].embedding
+            embedding_cache.put_many({text: embedding}, EMBEDDING_MODEL)
+            return embedding
+        except Exception as e:
+            logger.error(f"Error generating embedding: {e}")
+            raise
+
+    async def generate_embedding_async(self, text: str) -> List[float]:
+        """Generate an embedding without blocking the event loop"""
+        try:
+            return await ai_client.embed(text)
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
             raise
@@ -67,6 +90,37 @@ class EmbeddingService:
             logger.error(f"Error updating metadata: {e}")
             raise
 
+    @staticmethod
+    def format_message(channel_name: str, user_name: str, message_content: str) -> str:
+        """Text that gets embedded for a message"""
+        return f"Channel: {channel_name} - User: {user_name} - Message: {message_content}"
+
+    @staticmethod
+    def message_metadata(
+        embedded_message: str,
+        message_content: str,
+        channel_name: str,
+        user_name: str,
+        message_id: int,
+        user_id: int,
+        channel_id: int,
+        parent_id: Optional[int] = None,
+        file_name: Optional[str] = None
+    ) -> Dict:
+        """Metadata stored alongside a message vector"""
+        return {
+            "message_id": message_id,
+            "embedded_content": embedded_message,
+            "user_name": user_name,
+            "channel_name": channel_name,
+            "content": message_content,
+            "user_id": user_id,
+            "channel_id": channel_id,
+            "parent_id": parent_id if parent_id else "",
+            "has_file": bool(file_name),
+            "file_name": file_name if file_name else ""
+        }
+
     def create_message_embedding(
         self,
         message_content: str,
@@ -82,24 +136,16 @@ class EmbeddingService:
         # Generate a unique UUID for the vector
         vector_id = str(uuid.uuid4())
         
-        embedded_message = f"Channel: {channel_name} - User: {user_name} - Message: {message_content}"
+        embedded_message = self.format_message(channel_name, user_name, message_content)
 
         # Generate the embedding
         embedding = self.generate_embedding(embedded_message)
         
         # Prepare metadata
-        metadata = {
-            "message_id": message_id,
-            "embedded_content": embedded_message,
-            "user_name": user_name,
-            "channel_name": channel_name,
-            "content": message_content,
-            "user_id": user_id,
-            "channel_id": channel_id,
-            "parent_id": parent_id if parent_id else "",
-            "has_file": bool(file_name),
-            "file_name": file_name if file_name else ""
-        }
+        metadata = self.message_metadata(
+            embedded_message, message_content, channel_name, user_name,
+            message_id, user_id, channel_id, parent_id, file_name
+        )
         
         # Upsert to pinecone
         self.upsert_embedding(vector_id, embedding, metadata)
@@ -120,7 +166,7 @@ class EmbeddingService:
     ) -> bool:
         """Update existing message embedding"""
         # Generate new embedding for updated content
-        new_embedded_message = f"Channel: {channel_name} - User: {user_name} - Message: {new_content}"
+        new_embedded_message = self.format_message(channel_name, user_name, new_content)
 
         new_embedding = self.generate_embedding(new_embedded_message)
         
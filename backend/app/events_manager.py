@@ -1,7 +1,17 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from .websocket_manager import manager
 
 class EventsManager:
+    @staticmethod
+    async def start():
+        """Start the backplane that shares events between workers"""
+        await manager.start()
+
+    @staticmethod
+    async def stop():
+        """Stop the backplane"""
+        await manager.stop()
+
     @staticmethod
     async def connect(websocket: Any, user_id: int, channel_ids: List[int], max_connections_per_user: int, max_total_connections: int) -> bool:
         """Connect a WebSocket and initialize its channels"""
@@ -47,6 +57,16 @@ class EventsManager:
         """Remove a channel from a user's WebSocket connection"""
         manager.remove_channel_for_user(user_id, channel_id)
     
+    @staticmethod
+    def get_user_status(user_id: int) -> str:
+        """Get a user's status (online, away or offline) across all workers"""
+        return manager.get_user_status(user_id)
+
+    @staticmethod
+    async def broadcast_to_channel(message: Dict[str, Any], channel_id: int):
+        """Broadcast a raw event to all members of a channel"""
+        await manager.broadcast_to_channel(message, channel_id)
+    
     @staticmethod
     async def broadcast_channel_update(channel_id: int, channel_data: Dict[str, Any]):
         """Broadcast channel update event to all members"""
@@ -117,9 +137,9 @@ class EventsManager:
         }, channel_id)
     
     @staticmethod
-    async def broadcast_message_created(channel_id: int, message: Any, user: Any):
-        """Broadcast new message event"""
-        await manager.broadcast_to_channel({
+    async def broadcast_message_created(channel_id: int, message: Any, user: Any, stream_id: Optional[str] = None):
+        """Broadcast new message event. `stream_id` ties an AI reply to the ai_message_delta events it was streamed as."""
+        event = {
             "type": "new_message",
             "channel_id": channel_id,
             "message": {
@@ -138,8 +158,31 @@ class EventsManager:
                     "picture": user.picture
                 }
             }
+        }
+        if stream_id is not None:
+            event["stream_id"] = stream_id
+        await manager.broadcast_to_channel(event, channel_id)
+
+    @staticmethod
+    async def broadcast_ai_message_delta(channel_id: int, stream_id: str, user_id: int, delta: str):
+        """Broadcast the next piece of an AI reply that is still being generated"""
+        await manager.broadcast_to_channel({
+            "type": "ai_message_delta",
+            "channel_id": channel_id,
+            "stream_id": stream_id,
+            "user_id": user_id,
+            "delta": delta
         }, channel_id)
     
+    @staticmethod
+    async def broadcast_ai_message_cancelled(channel_id: int, stream_id: str):
+        """Broadcast that a streamed AI reply was abandoned and its partial text should be dropped"""
+        await manager.broadcast_to_channel({
+            "type": "ai_message_cancelled",
+            "channel_id": channel_id,
+            "stream_id": stream_id
+        }, channel_id)
+
     @staticmethod
     async def broadcast_root_message_update(channel_id: int, root_message: Any):
         """Broadcast root message update event (for replies)"""
@@ -155,6 +198,8 @@ class EventsManager:
                 "channel_id": root_message.channel_id,
                 "parent_id": root_message.parent_id,
                 "has_replies": True,
+                "reply_count": root_message.reply_count,
+                "last_reply_at": root_message.last_reply_at.isoformat() if root_message.last_reply_at else None,
                 "user": {
                     "id": root_message.user.id,
                     "email": root_message.user.email,
@@ -0,0 +1,110 @@
+"""Auth0 signing keys for token verification.
+
+The JWKS document is fetched once at startup and parsed into ready-to-use key objects
+indexed by kid, so verifying a token is a dict lookup plus the signature check. Keys
+are refreshed in the background every JWKS_CACHE_SECONDS, and on demand when a token
+names a kid we don't know (Auth0 rotated its keys). On-demand refreshes are spaced at
+least JWKS_MIN_REFRESH_SECONDS apart so tokens with made-up kids can't hammer Auth0.
+A failed refresh keeps the previous keys.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+import httpx
+from jose import jwk
+from jose.backends.base import Key
+from jose.exceptions import JWKError
+
+logger = logging.getLogger(__name__)
+
+JWKS_CACHE_SECONDS = float(os.getenv('JWKS_CACHE_SECONDS', '3600'))
+JWKS_MIN_REFRESH_SECONDS = float(os.getenv('JWKS_MIN_REFRESH_SECONDS', '60'))
+JWKS_REQUEST_TIMEOUT = float(os.getenv('JWKS_REQUEST_TIMEOUT', '10'))
+
+ALGORITHM = "RS256"
+
+def parse_jwks(jwks: dict) -> Dict[str, Key]:
+    """Build verification keys for the RSA signing keys in a JWKS document"""
+    keys = {}
+    for key_data in jwks.get("keys", []):
+        if key_data.get("kty") != "RSA" or key_data.get("use", "sig") != "sig" or "kid" not in key_data:
+            continue
+        try:
+            keys[key_data["kid"]] = jwk.construct(key_data, algorithm=ALGORITHM)
+        except JWKError as e:
+            logger.warning(f"Skipping unusable JWKS key {key_data['kid']}: {str(e)}")
+    return keys
+
+class JWKSManager:
+    def __init__(
+        self,
+        jwks_url: str,
+        ttl: float = JWKS_CACHE_SECONDS,
+        min_refresh_interval: float = JWKS_MIN_REFRESH_SECONDS
+    ):
+        self.jwks_url = jwks_url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: Dict[str, Key] = {}
+        self._last_attempt = 0.0
+        self._lock = asyncio.Lock()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Fetch the keys and start the background refresh"""
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"Error fetching Auth0 signing keys at startup: {str(e)}")
+        self._task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    async def get_key(self, kid: str) -> Optional[Key]:
+        """The verification key for `kid`, refreshing once if it is unknown"""
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        if time.monotonic() - self._last_attempt >= self.min_refresh_interval:
+            logger.info(f"Unknown signing key {kid}, refreshing Auth0 signing keys")
+            await self.refresh()
+        return self._keys.get(kid)
+
+    async def refresh(self):
+        """Fetch the JWKS document and swap in its keys.
+
+        Concurrent callers share one request: whoever waited on the lock while another
+        refresh ran returns without fetching again.
+        """
+        requested_at = time.monotonic()
+        async with self._lock:
+            if self._last_attempt >= requested_at:
+                return
+            self._last_attempt = time.monotonic()
+            if self._client is None:
+                self._client = httpx.AsyncClient(timeout=JWKS_REQUEST_TIMEOUT)
+            response = await self._client.get(self.jwks_url)
+            response.raise_for_status()
+            keys = parse_jwks(response.json())
+            if not keys:
+                raise ValueError(f"No usable signing keys in {self.jwks_url}")
+            self._keys = keys
+            logger.info(f"Loaded {len(keys)} Auth0 signing keys")
+
+    async def _refresh_periodically(self):
+        while True:
+            await asyncio.sleep(self.ttl if self._keys else self.min_refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Error refreshing Auth0 signing keys, keeping the current ones: {str(e)}")
@@ -8,6 +8,12 @@ from dotenv import load_dotenv
 import logging
 from .middleware import SearchRateLimitMiddleware, CacheControlMiddleware
 from .embedding_service import embedding_service
+from .embedding_pipeline import embedding_pipeline
+from .auth0 import jwks_manager
+from .rate_limit import rate_limit_store
+from .vector_store import vector_store
+from .events_manager import events
+from .persona_replies import persona_replies
 
 # Import all routers
 from .routers import (
@@ -19,7 +25,8 @@ from .routers import (
     messages,
     reactions,
     websockets,
-    ai
+    ai,
+    metrics
 )
 
 # Configure logging for errors only
@@ -72,6 +79,50 @@ app.add_middleware(
 )
 app.add_middleware(CacheControlMiddleware)
 
+@app.on_event("startup")
+async def start_jwks_manager():
+    await jwks_manager.start()
+
+@app.on_event("shutdown")
+async def stop_jwks_manager():
+    await jwks_manager.stop()
+
+@app.on_event("startup")
+async def start_rate_limit_store():
+    await rate_limit_store.start()
+
+@app.on_event("shutdown")
+async def stop_rate_limit_store():
+    await rate_limit_store.stop()
+
+# Shutdown handlers run in registration order: persona reply jobs must stop while the
+# backplane can still carry their ai_message_cancelled events to other workers
+@app.on_event("startup")
+async def start_persona_replies():
+    await persona_replies.start()
+
+@app.on_event("shutdown")
+async def stop_persona_replies():
+    await persona_replies.stop()
+
+@app.on_event("startup")
+async def start_events_backplane():
+    await events.start()
+
+@app.on_event("shutdown")
+async def stop_events_backplane():
+    await events.stop()
+
+@app.on_event("startup")
+async def start_embedding_pipeline():
+    await vector_store.start()
+    await embedding_pipeline.start()
+
+@app.on_event("shutdown")
+async def stop_embedding_pipeline():
+    await embedding_pipeline.stop()
+    await vector_store.stop()
+
 # Create database tables
 # models.Base.metadata.create_all(bind=engine)
 
@@ -86,6 +137,8 @@ app.include_router(messages.router, prefix=f"{root_path}/messages", tags=["messa
 app.include_router(reactions.router, prefix=f"{root_path}/reactions", tags=["reactions"])
 app.include_router(websockets.router, prefix=root_path, tags=["websockets"])
 app.include_router(ai.router, prefix=f"{root_path}/ai", tags=["ai"])
+# Internal only: served only to requests carrying METRICS_TOKEN
+app.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
 
 if __name__ == "__main__":
     import uvicorn
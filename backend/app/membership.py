@@ -0,0 +1,89 @@
+"""Channel membership checks shared by the routers and the websocket handler.
+
+The ids of a user's channels are read with one indexed query on user_channels and cached
+per worker, so authorizing a request is a set lookup instead of loading the channel's
+member list. The channel CRUD functions invalidate the users whose membership they change,
+and member_joined/member_left and subscription events on the backplane invalidate them on
+the other workers. Entries also expire after MEMBERSHIP_CACHE_SECONDS, which bounds
+staleness for changes that are not broadcast, such as channel deletion.
+
+Invalidating a user also bumps their search cache `member:<id>` tag and the channel
+directory tag, since their searchable channels and the directory's member counts and
+member filters depend on the same rows.
+"""
+import logging
+import os
+from typing import FrozenSet
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import models
+from .auth_cache import ExpiringCache
+from .search_cache import search_cache, member_tag, CHANNELS_TAG
+
+logger = logging.getLogger(__name__)
+
+MEMBERSHIP_CACHE_SECONDS = float(os.getenv('MEMBERSHIP_CACHE_SECONDS', '60'))
+MEMBERSHIP_CACHE_SIZE = int(os.getenv('MEMBERSHIP_CACHE_SIZE', '10000'))
+
+MEMBERSHIP_EVENTS = {"member_joined", "member_left"}
+
+def _load_channel_ids(db: Session, user_id: int) -> FrozenSet[int]:
+    rows = db.query(models.UserChannel.channel_id).filter(models.UserChannel.user_id == user_id).all()
+    return frozenset(row.channel_id for row in rows)
+
+class MembershipService:
+    def __init__(self, max_size: int = MEMBERSHIP_CACHE_SIZE, ttl: float = MEMBERSHIP_CACHE_SECONDS):
+        self.ttl = ttl
+        self._cache = ExpiringCache(max_size)
+        # Bumped by every invalidation, so a load that raced one is not cached
+        self._epoch = 0
+
+    def channel_ids(self, db: Session, user_id: int) -> FrozenSet[int]:
+        """Ids of every channel the user belongs to"""
+        channel_ids = self._cache.get(user_id)
+        if channel_ids is None:
+            epoch = self._epoch
+            channel_ids = _load_channel_ids(db, user_id)
+            self._store(user_id, channel_ids, epoch)
+        return channel_ids
+
+    async def channel_ids_async(self, db: AsyncSession, user_id: int) -> FrozenSet[int]:
+        """Same as channel_ids, loading through an AsyncSession"""
+        channel_ids = self._cache.get(user_id)
+        if channel_ids is None:
+            epoch = self._epoch
+            channel_ids = await db.run_sync(_load_channel_ids, user_id)
+            self._store(user_id, channel_ids, epoch)
+        return channel_ids
+
+    def is_member(self, db: Session, user_id: int, channel_id: int) -> bool:
+        return channel_id in self.channel_ids(db, user_id)
+
+    async def is_member_async(self, db: AsyncSession, user_id: int, channel_id: int) -> bool:
+        return channel_id in await self.channel_ids_async(db, user_id)
+
+    def _store(self, user_id: int, channel_ids: FrozenSet[int], epoch: int):
+        if epoch == self._epoch:
+            self._cache.put(user_id, channel_ids, self.ttl)
+
+    def invalidate(self, *user_ids: int):
+        self._epoch += 1
+        for user_id in user_ids:
+            self._cache.invalidate(user_id)
+        search_cache.invalidate(CHANNELS_TAG, *[member_tag(user_id) for user_id in user_ids])
+
+    def invalidate_for_event(self, message: dict):
+        """Drop the member named by a member_joined or member_left channel event"""
+        if message.get("type") not in MEMBERSHIP_EVENTS:
+            return
+        user_id = message.get("user_id") or (message.get("user") or {}).get("id")
+        if user_id is not None:
+            self.invalidate(user_id)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+# Create a singleton instance
+membership = MembershipService()
@@ -1,14 +1,16 @@
-import time
-import os
-from collections import defaultdict
+import math
 from fastapi import FastAPI, Request
 from starlette.middleware.base import BaseHTTPMiddleware
 from fastapi.responses import JSONResponse
 import logging
 
+from .auth0 import verify_token
+from .rate_limit import RateLimiter, rate_limit_store
+
 logger = logging.getLogger(__name__)
 
 class SearchRateLimitMiddleware(BaseHTTPMiddleware):
+    """Limits search requests per authenticated user, or per IP for requests without a valid token"""
     def __init__(
         self,
         app: FastAPI,
@@ -16,57 +18,39 @@ class SearchRateLimitMiddleware(BaseHTTPMiddleware):
         max_requests: int = 60,  # 60 requests per minute
     ):
         super().__init__(app)
-        self.request_counts = defaultdict(list)
-        self.WINDOW_SIZE = window_size
-        self.MAX_REQUESTS = max_requests
+        self.limiter = RateLimiter(rate_limit_store, "search", max_requests, window_size)
         logger.info(f"Initialized SearchRateLimitMiddleware with {max_requests} requests per {window_size} seconds")
 
     async def dispatch(self, request: Request, call_next):
         # Only apply to search endpoints
         if request.url.path.startswith("/search/"):
-            # Get client identifier (IP + user ID if authenticated)
-            client_ip = request.client.host
-            try:
-                # Try to get user ID from auth token for more precise rate limiting
-                user = request.state.user
-                client_id = f"{client_ip}:{user.id}"
-            except:
-                client_id = client_ip
-
-            now = time.time()
-            
-            # Remove old requests outside the window
-            self.request_counts[client_id] = [
-                req_time for req_time in self.request_counts[client_id]
-                if now - req_time < self.WINDOW_SIZE
-            ]
-            
-            # Check if rate limit is exceeded
-            if len(self.request_counts[client_id]) >= self.MAX_REQUESTS:
-                logger.warning(f"Rate limit exceeded for client {client_id}")
+            client_id = await self._client_id(request)
+            result = await self.limiter.hit(client_id)
+            if not result.allowed:
                 return JSONResponse(
                     status_code=429,
                     content={
                         "detail": "Search rate limit exceeded. Please try again later.",
-                        "retry_after": int(self.WINDOW_SIZE - (now - self.request_counts[client_id][0]))
-                    }
+                        "retry_after": math.ceil(result.retry_after)
+                    },
+                    headers={"Retry-After": str(math.ceil(result.retry_after))}
                 )
-            
-            # Add current request
-            self.request_counts[client_id].append(now)
-            
-            # Clean up old entries periodically
-            if len(self.request_counts) > 10000:  # Prevent memory leaks
-                self._cleanup_old_entries(now)
 
         return await call_next(request)
 
-    def _cleanup_old_entries(self, current_time: float):
-        """Remove entries older than window size to prevent memory leaks"""
-        for client_id in list(self.request_counts.keys()):
-            if not self.request_counts[client_id] or \
-               current_time - self.request_counts[client_id][-1] >= self.WINDOW_SIZE:
-                del self.request_counts[client_id]
+    async def _client_id(self, request: Request) -> str:
+        """The token's subject when the request carries a valid token, else the client IP.
+
+        Verified tokens are cached, so the endpoint's own get_current_user doesn't verify again.
+        """
+        auth_header = request.headers.get("Authorization", "")
+        if auth_header.startswith("Bearer "):
+            try:
+                payload = await verify_token(auth_header.split(" ", 1)[1])
+                return f"user:{payload['sub']}"
+            except Exception:
+                pass
+        return f"ip:{request.client.host}"
 
 class CacheControlMiddleware(BaseHTTPMiddleware):
     """Add cache control headers for search results"""
@@ -1,5 +1,6 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Text, Float
-from sqlalchemy.orm import relationship
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Text, Float, Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from .database import Base
 import sqlalchemy as sa
@@ -23,6 +24,12 @@ class User(Base):
     ai_conversations = relationship("AIConversation", back_populates="user")
     ai_messages = relationship("AIMessage", back_populates="user")
 
+    __table_args__ = (
+        # Trigram indexes for substring search (requires the pg_trgm extension)
+        sa.Index('idx_users_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        sa.Index('idx_users_email_trgm', 'email', postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'}),
+    )
+
 class Channel(Base):
     __tablename__ = "channels"
 
@@ -47,6 +54,8 @@ class Channel(Base):
             'NOT is_dm OR (is_dm AND is_private)',
             name='dm_must_be_private'
         ),
+        sa.Index('idx_channels_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        sa.Index('idx_channels_description_trgm', 'description', postgresql_using='gin', postgresql_ops={'description': 'gin_trgm_ops'}),
     )
 
 class Message(Base):
@@ -60,19 +69,46 @@ class Message(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     channel_id = Column(Integer, ForeignKey("channels.id"))
     parent_id = Column(Integer, ForeignKey("messages.id"), unique=True, nullable=True)
+    # Replies form a chain through parent_id; every reply also records the message that
+    # started the chain and its 1-based position in it, so a thread reads in one query.
+    # Both are NULL on top-level messages.
+    thread_root_id = Column(Integer, ForeignKey("messages.id"), nullable=True)
+    thread_position = Column(Integer, nullable=True)
+    # Thread summary kept on the root, updated in the same transaction as each reply
+    reply_count = Column(Integer, nullable=False, default=0, server_default='0')
+    last_reply_at = Column(DateTime(timezone=True), nullable=True)
     vector_id = Column(String(36), unique=True, index=True, nullable=True)
     from_ai = Column(Boolean, default=False)
+    # Full-text search document, maintained by Postgres whenever content changes.
+    # Deferred so ordinary message loads don't fetch it.
+    content_tsv = deferred(Column(
+        TSVECTOR,
+        Computed("to_tsvector('english', coalesce(content, ''))", persisted=True),
+        nullable=True
+    ))
 
     user = relationship("User", back_populates="messages")
     channel = relationship("Channel", back_populates="messages")
     reactions = relationship("MessageReaction", back_populates="message")
     
     # Add relationships for parent/child messages
-    parent = relationship("Message", remote_side=[id], backref="reply", uselist=False)
+    parent = relationship("Message", remote_side=[id], foreign_keys=[parent_id], backref="reply", uselist=False)
     files = relationship("FileUpload", back_populates="message")
 
+    @property
+    def has_replies(self) -> bool:
+        return bool(self.reply_count)
+
     __table_args__ = (
         sa.UniqueConstraint('parent_id', name='unique_reply_message'),
+        sa.Index('idx_messages_content_tsv', 'content_tsv', postgresql_using='gin'),
+        # Serves newest-first channel history and its keyset cursors
+        sa.Index('idx_messages_channel_parent_created_at', channel_id, parent_id, created_at.desc(), id.desc()),
+        # Latest activity per channel, including replies
+        sa.Index('idx_messages_channel_created_at', channel_id, created_at.desc()),
+        # A user's most recent messages (persona profiles, from_user search filter)
+        sa.Index('idx_messages_user_created_at', user_id, created_at.desc()),
+        sa.UniqueConstraint('thread_root_id', 'thread_position', name='unique_thread_position'),
     )
 
 class UserChannel(Base):
@@ -81,6 +117,11 @@ class UserChannel(Base):
     user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
     channel_id = Column(Integer, ForeignKey("channels.id"), primary_key=True)
 
+    __table_args__ = (
+        # The primary key covers lookups by user; this covers channel member lists
+        sa.Index('idx_user_channels_channel_id', 'channel_id'),
+    )
+
 class ChannelRole(Base):
     __tablename__ = "channel_roles"
 
@@ -93,6 +134,10 @@ class ChannelRole(Base):
     channel = relationship("Channel", back_populates="roles")
     user = relationship("User")
 
+    __table_args__ = (
+        sa.Index('idx_channel_roles_channel_user', 'channel_id', 'user_id'),
+    )
+
 class Reaction(Base):
     __tablename__ = "reactions"
 
@@ -141,6 +186,7 @@ class FileUpload(Base):
         sa.Index('idx_file_uploads_message_id', 'message_id'),
         sa.Index('idx_file_uploads_uploaded_by', 'uploaded_by'),
         sa.Index('idx_file_uploads_uploaded_at', 'uploaded_at'),
+        sa.Index('idx_file_uploads_file_name_trgm', 'file_name', postgresql_using='gin', postgresql_ops={'file_name': 'gin_trgm_ops'}),
     )
 
 class AIConversation(Base):
@@ -157,6 +203,10 @@ class AIConversation(Base):
     channel = relationship("Channel", back_populates="ai_conversations")
     messages = relationship("AIMessage", back_populates="conversation")
 
+    __table_args__ = (
+        sa.Index('idx_ai_conversations_channel_user_last_message', channel_id, user_id, last_message.desc()),
+    )
+
 class AIMessage(Base):
     __tablename__ = "ai_messages"
 
@@ -174,3 +224,41 @@ class AIMessage(Base):
     user = relationship("User", back_populates="ai_messages")
     channel = relationship("Channel", back_populates="ai_messages")
 
+    __table_args__ = (
+        sa.Index('idx_ai_messages_conversation_created_at', 'conversation_id', 'created_at'),
+    )
+
+class EmbeddingOutbox(Base):
+    """Pending vector index operation, written in the same transaction as the message change"""
+    __tablename__ = "embedding_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # No foreign key: delete operations outlive their message
+    message_id = Column(Integer, nullable=False)
+    operation = Column(String(16), nullable=False)  # 'upsert' or 'delete'
+    vector_id = Column(String(36), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default='0')
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        sa.Index('idx_embedding_outbox_next_attempt_at', 'next_attempt_at'),
+    )
+
+class EmbeddingCacheEntry(Base):
+    """Embedding vector keyed by a hash of the model name and the embedded text"""
+    __tablename__ = "embedding_cache"
+
+    content_hash = Column(String(64), primary_key=True)
+    model = Column(String(100), nullable=False)
+    embedding = Column(sa.LargeBinary, nullable=False)  # packed float32 values
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class RateLimitBucket(Base):
+    """GCRA state for one rate limit key, shared by every worker"""
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String(255), primary_key=True)
+    # Theoretical arrival time of the next request, as epoch seconds
+    tat = Column(Float, nullable=False)
@@ -0,0 +1,174 @@
+"""Background AI persona replies for DM channels.
+
+When someone messages a user who is not online (or their own AI channel), the reply is
+generated by a job on this worker instead of inside the request, so sending a message
+never waits on retrieval or the model. Jobs are keyed by channel and responder:
+
+- A new message while a job is waiting restarts its debounce timer, and messages sent in
+  quick succession get one reply that answers all of them. Jobs still fire after
+  PERSONA_REPLY_MAX_WAIT_SECONDS even if the sender keeps typing.
+- A new message while a reply is streaming cancels it and starts over with every
+  message that reply had not answered yet.
+- A job is cancelled when its responder comes online, whichever worker they connect
+  to, since they can now answer for themselves.
+
+Streams that are abandoned or fail before the reply is saved are announced with an
+`ai_message_cancelled` event so clients can drop the partial text. Database work goes
+through an AsyncSession so jobs never block the event loop.
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from . import schemas
+from .ai_service import dm_persona_response_stream
+from .ai_streaming import new_stream_id, stream_to_channel
+from .crud import aio
+from .database import AsyncSessionLocal
+from .events_manager import events
+from .websocket_manager import manager
+
+logger = logging.getLogger(__name__)
+
+PERSONA_REPLY_DEBOUNCE_SECONDS = float(os.getenv('PERSONA_REPLY_DEBOUNCE_SECONDS', '2'))
+PERSONA_REPLY_MAX_WAIT_SECONDS = float(os.getenv('PERSONA_REPLY_MAX_WAIT_SECONDS', '10'))
+
+@dataclass
+class PersonaReplyJob:
+    channel_id: int
+    sender_id: int
+    responder_id: int
+    # Messages the reply has to answer, oldest first
+    prompts: List[str]
+    trigger_message_id: int
+    first_scheduled_at: float
+    task: Optional[asyncio.Task] = None
+    stream_id: Optional[str] = None
+    cancelled_by: Optional[str] = None
+
+    @property
+    def key(self) -> Tuple[int, int]:
+        return (self.channel_id, self.responder_id)
+
+    @property
+    def cancel_when_online(self) -> bool:
+        # AI channel replies answer the user themselves and must not be cancelled by their presence
+        return self.sender_id != self.responder_id
+
+class PersonaReplyScheduler:
+    def __init__(
+        self,
+        debounce: float = PERSONA_REPLY_DEBOUNCE_SECONDS,
+        max_wait: float = PERSONA_REPLY_MAX_WAIT_SECONDS
+    ):
+        self.debounce = debounce
+        self.max_wait = max_wait
+        self._jobs: Dict[Tuple[int, int], PersonaReplyJob] = {}
+        self.counts = {"scheduled": 0, "replied": 0, "superseded": 0, "responder_online": 0, "failed": 0}
+
+    async def start(self):
+        manager.add_status_listener(self.on_status_change)
+
+    async def stop(self):
+        jobs = list(self._jobs.values())
+        for job in jobs:
+            self._cancel(job, "shutdown")
+        # Let cancelled jobs announce their abandoned streams before the backplane stops
+        await asyncio.gather(*[job.task for job in jobs if job.task], return_exceptions=True)
+
+    def schedule(self, channel_id: int, sender_id: int, responder_id: int, prompt: str, trigger_message_id: int):
+        """Queue a reply from `responder_id` to a message, folding it into any pending reply"""
+        self.counts["scheduled"] += 1
+        previous = self._jobs.get((channel_id, responder_id))
+        if previous is not None:
+            self._cancel(previous, "superseded")
+        job = PersonaReplyJob(
+            channel_id=channel_id,
+            sender_id=sender_id,
+            responder_id=responder_id,
+            prompts=(previous.prompts if previous else []) + [prompt],
+            trigger_message_id=trigger_message_id,
+            first_scheduled_at=previous.first_scheduled_at if previous else time.monotonic()
+        )
+        self._jobs[job.key] = job
+        job.task = asyncio.create_task(self._run(job))
+
+    def cancel_for_responder(self, user_id: int, reason: str):
+        for job in list(self._jobs.values()):
+            if job.responder_id == user_id and job.cancel_when_online:
+                self._cancel(job, reason)
+
+    def on_status_change(self, user_id: int, status: str):
+        if status == "online":
+            self.cancel_for_responder(user_id, "responder_online")
+
+    def _cancel(self, job: PersonaReplyJob, reason: str):
+        if self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+        if job.task and not job.task.done():
+            job.cancelled_by = reason
+            job.task.cancel()
+
+    def _delay(self, job: PersonaReplyJob) -> float:
+        remaining = self.max_wait - (time.monotonic() - job.first_scheduled_at)
+        return max(min(self.debounce, remaining), 0)
+
+    async def _run(self, job: PersonaReplyJob):
+        try:
+            await asyncio.sleep(self._delay(job))
+            if job.cancel_when_online and manager.get_user_status(job.responder_id) == "online":
+                self.counts["responder_online"] += 1
+                return
+
+            job.stream_id = new_stream_id()
+            async with AsyncSessionLocal() as db:
+                deltas = dm_persona_response_stream(
+                    db, "\n".join(job.prompts), job.sender_id, job.responder_id, job.channel_id, job.trigger_message_id
+                )
+                ai_response = await stream_to_channel(deltas, job.channel_id, job.responder_id, job.stream_id)
+
+                # The reply is complete; later messages start a new job instead of replacing it
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+                ai_message = await aio.create_message(
+                    db,
+                    channel_id=job.channel_id,
+                    user_id=job.responder_id,
+                    message=schemas.MessageCreate(content=ai_response),
+                    from_ai=True,
+                    response_model=schemas.Message
+                )
+            # Saved: from here on a failure must not tell clients to drop the reply
+            stream_id, job.stream_id = job.stream_id, None
+            await events.broadcast_message_created(job.channel_id, ai_message, ai_message.user, stream_id=stream_id)
+            self.counts["replied"] += 1
+        except asyncio.CancelledError:
+            if job.cancelled_by in self.counts:
+                self.counts[job.cancelled_by] += 1
+            await self._announce_cancelled(job)
+            raise
+        except Exception as e:
+            self.counts["failed"] += 1
+            logger.error(f"Error generating AI reply in channel {job.channel_id}: {e}")
+            await self._announce_cancelled(job)
+        finally:
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+
+    async def _announce_cancelled(self, job: PersonaReplyJob):
+        """Tell clients to drop the partial text of a reply that will not be saved"""
+        if job.stream_id is None:
+            return
+        try:
+            await events.broadcast_ai_message_cancelled(job.channel_id, job.stream_id)
+        except Exception as e:
+            logger.warning(f"Error announcing cancelled AI reply in channel {job.channel_id}: {e}")
+
+    def stats(self) -> dict:
+        return {"pending": len(self._jobs), **self.counts}
+
+# Create a singleton instance
+persona_replies = PersonaReplyScheduler()
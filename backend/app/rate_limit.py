@@ -0,0 +1,163 @@
+"""Request rate limiting with GCRA (generic cell rate algorithm).
+
+Each key stores a single number, the theoretical arrival time (TAT) of its next request,
+so checking a request is constant time whatever the limit. A limit of `limit` requests
+per `window` seconds spaces requests `window / limit` apart and allows bursts of up to
+`limit`. The TAT lives in a pluggable store selected by RATE_LIMIT_STORE: 'memory' keeps
+it per worker, 'postgres' shares it between workers in the rate_limit_buckets table.
+Store failures are logged and let the request through.
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from . import models
+from .auth0 import get_current_user
+from .database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_STORE = os.getenv('RATE_LIMIT_STORE', 'memory').lower()
+# Keys tracked per worker by the memory store
+RATE_LIMIT_MEMORY_KEYS = int(os.getenv('RATE_LIMIT_MEMORY_KEYS', '100000'))
+# How often the postgres store deletes buckets that have fully drained
+RATE_LIMIT_PURGE_SECONDS = float(os.getenv('RATE_LIMIT_PURGE_SECONDS', '300'))
+
+AI_RATE_LIMIT_REQUESTS = int(os.getenv('AI_RATE_LIMIT_REQUESTS', '20'))
+AI_RATE_LIMIT_WINDOW = int(os.getenv('AI_RATE_LIMIT_WINDOW', '60'))
+
+class RateLimitStore(ABC):
+    """Holds the TAT of every key and applies GCRA to it atomically"""
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    async def acquire(self, key: str, interval: float, window: float, now: float) -> float:
+        """Count a request against `key` if it is allowed.
+
+        Returns 0 when allowed, otherwise the seconds until it would be.
+        """
+
+class MemoryRateLimitStore(RateLimitStore):
+    """Per-worker store. Keys are kept in update order so drained ones are evicted from the front."""
+    def __init__(self, max_keys: int = RATE_LIMIT_MEMORY_KEYS):
+        self.max_keys = max_keys
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+
+    async def acquire(self, key: str, interval: float, window: float, now: float) -> float:
+        tat = max(self._tats.get(key, now), now) + interval
+        if tat - now > window:
+            return tat - window - now
+        self._tats[key] = tat
+        self._tats.move_to_end(key)
+        while self._tats and (len(self._tats) > self.max_keys or next(iter(self._tats.values())) <= now):
+            self._tats.popitem(last=False)
+        return 0
+
+class PostgresRateLimitStore(RateLimitStore):
+    """Store shared by all workers. Each request is one upsert that only advances the TAT when allowed."""
+    def __init__(self, purge_interval: float = RATE_LIMIT_PURGE_SECONDS):
+        self.purge_interval = purge_interval
+        self._purge_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._purge_task = asyncio.create_task(self._purge_periodically())
+
+    async def stop(self):
+        if self._purge_task:
+            self._purge_task.cancel()
+            self._purge_task = None
+
+    async def acquire(self, key: str, interval: float, window: float, now: float) -> float:
+        bucket = models.RateLimitBucket
+        next_tat = func.greatest(bucket.tat, now) + interval
+        statement = (insert(bucket)
+                     .values(key=key, tat=now + interval)
+                     .on_conflict_do_update(
+                         index_elements=[bucket.key],
+                         set_={"tat": next_tat},
+                         where=next_tat - now <= window
+                     )
+                     .returning(bucket.tat))
+        async with AsyncSessionLocal() as db:
+            allowed = (await db.execute(statement)).first() is not None
+            await db.commit()
+            if allowed:
+                return 0
+            tat = (await db.execute(select(bucket.tat).where(bucket.key == key))).scalar()
+        # The bucket may have been purged in between; the next request will then pass
+        return max((tat or now) + interval - window - now, 0)
+
+    async def purge(self):
+        """Delete buckets whose TAT has passed; they behave exactly like missing ones"""
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(models.RateLimitBucket).where(models.RateLimitBucket.tat < time.time()))
+            await db.commit()
+
+    async def _purge_periodically(self):
+        while True:
+            await asyncio.sleep(self.purge_interval)
+            try:
+                await self.purge()
+            except Exception as e:
+                logger.warning(f"Error purging rate limit buckets: {e}")
+
+def create_rate_limit_store() -> RateLimitStore:
+    """Build the store selected by RATE_LIMIT_STORE ('memory' or 'postgres')"""
+    if RATE_LIMIT_STORE == 'postgres':
+        return PostgresRateLimitStore()
+    return MemoryRateLimitStore()
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    retry_after: float = 0
+
+class RateLimiter:
+    """Allows `limit` requests per `window` seconds for each key"""
+    def __init__(self, store: RateLimitStore, name: str, limit: int, window: float):
+        self.store = store
+        self.name = name
+        self.limit = limit
+        self.window = window
+
+    async def hit(self, key: str) -> RateLimitResult:
+        try:
+            retry_after = await self.store.acquire(
+                f"{self.name}:{key}", self.window / self.limit, self.window, time.time()
+            )
+        except Exception as e:
+            logger.warning(f"Rate limit store error, allowing request: {e}")
+            return RateLimitResult(allowed=True)
+        if retry_after > 0:
+            logger.warning(f"Rate limit '{self.name}' exceeded for {key}")
+            return RateLimitResult(allowed=False, retry_after=retry_after)
+        return RateLimitResult(allowed=True)
+
+# Create a singleton instance
+rate_limit_store = create_rate_limit_store()
+
+ai_rate_limiter = RateLimiter(rate_limit_store, "ai", AI_RATE_LIMIT_REQUESTS, AI_RATE_LIMIT_WINDOW)
+
+async def limit_ai_requests(current_user: models.User = Depends(get_current_user)):
+    """Dependency for endpoints that call the model: AI_RATE_LIMIT_REQUESTS per user per window"""
+    result = await ai_rate_limiter.hit(f"user:{current_user.auth0_id}")
+    if not result.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="AI rate limit exceeded. Please try again later.",
+            headers={"Retry-After": str(math.ceil(result.retry_after))}
+        )
@@ -9,6 +9,7 @@ from .files import router as files_router
 from .search import router as search_router
 from .websockets import router as websockets_router
 from .ai import router as ai_router
+from .metrics import router as metrics_router
 
 # Export all routers for easy access
 __all__ = [
@@ -21,4 +22,5 @@ __all__ = [
     "search_router",
     "websockets_router",
     "ai_router",
+    "metrics_router",
 ] 
\ No newline at end of file
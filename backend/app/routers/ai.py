@@ -1,4 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
 import logging
@@ -7,22 +9,76 @@ from datetime import datetime, timedelta, timezone
 from .. import models, schemas
 from ..database import get_db
 from ..auth0 import get_current_user
-from ..ai_service import summarize_messages
+from ..rate_limit import limit_ai_requests
+from ..ai_service import (
+    AI_UNAVAILABLE_MESSAGE,
+    summarize_messages,
+    summarize_messages_stream,
+    ai_query_response,
+    ai_query_response_stream
+)
+from ..ai_streaming import coalesce, sse_event
 from ..crud.ai import (
     get_conversation,
     get_channel_conversations,
     create_conversation,
+    create_ai_message,
     add_message_to_conversation,
+    get_chat_history,
     delete_conversation
 )
 from ..crud.channels import get_channel
 from ..crud.messages import get_channel_messages, create_message
 from ..events_manager import events
+from ..membership import membership
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Keep proxies such as nginx from buffering the event stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+AI_STREAM_INTERRUPTED_MESSAGE = "The AI response was interrupted."
+
+async def _stream_deltas(deltas, parts: list):
+    """SSE delta frames for a completion, collecting its text into `parts`"""
+    async for chunk in coalesce(deltas):
+        parts.append(chunk)
+        yield sse_event("delta", {"text": chunk})
+
+def _stream_error(e: Exception) -> str:
+    """The `error` frame sent when a completion fails after some of it was streamed"""
+    logger.error(f"AI response stream failed: {e}")
+    return sse_event("error", {"detail": AI_STREAM_INTERRUPTED_MESSAGE})
+
+async def _stream_assistant_turn(db: Session, conversation_id: int, channel_id: int, user_id: int, deltas):
+    """SSE frames for an assistant turn, which is saved however the stream ends.
+
+    A turn cut short by a failed completion or a client disconnect is saved with the
+    text received so far and `parameters={"incomplete": true}`, so the conversation is
+    never left with an unanswered user message.
+    """
+    parts = []
+    complete = False
+    try:
+        try:
+            async for frame in _stream_deltas(deltas, parts):
+                yield frame
+            complete = True
+        except Exception as e:
+            yield _stream_error(e)
+    finally:
+        create_ai_message(
+            db=db,
+            conversation_id=conversation_id,
+            channel_id=channel_id,
+            user_id=user_id,
+            message="".join(parts) or AI_UNAVAILABLE_MESSAGE,
+            role='assistant',
+            parameters=None if complete else {"incomplete": True}
+        )
+
 @router.get("/channels/{channel_id}/conversations", response_model=schemas.AIConversationList)
 async def get_channel_ai_conversations(
     channel_id: int,
@@ -36,7 +92,7 @@ async def get_channel_ai_conversations(
     channel = get_channel(db, channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
-    if current_user.id not in [u.id for u in channel.users]:
+    if not membership.is_member(db, current_user.id, channel_id):
         raise HTTPException(status_code=403, detail="Not a member of this channel")
 
     # Update user activity when fetching AI conversations
@@ -59,7 +115,7 @@ async def get_ai_conversation(
     channel = get_channel(db, channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
-    if current_user.id not in [u.id for u in channel.users]:
+    if not membership.is_member(db, current_user.id, channel_id):
         raise HTTPException(status_code=403, detail="Not a member of this channel")
 
     conversation = get_conversation(db, conversation_id, current_user.id)
@@ -82,7 +138,7 @@ async def delete_ai_conversation(
     channel = get_channel(db, channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
-    if current_user.id not in [u.id for u in channel.users]:
+    if not membership.is_member(db, current_user.id, channel_id):
         raise HTTPException(status_code=403, detail="Not a member of this channel")
 
     # Verify conversation exists and belongs to user
@@ -99,7 +155,7 @@ async def delete_ai_conversation(
 
     return None
 
-@router.post("/channels/{channel_id}/query", response_model=schemas.AIQueryResponse)
+@router.post("/channels/{channel_id}/query", response_model=schemas.AIQueryResponse, dependencies=[Depends(limit_ai_requests)])
 async def create_ai_query(
     channel_id: int,
     query: schemas.AIQueryRequest,
@@ -111,7 +167,7 @@ async def create_ai_query(
     channel = get_channel(db, channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
-    if current_user.id not in [u.id for u in channel.users]:
+    if not membership.is_member(db, current_user.id, channel_id):
         raise HTTPException(status_code=403, detail="Not a member of this channel")
 
     # Create new conversation with initial message
@@ -122,14 +178,56 @@ async def create_ai_query(
         initial_message=query.query
     )
 
-    # TODO: The AI response message should be created in the create_conversation function
-    # For now, return the conversation with just the user message
+    # Get AI response after the user message is committed
+    ai_response_message, search_results_list = await ai_query_response(prompt=query.query, channel_id=channel_id)
+    create_ai_message(
+        db=db,
+        conversation_id=conversation.id,
+        channel_id=channel_id,
+        user_id=current_user.id,
+        message=ai_response_message,
+        role='assistant'
+    )
+    db.refresh(conversation)
+
     return schemas.AIQueryResponse(
         conversation=conversation,
         message=conversation.messages[-1]  # Last message in conversation
     )
 
-@router.post("/channels/{channel_id}/conversations/{conversation_id}/messages", response_model=schemas.AIConversation)
+@router.post("/channels/{channel_id}/query/stream", dependencies=[Depends(limit_ai_requests)])
+async def create_ai_query_stream(
+    channel_id: int,
+    query: schemas.AIQueryRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Streaming version of create_ai_query: the answer arrives as `delta` events, then a `done` event carries the AIQueryResponse"""
+    # Verify user is member of channel
+    channel = get_channel(db, channel_id)
+    if not channel:
+        raise HTTPException(status_code=404, detail="Channel not found")
+    if not membership.is_member(db, current_user.id, channel_id):
+        raise HTTPException(status_code=403, detail="Not a member of this channel")
+
+    conversation = create_conversation(
+        db=db,
+        channel_id=channel_id,
+        user_id=current_user.id,
+        initial_message=query.query
+    )
+
+    async def event_stream():
+        deltas = ai_query_response_stream(prompt=query.query, channel_id=channel_id)
+        async for frame in _stream_assistant_turn(db, conversation.id, channel_id, current_user.id, deltas):
+            yield frame
+        db.refresh(conversation)
+        response = schemas.AIQueryResponse(conversation=conversation, message=conversation.messages[-1])
+        yield sse_event("done", jsonable_encoder(response))
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.post("/channels/{channel_id}/conversations/{conversation_id}/messages", response_model=schemas.AIConversation, dependencies=[Depends(limit_ai_requests)])
 async def add_message_to_conversation_endpoint(
     channel_id: int,
     conversation_id: int,
@@ -142,7 +240,7 @@ async def add_message_to_conversation_endpoint(
     channel = get_channel(db, channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
-    if current_user.id not in [u.id for u in channel.users]:
+    if not membership.is_member(db, current_user.id, channel_id):
         raise HTTPException(status_code=403, detail="Not a member of this channel")
 
     # Verify conversation exists and belongs to user
@@ -160,25 +258,68 @@ async def add_message_to_conversation_endpoint(
         user_id=current_user.id,
         message=message.message
     )
+
+    # Get AI response with chat history context
+    ai_response_message, search_results_list = await ai_query_response(
+        prompt=message.message,
+        channel_id=channel_id,
+        chat_history=get_chat_history(db, conversation_id)
+    )
+    create_ai_message(
+        db=db,
+        conversation_id=conversation_id,
+        channel_id=channel_id,
+        user_id=current_user.id,
+        message=ai_response_message,
+        role='assistant'
+    )
+    db.refresh(updated_conversation)
     
     return updated_conversation
 
-@router.get("/channels/{channel_id}/summarize", response_model=schemas.ChannelSummaryResponse)
-async def summarize_channel(
+@router.post("/channels/{channel_id}/conversations/{conversation_id}/messages/stream", dependencies=[Depends(limit_ai_requests)])
+async def add_message_to_conversation_stream(
     channel_id: int,
-    quantity: int = Query(..., description="The number of time units to look back"),
-    time_unit: str = Query(..., description="The time unit to look back", regex="^(hours|days|weeks)$"),
+    conversation_id: int,
+    message: schemas.AIMessageCreate,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Summarize channel messages for a specified time period"""
+    """Streaming version of add_message_to_conversation_endpoint: `delta` events, then a `done` event with the AIConversation"""
     # Verify user is member of channel
     channel = get_channel(db, channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
-    if current_user.id not in [u.id for u in channel.users]:
+    if not membership.is_member(db, current_user.id, channel_id):
         raise HTTPException(status_code=403, detail="Not a member of this channel")
 
+    # Verify conversation exists and belongs to user
+    conversation = get_conversation(db, conversation_id, current_user.id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    if conversation.channel_id != channel_id:
+        raise HTTPException(status_code=400, detail="Conversation does not belong to this channel")
+
+    updated_conversation = add_message_to_conversation(
+        db=db,
+        conversation_id=conversation_id,
+        channel_id=channel_id,
+        user_id=current_user.id,
+        message=message.message
+    )
+    chat_history = get_chat_history(db, conversation_id)
+
+    async def event_stream():
+        deltas = ai_query_response_stream(prompt=message.message, channel_id=channel_id, chat_history=chat_history)
+        async for frame in _stream_assistant_turn(db, conversation_id, channel_id, current_user.id, deltas):
+            yield frame
+        db.refresh(updated_conversation)
+        yield sse_event("done", jsonable_encoder(schemas.AIConversation.from_orm(updated_conversation)))
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def _messages_since(db: Session, channel_id: int, quantity: int, time_unit: str) -> list:
+    """Channel messages from the last `quantity` hours, days or weeks"""
     # Calculate the start date based on quantity and time_unit
     now = datetime.now(timezone.utc)
     if time_unit == "hours":
@@ -195,21 +336,75 @@ async def summarize_channel(
         skip=0,
         limit=1000,  # Get a reasonable number of messages to summarize
         include_reactions=False,
-        parent_only=False  # Include all messages for better context
+        parent_only=False,  # Include all messages for better context
+        include_total=False
     ).messages
 
     # Filter messages by date
     messages = [m for m in messages if m.created_at >= start_date]
+    return messages
+
+@router.get("/channels/{channel_id}/summarize", response_model=schemas.ChannelSummaryResponse, dependencies=[Depends(limit_ai_requests)])
+async def summarize_channel(
+    channel_id: int,
+    quantity: int = Query(..., description="The number of time units to look back"),
+    time_unit: str = Query(..., description="The time unit to look back", regex="^(hours|days|weeks)$"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Summarize channel messages for a specified time period"""
+    # Verify user is member of channel
+    channel = get_channel(db, channel_id)
+    if not channel:
+        raise HTTPException(status_code=404, detail="Channel not found")
+    if not membership.is_member(db, current_user.id, channel_id):
+        raise HTTPException(status_code=403, detail="Not a member of this channel")
+
+    messages = _messages_since(db, channel_id, quantity, time_unit)
 
     if not messages:
         return schemas.ChannelSummaryResponse(summary="No messages found in the specified time period.")
 
     # TODO: Implement actual summarization logic using LLM
     # For now, return a placeholder
-    summary = summarize_messages(messages)
+    summary = await summarize_messages(messages)
     
     return schemas.ChannelSummaryResponse(summary=summary)
 
+@router.get("/channels/{channel_id}/summarize/stream", dependencies=[Depends(limit_ai_requests)])
+async def summarize_channel_stream(
+    channel_id: int,
+    quantity: int = Query(..., description="The number of time units to look back"),
+    time_unit: str = Query(..., description="The time unit to look back", regex="^(hours|days|weeks)$"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Streaming version of summarize_channel: `delta` events, then a `done` event with the ChannelSummaryResponse"""
+    # Verify user is member of channel
+    channel = get_channel(db, channel_id)
+    if not channel:
+        raise HTTPException(status_code=404, detail="Channel not found")
+    if not membership.is_member(db, current_user.id, channel_id):
+        raise HTTPException(status_code=403, detail="Not a member of this channel")
+
+    messages = _messages_since(db, channel_id, quantity, time_unit)
+
+    async def event_stream():
+        if not messages:
+            summary = "No messages found in the specified time period."
+            yield sse_event("delta", {"text": summary})
+        else:
+            parts = []
+            try:
+                async for frame in _stream_deltas(summarize_messages_stream(messages), parts):
+                    yield frame
+            except Exception as e:
+                yield _stream_error(e)
+            summary = "".join(parts)
+        yield sse_event("done", jsonable_encoder(schemas.ChannelSummaryResponse(summary=summary)))
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 # @router.post("/ai/persona/{receiver_id}", response_model=List[schemas.Message])
 # async def create_ai_persona_message(
 #     receiver_id: int,
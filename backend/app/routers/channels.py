@@ -1,16 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import logging
 
 from .. import models, schemas
-from ..database import get_db
+from ..database import get_db, get_async_db
 from ..auth0 import get_current_user
 from ..events_manager import events
+from ..membership import membership
+from ..search_cache import search_cache, channel_tag, CHANNELS_TAG
 from ..crud.channels import (
     create_channel,
     get_channel,
-    get_user_channels,
     update_channel,
     delete_channel,
     get_channel_members,
@@ -26,6 +28,7 @@ from ..crud.channels import (
     get_or_create_ai_dm
 )
 from ..crud.users import get_user
+from ..crud import aio
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -43,19 +46,25 @@ async def create_channel_endpoint(
     # Add the new channel to the user's WebSocket connection
     events.add_channel_for_user(current_user.id, db_channel.id)
     
+    # Lets every worker refresh its cached channel directory
+    await events.broadcast_channel_created(db_channel)
+    
     return db_channel
 
 @router.get("/me", response_model=List[schemas.Channel])
 async def read_user_channels(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
     # Update user activity when fetching user's channels
     await events.update_user_activity(current_user.id)
     
-    channels = get_user_channels(db, user_id=current_user.id, skip=skip, limit=limit)
+    channels = await aio.get_user_channels(
+        db, user_id=current_user.id, skip=skip, limit=limit,
+        response_model=List[schemas.Channel]
+    )
     return channels
 
 @router.get("/available", response_model=List[schemas.Channel])
@@ -80,7 +89,7 @@ async def read_channel(
     db_channel = get_channel(db, channel_id=channel_id)
     if db_channel is None:
         raise HTTPException(status_code=404, detail="Channel not found")
-    if current_user.id not in [user.id for user in db_channel.users]:
+    if not membership.is_member(db, current_user.id, channel_id):
         raise HTTPException(status_code=403, detail="Not a member of this channel")
     
     # Update user activity when viewing a channel
@@ -98,7 +107,7 @@ async def update_channel_endpoint(
     db_channel = get_channel(db, channel_id=channel_id)
     if db_channel is None:
         raise HTTPException(status_code=404, detail="Channel not found")
-    if current_user.id not in [user.id for user in db_channel.users]:
+    if not membership.is_member(db, current_user.id, channel_id):
         raise HTTPException(status_code=403, detail="Not a member of this channel")
     if db_channel.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Only the channel owner can update the channel")
@@ -133,7 +142,10 @@ async def delete_channel_endpoint(
     # Update user activity when deleting a channel
     await events.update_user_activity(current_user.id)
     
-    return delete_channel(db=db, channel_id=channel_id)
+    deleted_channel = delete_channel(db=db, channel_id=channel_id)
+    # Deletion is not broadcast, so other workers drop these results when their entries expire
+    search_cache.invalidate(channel_tag(channel_id), CHANNELS_TAG)
+    return deleted_channel
 
 @router.get("/{channel_id}/members", response_model=List[schemas.UserInChannel])
 def get_channel_members_endpoint(
@@ -144,7 +156,7 @@ def get_channel_members_endpoint(
     db_channel = get_channel(db, channel_id=channel_id)
     if db_channel is None:
         raise HTTPException(status_code=404, detail="Channel not found")
-    if current_user.id not in [user.id for user in db_channel.users]:
+    if not membership.is_member(db, current_user.id, channel_id):
         raise HTTPException(status_code=403, detail="Not a member of this channel")
     return get_channel_members(db, channel_id=channel_id)
 
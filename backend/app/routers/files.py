@@ -16,6 +16,7 @@ from .. import crud
 from ..database import get_db
 from ..auth0 import get_current_user
 from ..events_manager import events
+from ..membership import membership
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -79,7 +80,7 @@ async def upload_file(
         if not message:
             raise HTTPException(status_code=404, detail="Message not found")
         
-        if not crud.user_in_channel(db, current_user.id, message.channel_id):
+        if not membership.is_member(db, current_user.id, message.channel_id):
             raise HTTPException(status_code=403, detail="Not a member of this channel")
         
         # Read file content
@@ -167,7 +168,7 @@ async def get_download_url(
         
         # Verify user has access to the channel containing the message
         message = crud.get_message(db, message_id=file_upload.message_id)
-        if not crud.user_in_channel(db, current_user.id, message.channel_id):
+        if not membership.is_member(db, current_user.id, message.channel_id):
             raise HTTPException(status_code=403, detail="Not authorized to access this file")
         
         # Generate presigned URL with explicit configuration
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import logging
 import magic
@@ -10,22 +11,22 @@ from botocore.config import Config
 import os
 
 from .. import models, schemas
-from ..database import get_db
+from ..database import get_db, get_async_db
 from ..auth0 import get_current_user
 from ..events_manager import events
-from ..embedding_service import embedding_service
+from ..membership import membership
+from ..embedding_pipeline import embedding_pipeline
 from ..crud.messages import (
     create_message,
     update_message,
     delete_message,
-    get_channel_messages,
     get_message,
-    create_reply,
-    get_message_reply_chain
+    create_reply
 )
-from ..crud.channels import get_channel, user_in_channel
+from ..crud.channels import get_channel
+from ..crud import aio
 from ..websocket_manager import manager
-from ..ai_service import dm_persona_response
+from ..persona_replies import persona_replies
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -75,7 +76,7 @@ async def create_message_endpoint(
     db_channel = get_channel(db, channel_id=channel_id)
     if db_channel is None:
         raise HTTPException(status_code=404, detail="Channel not found")
-    if current_user.id not in [user.id for user in db_channel.users]:
+    if not membership.is_member(db, current_user.id, channel_id):
         raise HTTPException(status_code=403, detail="Not a member of this channel")
     
     # Update user activity when sending a message
@@ -95,43 +96,15 @@ async def create_message_endpoint(
     # If this is a DM channel, check the other user's status
     if db_channel.is_dm:
         if db_channel.ai_channel:
-            # Generate AI response with current user as both sender and receiver
-            ai_response, search_results = dm_persona_response(db, message.content, current_user.id, current_user.id, channel_id, db_message.id)
-
-            # Create the AI response message
-            ai_message_create = schemas.MessageCreate(content=ai_response)
-            ai_db_message = create_message(
-                db=db,
-                channel_id=channel_id,
-                user_id=current_user.id,  # Use current user's ID
-                message=ai_message_create,
-                from_ai=True
-            )
-            
-            # Broadcast both the original message and AI response
-            await events.broadcast_message_created(channel_id, ai_db_message, current_user)
-            return db_message
+            # AI response with current user as both sender and receiver, generated in the background
+            persona_replies.schedule(channel_id, current_user.id, current_user.id, message.content, db_message.id)
         else:
             other_user = next((user for user in db_channel.users if user.id != current_user.id), None)
             if other_user:
                 user_status = manager.get_user_status(other_user.id)
                 if user_status != "online":
-                    # Generate AI response
-                    ai_response, search_results = dm_persona_response(db, message.content, current_user.id, other_user.id, channel_id, db_message.id)
-
-                    # Create the AI response message as if it's from the receiver
-                    ai_message_create = schemas.MessageCreate(content=ai_response)
-                    ai_db_message = create_message(
-                        db=db,
-                        channel_id=channel_id,
-                        user_id=other_user.id,  # Use receiver's ID as the message author
-                        message=ai_message_create,
-                        from_ai=True
-                    )
-                    
-                    # Broadcast both the original message and AI response
-                    await events.broadcast_message_created(channel_id, ai_db_message, other_user)
-                    return db_message
+                    # Reply as the receiver in the background; cancelled if they come online first
+                    persona_replies.schedule(channel_id, current_user.id, other_user.id, message.content, db_message.id)
     
     return db_message
 
@@ -142,27 +115,38 @@ async def get_channel_messages_endpoint(
     limit: int = 50,
     include_reactions: bool = False,
     parent_only: bool = True,
-    db: Session = Depends(get_db),
+    before: Optional[str] = None,
+    include_total: bool = True,
+    reaction_summary: bool = False,
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
     # Verify channel access
-    channel = get_channel(db, channel_id)
+    channel = await aio.get_channel(db, channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
-    if not user_in_channel(db, current_user.id, channel_id):
+    if not await membership.is_member_async(db, current_user.id, channel_id):
         raise HTTPException(status_code=403, detail="Not a member of this channel")
     
     # Update user activity when fetching messages
     await events.update_user_activity(current_user.id)
     
-    return get_channel_messages(
-        db=db,
-        channel_id=channel_id,
-        skip=skip,
-        limit=limit,
-        include_reactions=include_reactions,
-        parent_only=parent_only
-    )
+    try:
+        return await aio.get_channel_messages(
+            db,
+            channel_id=channel_id,
+            skip=skip,
+            limit=limit,
+            include_reactions=include_reactions,
+            parent_only=parent_only,
+            before=before,
+            include_total=include_total,
+            reaction_summary=reaction_summary,
+            current_user_id=current_user.id,
+            response_model=schemas.MessageList
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/{channel_id}/messages/{message_id}", response_model=schemas.Message)
 async def update_message_endpoint(
@@ -234,7 +218,7 @@ async def create_message_reply_endpoint(
     channel = get_channel(db, channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
-    if not user_in_channel(db, current_user.id, channel_id):
+    if not membership.is_member(db, current_user.id, channel_id):
         raise HTTPException(status_code=403, detail="Not a member of this channel")
     
     # Update user activity when replying to a message
@@ -269,7 +253,7 @@ async def create_message_reply_endpoint(
 @router.get("/{message_id}/reply-chain", response_model=List[schemas.Message])
 async def get_message_reply_chain_endpoint(
     message_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Returns all messages in a reply chain for a given message ID.
@@ -280,19 +264,19 @@ async def get_message_reply_chain_endpoint(
     Messages are ordered by created_at date (ascending)."""
     
     # Get the message to verify it exists and get its channel
-    message = get_message(db, message_id=message_id)
+    message = await aio.get_message(db, message_id=message_id)
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
     
     # Verify user has access to the channel
-    if not user_in_channel(db, current_user.id, message.channel_id):
+    if not await membership.is_member_async(db, current_user.id, message.channel_id):
         raise HTTPException(status_code=403, detail="Not a member of the channel containing this message")
     
     # Update user activity when fetching reply chain
     await events.update_user_activity(current_user.id)
     
     # Get the reply chain
-    reply_chain = get_message_reply_chain(db, message_id=message_id)
+    reply_chain = await aio.get_message_reply_chain(db, message_id=message_id, response_model=List[schemas.Message])
     
     return reply_chain
 
@@ -313,7 +297,7 @@ async def create_message_with_file(
     db_channel = get_channel(db, channel_id=channel_id)
     if db_channel is None:
         raise HTTPException(status_code=404, detail="Channel not found")
-    if current_user.id not in [u.id for u in db_channel.users]:
+    if not membership.is_member(db, current_user.id, channel_id):
         raise HTTPException(status_code=403, detail="Not a member of this channel")
     
     # Update user activity when sending a message with file
@@ -401,14 +385,10 @@ async def create_message_with_file(
             uploaded_by=current_user.id
         )
         db.add(file_upload)
+        # Re-embed so the vector metadata includes the file
+        embedding_pipeline.queue_upsert(db, db_message.id)
         db.commit()
         db.refresh(file_upload)
-
-        embed_metadata = {
-            "file_name": file.filename,
-            "has_file": True
-        }
-        embedding_service.update_metadata(db_message.vector_id, embed_metadata)
         
         logger.info(f"Attached file (ID: {file_upload.id}) to message {db_message.id}")
 
@@ -433,7 +413,7 @@ async def create_reply_message_with_file(
     db_channel = get_channel(db, channel_id=channel_id)
     if not db_channel:
         raise HTTPException(status_code=404, detail="Channel not found")
-    if current_user.id not in [u.id for u in db_channel.users]:
+    if not membership.is_member(db, current_user.id, channel_id):
         raise HTTPException(status_code=403, detail="Not a member of this channel")
 
     # Update user activity when replying with file
@@ -512,15 +492,11 @@ async def create_reply_message_with_file(
             uploaded_by=current_user.id
         )
         db.add(file_upload)
+        # Re-embed so the vector metadata includes the file
+        embedding_pipeline.queue_upsert(db, db_message.id)
         db.commit()
         db.refresh(file_upload)
 
-        embed_metadata = {
-            "file_name": file.filename,
-            "has_file": True
-        }
-        embedding_service.update_metadata(db_message.vector_id, embed_metadata)
-
         logger.info(f"Attached file (ID: {file_upload.id}) to reply (message {db_message.id})")
 
     # Broadcast the new reply message to all users in the channel
@@ -0,0 +1,68 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from typing import Optional
+import logging
+import os
+import secrets
+
+from ..database import get_pool_stats
+from ..embedding_cache import embedding_cache
+from ..auth_cache import token_cache, user_cache
+from ..search_cache import search_cache
+from ..membership import membership
+from ..persona_replies import persona_replies
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Shared secret for internal monitoring; metrics are not served when it is unset
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+async def require_metrics_token(x_metrics_token: Optional[str] = Header(None)):
+    """Hide the metrics endpoints from anyone without the internal metrics token"""
+    if not METRICS_TOKEN or not x_metrics_token or not secrets.compare_digest(x_metrics_token, METRICS_TOKEN):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+router = APIRouter(dependencies=[Depends(require_metrics_token)])
+
+@router.get("/db-pool")
+async def db_pool_metrics():
+    """
+    Connection pool usage for the sync and async engines: checked-out connections,
+    overflow in use, checkout timeouts and time spent waiting for a connection
+    """
+    return get_pool_stats()
+
+@router.get("/embedding-cache")
+async def embedding_cache_metrics():
+    """
+    Embedding cache size and hit counts for this worker
+    """
+    return embedding_cache.stats()
+
+@router.get("/auth-cache")
+async def auth_cache_metrics():
+    """
+    Verified token and current user cache sizes and hit counts for this worker
+    """
+    return {"tokens": token_cache.stats(), "users": user_cache.stats()}
+
+@router.get("/search-cache")
+async def search_cache_metrics():
+    """
+    Search result cache size, hit counts and entries dropped as stale for this worker
+    """
+    return search_cache.stats()
+
+@router.get("/membership-cache")
+async def membership_cache_metrics():
+    """
+    Channel membership cache size and hit counts for this worker
+    """
+    return membership.stats()
+
+@router.get("/persona-replies")
+async def persona_reply_metrics():
+    """
+    Pending background AI persona replies and how scheduled replies ended on this worker
+    """
+    return persona_replies.stats()
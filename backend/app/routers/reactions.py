@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import logging
 
 from .. import models, schemas
 from ..database import get_db
 from ..auth0 import get_current_user
 from ..events_manager import events
+from ..membership import membership
 from ..crud.reactions import (
     get_all_reactions,
     get_reaction,
+    get_message_reactions,
     add_reaction_to_message,
     remove_reaction_from_message
 )
@@ -34,6 +36,30 @@ async def list_reactions(
     
     return get_all_reactions(db, skip=skip, limit=limit)
 
+@router.get("/{message_id}", response_model=List[schemas.MessageReaction])
+async def list_message_reactions(
+    message_id: int,
+    reaction_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """List who reacted to a message, optionally for a single reaction.
+    Pairs with reaction_summary pages, which only carry counts."""
+    message = get_message(db, message_id=message_id)
+    if not message:
+        raise HTTPException(status_code=404, detail="Message not found")
+    
+    # Verify user has access to the channel
+    channel = get_channel(db, channel_id=message.channel_id)
+    if not channel:
+        raise HTTPException(status_code=404, detail="Channel not found")
+    if not membership.is_member(db, current_user.id, message.channel_id):
+        raise HTTPException(status_code=403, detail="Not a member of this channel")
+    
+    return get_message_reactions(db, message_id=message_id, reaction_id=reaction_id, skip=skip, limit=limit)
+
 # want to switch this endpoint to /reactions/{message_id}
 @router.post("/{message_id}", response_model=schemas.MessageReaction)
 async def add_reaction(
@@ -54,7 +80,7 @@ async def add_reaction(
     channel = get_channel(db, channel_id=message.channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
-    if current_user.id not in [u.id for u in channel.users]:
+    if not membership.is_member(db, current_user.id, message.channel_id):
         raise HTTPException(status_code=403, detail="Not a member of this channel")
     
     message_reaction = add_reaction_to_message(
@@ -91,7 +117,7 @@ async def remove_reaction(
     channel = get_channel(db, channel_id=message.channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
-    if current_user.id not in [u.id for u in channel.users]:
+    if not membership.is_member(db, current_user.id, message.channel_id):
         raise HTTPException(status_code=403, detail="Not a member of this channel")
     
     # Remove the reaction
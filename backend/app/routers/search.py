@@ -1,6 +1,7 @@
 import logging
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, and_, func
 from typing import List, Optional
@@ -11,9 +12,10 @@ from .. import models
 from .. import schemas
 from ..database import get_db
 from ..auth0 import get_current_user
-from ..crud.channels import get_user_channels
 from ..crud.messages import get_message
 from ..events_manager import events
+from ..membership import membership
+from ..search_cache import search_cache, channel_tag, member_tag, USERS_TAG, CHANNELS_TAG
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -22,7 +24,10 @@ router = APIRouter()
 
 # Search rate limiting configurations
 MAX_REQUESTS_PER_MINUTE = int(os.getenv('MAX_SEARCH_REQUESTS_PER_MINUTE', '60'))
-CACHE_EXPIRATION_SECONDS = int(os.getenv('SEARCH_CACHE_EXPIRATION_SECONDS', '300'))  # 5 minutes
+
+# Substring matching modes for user, channel and file-name search
+MATCH_CONTAINS = "contains"
+MATCH_PREFIX = "prefix"
 
 def validate_date_params(from_date: Optional[datetime], to_date: Optional[datetime]):
     """Validate date range parameters"""
@@ -32,8 +37,33 @@ def validate_date_params(from_date: Optional[datetime], to_date: Optional[dateti
             detail="from_date must be before to_date"
         )
 
+def _like_pattern(query: str, match: str) -> str:
+    """LIKE pattern for `query`, with its own wildcards escaped.
+
+    An unanchored pattern under three characters yields no trigrams, so short
+    `contains` searches scan the table instead of using the index; callers that
+    want index-backed short searches should ask for `prefix`.
+    """
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    if match == MATCH_PREFIX:
+        return f"{escaped}%"
+    return f"%{escaped}%"
+
+def text_search(columns, query: str, match: str):
+    """Filter and similarity score for a case-insensitive substring search over
+    `columns`, served by their pg_trgm GIN indexes"""
+    pattern = _like_pattern(query, match)
+    condition = or_(*[column.ilike(pattern, escape="\\") for column in columns])
+    similarity = func.greatest(*[func.coalesce(func.similarity(column, query), 0) for column in columns])
+    return condition, similarity
+
+def message_search_query(query: str):
+    """Parse free-form user input (quoted phrases, OR, -exclusions) into a tsquery"""
+    return func.websearch_to_tsquery('english', query)
+
 @router.get("/messages", response_model=schemas.MessageList)
 async def search_messages(
+    request: Request,
     query: str,
     channel_id: Optional[int] = None,
     from_date: Optional[datetime] = None,
@@ -41,26 +71,44 @@ async def search_messages(
     from_user: Optional[int] = None,
     limit: int = Query(default=50, le=100),
     skip: int = 0,
-    sort_by: str = "created_at",
+    sort_by: str = "relevance",
     sort_order: str = "desc",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Search through message content across all accessible channels"""
+    """Search through message content across all accessible channels.
+
+    Matches come from the GIN index on messages.content_tsv and are ranked with
+    ts_rank by default; sort_by may also name a message column such as created_at.
+    Results are cached per user until a message in one of their channels changes.
+    """
     try:
         validate_date_params(from_date, to_date)
         
+        cache_key = search_cache.key("messages", current_user.id, {
+            "query": " ".join(query.split()), "channel_id": channel_id, "from_date": from_date,
+            "to_date": to_date, "from_user": from_user, "limit": limit, "skip": skip,
+            "sort_by": sort_by, "sort_order": sort_order
+        })
+        cached = search_cache.get(cache_key)
+        if cached:
+            return search_cache.respond(request, cached)
+        versions = search_cache.versions([member_tag(current_user.id)])
+        
         # Get user's accessible channels
-        accessible_channels = get_user_channels(db, user_id=current_user.id)
-        channel_ids = [channel.id for channel in accessible_channels]
+        channel_ids = sorted(membership.channel_ids(db, current_user.id))
+        versions.update(search_cache.versions(channel_tag(id) for id in channel_ids))
         
         if not channel_ids:
             return {"messages": [], "total": 0, "has_more": False}
         
+        ts_query = message_search_query(query)
+        rank = func.ts_rank(models.Message.content_tsv, ts_query)
+        
         # Build base query
         query_filters = [
             models.Message.channel_id.in_(channel_ids),
-            models.Message.is_deleted == False
+            models.Message.content_tsv.op('@@')(ts_query)
         ]
         
         # Add optional filters
@@ -79,27 +127,37 @@ async def search_messages(
         if from_user:
             query_filters.append(models.Message.user_id == from_user)
         
-        # Execute search query
-        messages = db.query(models.Message).filter(
-            and_(*query_filters),
-            models.Message.content.match(query)  # Using PostgreSQL full-text search
+        sort_column = rank if sort_by == "relevance" else getattr(models.Message, sort_by)
+        
+        # Execute search query, counting all matches in the same pass
+        rows = db.query(
+            models.Message,
+            func.count().over().label("total")
+        ).filter(
+            and_(*query_filters)
         ).order_by(
-            getattr(models.Message, sort_by).desc() if sort_order == "desc"
-            else getattr(models.Message, sort_by)
+            sort_column.desc() if sort_order == "desc" else sort_column,
+            models.Message.id.desc()
         ).offset(skip).limit(limit + 1).all()  # Get one extra to check has_more
         
+        if rows:
+            total = rows[0].total
+        elif skip:
+            # Paged past the end: the window count has no row to ride on
+            total = db.query(func.count(models.Message.id)).filter(and_(*query_filters)).scalar()
+        else:
+            total = 0
+        
+        messages = [row.Message for row in rows]
         has_more = len(messages) > limit
         if has_more:
             messages = messages[:-1]  # Remove the extra item
         
-        # Get total count
-        total = db.query(func.count(models.Message.id)).filter(
-            and_(*query_filters),
-            models.Message.content.match(query)
-        ).scalar()
-        
-        return {"messages": messages, "total": total, "has_more": has_more}
+        content = jsonable_encoder(schemas.MessageList(messages=messages, total=total, has_more=has_more))
+        return search_cache.respond(request, search_cache.put(cache_key, content, versions))
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Message search error: {str(e)}")
         raise HTTPException(
@@ -109,25 +167,38 @@ async def search_messages(
 
 @router.get("/users")
 async def search_users(
+    request: Request,
     query: str,
     exclude_channel: Optional[int] = None,
     only_channel: Optional[int] = None,
+    match: str = Query(default=MATCH_CONTAINS, regex=f"^({MATCH_CONTAINS}|{MATCH_PREFIX})$"),
     limit: int = Query(default=50, le=100),
     skip: int = 0,
-    sort_by: str = "name",
+    sort_by: str = "relevance",
     sort_order: str = "desc",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Search for users by name or email"""
+    """Search for users by name or email, ranked by trigram similarity by default"""
     try:
+        # Trigram matching is case-insensitive, so differently cased queries share an entry
+        cache_key = search_cache.key("users", None, {
+            "query": query.lower(), "exclude_channel": exclude_channel, "only_channel": only_channel,
+            "match": match, "limit": limit, "skip": skip, "sort_by": sort_by, "sort_order": sort_order
+        })
+        cached = search_cache.get(cache_key)
+        if cached:
+            return search_cache.respond(request, cached)
+        versions = search_cache.versions(
+            [USERS_TAG] + [channel_tag(id) for id in (exclude_channel, only_channel) if id]
+        )
+        
+        condition, similarity = text_search([models.User.name, models.User.email], query, match)
+        
         # Build base query
         base_query = db.query(models.User).filter(
             models.User.is_active == True,
-            or_(
-                models.User.name.ilike(f"%{query}%"),
-                models.User.email.ilike(f"%{query}%")
-            )
+            condition
         )
         
         # Add channel filters
@@ -141,9 +212,10 @@ async def search_users(
             )
         
         # Execute query with one extra to check has_more
+        sort_column = similarity if sort_by == "relevance" else getattr(models.User, sort_by)
         users = base_query.order_by(
-            getattr(models.User, sort_by).desc() if sort_order == "desc"
-            else getattr(models.User, sort_by)
+            sort_column.desc() if sort_order == "desc" else sort_column,
+            models.User.id
         ).offset(skip).limit(limit + 1).all()
         
         has_more = len(users) > limit
@@ -153,7 +225,8 @@ async def search_users(
         # Get total count
         total = base_query.count()
         
-        return {"users": users, "total": total, "has_more": has_more}
+        content = jsonable_encoder({"users": users, "total": total, "has_more": has_more})
+        return search_cache.respond(request, search_cache.put(cache_key, content, versions))
     
     except Exception as e:
         logger.error(f"User search error: {str(e)}")
@@ -164,26 +237,35 @@ async def search_users(
 
 @router.get("/channels")
 async def search_channels(
+    request: Request,
     query: str,
     include_private: bool = False,
     is_dm: Optional[bool] = None,
     member_id: Optional[int] = None,
+    match: str = Query(default=MATCH_CONTAINS, regex=f"^({MATCH_CONTAINS}|{MATCH_PREFIX})$"),
     limit: int = Query(default=50, le=100),
     skip: int = 0,
-    sort_by: str = "name",
+    sort_by: str = "relevance",
     sort_order: str = "desc",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Search for channels by name or description"""
+    """Search for channels by name or description, ranked by trigram similarity by default"""
     try:
+        cache_key = search_cache.key("channels", None, {
+            "query": query.lower(), "include_private": include_private, "is_dm": is_dm,
+            "member_id": member_id, "match": match, "limit": limit, "skip": skip,
+            "sort_by": sort_by, "sort_order": sort_order
+        })
+        cached = search_cache.get(cache_key)
+        if cached:
+            return search_cache.respond(request, cached)
+        versions = search_cache.versions([CHANNELS_TAG])
+        
+        condition, similarity = text_search([models.Channel.name, models.Channel.description], query, match)
+        
         # Build base query
-        query_filters = [
-            or_(
-                models.Channel.name.ilike(f"%{query}%"),
-                models.Channel.description.ilike(f"%{query}%")
-            ),
-        ]
+        query_filters = [condition]
         
         # Add DM filter if specified
         if is_dm is not None:
@@ -200,9 +282,10 @@ async def search_channels(
             )
         
         # Execute query with one extra to check has_more
+        sort_column = similarity if sort_by == "relevance" else getattr(models.Channel, sort_by)
         channels = base_query.order_by(
-            getattr(models.Channel, sort_by).desc() if sort_order == "desc"
-            else getattr(models.Channel, sort_by)
+            sort_column.desc() if sort_order == "desc" else sort_column,
+            models.Channel.id
         ).offset(skip).limit(limit + 1).all()
         
         has_more = len(channels) > limit
@@ -216,7 +299,8 @@ async def search_channels(
         for channel in channels:
             channel.member_count = len(channel.users)
         
-        return {"channels": channels, "total": total, "has_more": has_more}
+        content = jsonable_encoder({"channels": channels, "total": total, "has_more": has_more})
+        return search_cache.respond(request, search_cache.put(cache_key, content, versions))
     
     except Exception as e:
         logger.error(f"Channel search error: {str(e)}")
@@ -227,12 +311,14 @@ async def search_channels(
 
 @router.get("/files")
 async def search_files(
+    request: Request,
     query: str,
     channel_id: Optional[int] = None,
     file_type: Optional[str] = None,
     from_date: Optional[datetime] = None,
     to_date: Optional[datetime] = None,
     uploaded_by: Optional[int] = None,
+    match: str = Query(default=MATCH_CONTAINS, regex=f"^({MATCH_CONTAINS}|{MATCH_PREFIX})$"),
     limit: int = Query(default=50, le=100),
     skip: int = 0,
     sort_by: str = "uploaded_at",
@@ -247,9 +333,22 @@ async def search_files(
         
         validate_date_params(from_date, to_date)
         
+        # File names match case-insensitively; collapsing whitespace in the query itself
+        # keeps the search consistent with the normalised cache key
+        query = " ".join(query.split())
+        cache_key = search_cache.key("files", current_user.id, {
+            "query": query.lower(), "channel_id": channel_id, "file_type": file_type, "from_date": from_date,
+            "to_date": to_date, "uploaded_by": uploaded_by, "match": match, "limit": limit,
+            "skip": skip, "sort_by": sort_by, "sort_order": sort_order
+        })
+        cached = search_cache.get(cache_key)
+        if cached:
+            return search_cache.respond(request, cached)
+        versions = search_cache.versions([member_tag(current_user.id)])
+        
         # Get user's accessible channels
-        accessible_channels = get_user_channels(db, user_id=current_user.id)
-        channel_ids = [channel.id for channel in accessible_channels]
+        channel_ids = sorted(membership.channel_ids(db, current_user.id))
+        versions.update(search_cache.versions(channel_tag(id) for id in channel_ids))
         
         if not channel_ids:
             return {"files": [], "total": 0, "has_more": False}
@@ -261,10 +360,11 @@ async def search_files(
         ]
         
         # Add search conditions
+        file_name_condition, _ = text_search([models.FileUpload.file_name], query, match)
         query_filters.append(
             or_(
-                models.FileUpload.file_name.ilike(f"%{query}%"),
-                models.Message.content.match(query)
+                file_name_condition,
+                models.Message.content_tsv.op('@@')(message_search_query(query))
             )
         )
         
@@ -316,7 +416,8 @@ async def search_files(
             file.message_content = message.content if message else None
             file.channel_id = message.channel_id if message else None
         
-        return {"files": files, "total": total, "has_more": has_more}
+        content = jsonable_encoder({"files": files, "total": total, "has_more": has_more})
+        return search_cache.respond(request, search_cache.put(cache_key, content, versions))
     
     except Exception as e:
         logger.error(f"File search error: {str(e)}")
@@ -1,22 +1,20 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, status
 import logging
 import os
 from typing import Optional
 import asyncio
 
 from .. import models, schemas
-from ..database import get_db
+from ..database import AsyncSessionLocal
 from ..auth0 import verify_token
 from ..events_manager import events
-from ..crud.users import get_user_by_auth0_id
-from ..crud.channels import get_user_channels, get_channel
-from ..crud.messages import (
+from ..membership import membership
+from ..crud.aio import (
+    get_user,
+    get_user_by_auth0_id,
     create_message,
     get_message,
-    create_reply
-)
-from ..crud.reactions import (
+    create_reply,
     add_reaction_to_message,
     get_reaction,
     remove_reaction_from_message
@@ -36,8 +34,7 @@ router = APIRouter()
 @router.websocket("/ws")
 async def websocket_endpoint(
     websocket: WebSocket,
-    token: str,
-    db: Session = Depends(get_db)
+    token: str
 ):
     user_id = None
     away_task = None
@@ -47,18 +44,18 @@ async def websocket_endpoint(
         payload = await verify_token(token)
         logger.info(f"Token verified: {payload['sub']}")
         
-        user = get_user_by_auth0_id(db, payload["sub"])
-        if not user:
-            logger.error("User not found for token")
-            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-            return
-        
-        user_id = user.id
-        logger.info(f"User {user_id} connecting to websocket")
-        
-        # Get all channels the user is a member of
-        channels = get_user_channels(db, user_id=user.id)
-        channel_ids = [channel.id for channel in channels]
+        async with AsyncSessionLocal() as db:
+            user = await get_user_by_auth0_id(db, payload["sub"])
+            if not user:
+                logger.error("User not found for token")
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                return
+            
+            user_id = user.id
+            logger.info(f"User {user_id} connecting to websocket")
+            
+            # Get all channels the user is a member of
+            channel_ids = sorted(await membership.channel_ids_async(db, user.id))
         logger.info(f"User {user_id} channels: {channel_ids}")
         
         # Attempt to connect
@@ -96,181 +93,188 @@ async def websocket_endpoint(
                 event_type = data.get('type')
                 channel_id = data.get('channel_id')
                 
-                if not channel_id or channel_id not in events.get_user_channels(user.id):
+                if not channel_id:
                     continue
                 
-                if event_type == "new_message":
-                    content = data.get('content')
-                    if not content:
+                # Short-lived session per event, so idle sockets never hold a pooled connection
+                async with AsyncSessionLocal() as db:
+                    if not await membership.is_member_async(db, user.id, channel_id):
                         continue
+                    if event_type == "new_message":
+                        content = data.get('content')
+                        if not content:
+                            continue
                     
-                    # Create and save the message
-                    message = create_message(
-                        db=db,
-                        channel_id=channel_id,
-                        user_id=user.id,
-                        message=schemas.MessageCreate(content=content)
-                    )
+                        # Create and save the message
+                        message = await create_message(
+                            db,
+                            channel_id=channel_id,
+                            user_id=user.id,
+                            message=schemas.MessageCreate(content=content)
+                        )
                     
-                    # Prepare message data for broadcast
-                    message_data = {
-                        "type": "new_message",
-                        "channel_id": channel_id,
-                        "message": {
-                            "id": message.id,
-                            "content": message.content,
-                            "created_at": message.created_at.isoformat(),
-                            "user_id": message.user_id,
-                            "channel_id": message.channel_id,
-                            "user": {
-                                "id": user.id,
-                                "email": user.email,
-                                "name": user.name
+                        # Prepare message data for broadcast
+                        message_data = {
+                            "type": "new_message",
+                            "channel_id": channel_id,
+                            "message": {
+                                "id": message.id,
+                                "content": message.content,
+                                "created_at": message.created_at.isoformat(),
+                                "user_id": message.user_id,
+                                "channel_id": message.channel_id,
+                                "user": {
+                                    "id": user.id,
+                                    "email": user.email,
+                                    "name": user.name
+                                }
                             }
                         }
-                    }
-                    await events.broadcast_to_channel(message_data, channel_id)
+                        await events.broadcast_to_channel(message_data, channel_id)
                 
-                elif event_type == "message_reply":
-                    content = data.get('content')
-                    parent_id = data.get('parent_id')
-                    if not content or not parent_id:
-                        continue
+                    elif event_type == "message_reply":
+                        content = data.get('content')
+                        parent_id = data.get('parent_id')
+                        if not content or not parent_id:
+                            continue
                     
-                    # Create the reply
-                    reply, root_message = create_reply(
-                        db=db,
-                        parent_id=parent_id,
-                        user_id=user.id,
-                        message=schemas.MessageReplyCreate(content=content)
-                    )
+                        # Create the reply
+                        reply, root_message = await create_reply(
+                            db,
+                            parent_id=parent_id,
+                            user_id=user.id,
+                            message=schemas.MessageReplyCreate(content=content)
+                        )
                     
-                    if not reply or not root_message:
-                        continue
+                        if not reply or not root_message:
+                            continue
+                        root_author = await get_user(db, root_message.user_id)
                     
-                    # Broadcast the new reply message
-                    message_data = {
-                        "type": "message_created",
-                        "channel_id": channel_id,
-                        "message": {
-                            "id": reply.id,
-                            "content": reply.content,
-                            "created_at": reply.created_at.isoformat(),
-                            "updated_at": reply.updated_at.isoformat(),
-                            "user_id": reply.user_id,
-                            "channel_id": reply.channel_id,
-                            "parent_id": reply.parent_id,
-                            "parent": {
+                        # Broadcast the new reply message
+                        message_data = {
+                            "type": "message_created",
+                            "channel_id": channel_id,
+                            "message": {
+                                "id": reply.id,
+                                "content": reply.content,
+                                "created_at": reply.created_at.isoformat(),
+                                "updated_at": reply.updated_at.isoformat(),
+                                "user_id": reply.user_id,
+                                "channel_id": reply.channel_id,
+                                "parent_id": reply.parent_id,
+                                "parent": {
+                                    "id": root_message.id,
+                                    "content": root_message.content,
+                                    "created_at": root_message.created_at.isoformat(),
+                                    "user_id": root_message.user_id,
+                                    "channel_id": root_message.channel_id
+                                },
+                                "user": {
+                                    "id": user.id,
+                                    "email": user.email,
+                                    "name": user.name,
+                                    "picture": user.picture
+                                }
+                            }
+                        }
+                        await events.broadcast_to_channel(message_data, channel_id)
+                    
+                        # Also broadcast an update to the root message to show it has replies
+                        root_message_data = {
+                            "type": "message_update",
+                            "channel_id": channel_id,
+                            "message": {
                                 "id": root_message.id,
                                 "content": root_message.content,
                                 "created_at": root_message.created_at.isoformat(),
+                                "updated_at": root_message.updated_at.isoformat(),
                                 "user_id": root_message.user_id,
-                                "channel_id": root_message.channel_id
-                            },
-                            "user": {
-                                "id": user.id,
-                                "email": user.email,
-                                "name": user.name,
-                                "picture": user.picture
-                            }
-                        }
-                    }
-                    await events.broadcast_to_channel(message_data, channel_id)
-                    
-                    # Also broadcast an update to the root message to show it has replies
-                    root_message_data = {
-                        "type": "message_update",
-                        "channel_id": channel_id,
-                        "message": {
-                            "id": root_message.id,
-                            "content": root_message.content,
-                            "created_at": root_message.created_at.isoformat(),
-                            "updated_at": root_message.updated_at.isoformat(),
-                            "user_id": root_message.user_id,
-                            "channel_id": root_message.channel_id,
-                            "parent_id": root_message.parent_id,
-                            "has_replies": True,
-                            "user": {
-                                "id": root_message.user.id,
-                                "email": root_message.user.email,
-                                "name": root_message.user.name,
-                                "picture": root_message.user.picture
+                                "channel_id": root_message.channel_id,
+                                "parent_id": root_message.parent_id,
+                                "has_replies": True,
+                                "reply_count": root_message.reply_count,
+                                "last_reply_at": root_message.last_reply_at.isoformat() if root_message.last_reply_at else None,
+                                "user": {
+                                    "id": root_author.id,
+                                    "email": root_author.email,
+                                    "name": root_author.name,
+                                    "picture": root_author.picture
+                                }
                             }
                         }
-                    }
-                    await events.broadcast_to_channel(root_message_data, channel_id)
+                        await events.broadcast_to_channel(root_message_data, channel_id)
                 
-                elif event_type == "add_reaction":
-                    message_id = data.get('message_id')
-                    reaction_id = data.get('reaction_id')
-                    if not message_id or not reaction_id:
-                        continue
+                    elif event_type == "add_reaction":
+                        message_id = data.get('message_id')
+                        reaction_id = data.get('reaction_id')
+                        if not message_id or not reaction_id:
+                            continue
                     
-                    # Verify message belongs to channel
-                    db_message = get_message(db, message_id=message_id)
-                    if not db_message or db_message.channel_id != channel_id:
-                        continue
+                        # Verify message belongs to channel
+                        db_message = await get_message(db, message_id=message_id)
+                        if not db_message or db_message.channel_id != channel_id:
+                            continue
                     
-                    # Add the reaction
-                    message_reaction = add_reaction_to_message(
-                        db=db,
-                        message_id=message_id,
-                        reaction_id=reaction_id,
-                        user_id=user.id
-                    )
+                        # Add the reaction
+                        message_reaction = await add_reaction_to_message(
+                            db,
+                            message_id=message_id,
+                            reaction_id=reaction_id,
+                            user_id=user.id
+                        )
                     
-                    # Get the reaction object
-                    db_reaction = get_reaction(db, reaction_id=reaction_id)
+                        # Get the reaction object
+                        db_reaction = await get_reaction(db, reaction_id=reaction_id)
                     
-                    # Broadcast the reaction
-                    reaction_data = {
-                        "type": "message_reaction_add",
-                        "channel_id": channel_id,
-                        "message_id": message_id,
-                        "reaction": {
-                            "id": message_reaction.id,
-                            "message_id": message_reaction.message_id,
-                            "reaction_id": message_reaction.reaction_id,
-                            "user_id": message_reaction.user_id,
-                            "created_at": message_reaction.created_at.isoformat(),
+                        # Broadcast the reaction
+                        reaction_data = {
+                            "type": "message_reaction_add",
+                            "channel_id": channel_id,
+                            "message_id": message_id,
                             "reaction": {
-                                "id": db_reaction.id,
-                                "code": db_reaction.code,
-                                "is_system": db_reaction.is_system,
-                                "image_url": db_reaction.image_url
-                            },
-                            "user": {
-                                "id": user.id,
-                                "email": user.email,
-                                "name": user.name,
-                                "picture": user.picture
+                                "id": message_reaction.id,
+                                "message_id": message_reaction.message_id,
+                                "reaction_id": message_reaction.reaction_id,
+                                "user_id": message_reaction.user_id,
+                                "created_at": message_reaction.created_at.isoformat(),
+                                "reaction": {
+                                    "id": db_reaction.id,
+                                    "code": db_reaction.code,
+                                    "is_system": db_reaction.is_system,
+                                    "image_url": db_reaction.image_url
+                                },
+                                "user": {
+                                    "id": user.id,
+                                    "email": user.email,
+                                    "name": user.name,
+                                    "picture": user.picture
+                                }
                             }
                         }
-                    }
-                    await events.broadcast_to_channel(reaction_data, channel_id)
+                        await events.broadcast_to_channel(reaction_data, channel_id)
                 
-                elif event_type == "remove_reaction":
-                    message_id = data.get('message_id')
-                    reaction_id = data.get('reaction_id')
-                    if not message_id or not reaction_id:
-                        continue
+                    elif event_type == "remove_reaction":
+                        message_id = data.get('message_id')
+                        reaction_id = data.get('reaction_id')
+                        if not message_id or not reaction_id:
+                            continue
                     
-                    # Verify message belongs to channel
-                    db_message = get_message(db, message_id=message_id)
-                    if not db_message or db_message.channel_id != channel_id:
-                        continue
+                        # Verify message belongs to channel
+                        db_message = await get_message(db, message_id=message_id)
+                        if not db_message or db_message.channel_id != channel_id:
+                            continue
                     
-                    # Remove the reaction
-                    if remove_reaction_from_message(db, message_id, reaction_id, user.id):
-                        # Broadcast the removal
-                        reaction_data = {
-                            "type": "message_reaction_remove",
-                            "channel_id": channel_id,
-                            "message_id": message_id,
-                            "reaction_id": reaction_id,
-                            "user_id": user.id
-                        }
-                        await events.broadcast_to_channel(reaction_data, channel_id)
+                        # Remove the reaction
+                        if await remove_reaction_from_message(db, message_id, reaction_id, user.id):
+                            # Broadcast the removal
+                            reaction_data = {
+                                "type": "message_reaction_remove",
+                                "channel_id": channel_id,
+                                "message_id": message_id,
+                                "reaction_id": reaction_id,
+                                "user_id": user.id
+                            }
+                            await events.broadcast_to_channel(reaction_data, channel_id)
                 
         except WebSocketDisconnect:
             logger.info(f"WebSocket disconnect for user {user_id}")
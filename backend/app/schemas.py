@@ -94,6 +94,14 @@ class MessageReaction(BaseModel):
     class Config:
         orm_mode = True
 
+class ReactionSummary(BaseModel):
+    """How many users reacted to a message with one reaction, without listing them"""
+    reaction_id: int
+    code: str
+    image_url: Optional[str] = None
+    count: int
+    reacted_by_me: bool = False
+
 class MessageReplyCreate(MessageBase):
     pass
 
@@ -106,9 +114,13 @@ class Message(MessageBase):
     channel_id: int
     parent_id: Optional[int] = None
     has_replies: bool = False
+    reply_count: int = 0
+    last_reply_at: Optional[datetime] = None
     from_ai: Optional[bool] = False
     user: UserInChannel
     reactions: List[MessageReaction] = []
+    # Set instead of reactions when a page is loaded with reaction_summary=True
+    reaction_summary: Optional[List[ReactionSummary]] = None
     parent: Optional['Message'] = None
     files: List[FileUpload] = []
     highlight: Optional[SearchHighlight] = None
@@ -182,8 +194,10 @@ class TokenData(BaseModel):
 
 class MessageList(BaseModel):
     messages: List[Message]
-    total: int
+    total: Optional[int] = None
     has_more: bool
+    # Opaque cursor for the next (older) page, when paging by cursor
+    next_cursor: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -0,0 +1,134 @@
+"""Server-side cache of serialized search responses.
+
+Entries are keyed by the endpoint, the user whose access scopes the results (None when
+results are the same for everyone) and the normalized query parameters. Each entry
+records the version of every tag it was built from:
+
+- `channel:<id>` for each channel whose messages or files it searched
+- `member:<user_id>` for the user's channel list
+- `users` and `channels` for the user and channel directories
+
+Channel events published on the backplane bump the matching tags on every worker, so a
+new, edited or deleted message only evicts searches that covered its channel. Membership
+changes bump `member:<user_id>` and `channels` through MembershipService.invalidate,
+whether they were made on this worker or arrived as subscription events from another.
+Entries also expire after SEARCH_CACHE_EXPIRATION_SECONDS as a backstop for writes that
+are not broadcast. Responses carry an ETag, and requests that present it get a 304.
+"""
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+from fastapi import Request, Response
+
+from .auth_cache import ExpiringCache
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_EXPIRATION_SECONDS = int(os.getenv('SEARCH_CACHE_EXPIRATION_SECONDS', '300'))
+SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', '500'))
+
+USERS_TAG = "users"
+CHANNELS_TAG = "channels"
+
+# Channel events that never change search results
+IGNORED_EVENTS = {"user_status_change", "role_updated", "ai_message_delta", "ai_message_cancelled"}
+# Channel events that change what the channel directory search returns
+CHANNEL_DIRECTORY_EVENTS = {"channel_created", "channel_update", "privacy_updated", "member_joined", "member_left"}
+MEMBERSHIP_EVENTS = {"member_joined", "member_left"}
+
+def channel_tag(channel_id: int) -> str:
+    return f"channel:{channel_id}"
+
+def member_tag(user_id: int) -> str:
+    return f"member:{user_id}"
+
+@dataclass
+class CachedSearch:
+    body: bytes
+    etag: str
+    versions: Dict[str, int]
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+class SearchCache:
+    def __init__(self, max_size: int = SEARCH_CACHE_SIZE, ttl: float = SEARCH_CACHE_EXPIRATION_SECONDS):
+        self.ttl = ttl
+        self._entries = ExpiringCache(max_size)
+        self._tag_versions: Dict[str, int] = {}
+        self.stale = 0
+
+    def key(self, endpoint: str, user_id: Optional[int], params: dict) -> str:
+        normalized = {name: value for name, value in params.items() if value is not None}
+        return f"{endpoint}:{user_id}:{json.dumps(normalized, sort_keys=True, default=str)}"
+
+    def versions(self, tags: Iterable[str]) -> Dict[str, int]:
+        """Current versions of `tags`. Take them before reading the data the tags cover,
+        so a write that lands mid-search leaves the entry stale rather than wrong."""
+        return {tag: self._tag_versions.get(tag, 0) for tag in tags}
+
+    def get(self, key: str) -> Optional[CachedSearch]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if any(self._tag_versions.get(tag, 0) != version for tag, version in entry.versions.items()):
+            self._entries.invalidate(key)
+            self.stale += 1
+            return None
+        return entry
+
+    def put(self, key: str, content, versions: Dict[str, int]) -> CachedSearch:
+        """Serialize `content` (already JSON-compatible) and cache it"""
+        # Same encoding as FastAPI's JSONResponse
+        body = json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+        entry = CachedSearch(body=body, etag=f'"{hashlib.sha1(body).hexdigest()}"', versions=versions)
+        self._entries.put(key, entry, self.ttl)
+        return entry
+
+    def respond(self, request: Request, entry: CachedSearch) -> Response:
+        """The cached body, or a 304 when the client already holds it"""
+        headers = {"ETag": entry.etag}
+        if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def invalidate(self, *tags: str):
+        for tag in tags:
+            self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+
+    def invalidate_for_event(self, message: dict, channel_id: int):
+        """Bump the tags a channel event affects; called for every event on the backplane"""
+        event_type = message.get("type")
+        if event_type in IGNORED_EVENTS:
+            return
+        tags = [channel_tag(channel_id)]
+        if event_type in CHANNEL_DIRECTORY_EVENTS:
+            tags.append(CHANNELS_TAG)
+        if event_type in MEMBERSHIP_EVENTS:
+            user_id = message.get("user_id") or (message.get("user") or {}).get("id")
+            if user_id is not None:
+                tags.append(member_tag(user_id))
+        self.invalidate(*tags)
+
+    def stats(self) -> dict:
+        stats = self._entries.stats()
+        # Entries dropped as stale were found in the LRU but served as misses
+        hits, misses = stats["hits"] - self.stale, stats["misses"] + self.stale
+        return {
+            **stats,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+            "stale": self.stale,
+            "tags": len(self._tag_versions)
+        }
+
+# Create a singleton instance
+search_cache = SearchCache()
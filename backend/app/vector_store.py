@@ -0,0 +1,415 @@
+"""Vector stores used for message retrieval.
+
+Every store takes Pinecone-style arguments and returns Pinecone-style results
+({"matches": [{"id", "score", "metadata"}]}) so callers don't care which one is
+configured. VECTOR_STORE selects the implementation:
+
+- pinecone (default): the remote Pinecone index. Its client is sync, so operations run
+  on worker threads behind a timeout and a concurrency limit.
+- local: an in-process index persisted to memory-mapped files under
+  LOCAL_VECTOR_STORE_PATH. Searches are exact (NumPy brute force) until the store grows
+  past LOCAL_VECTOR_IVF_THRESHOLD vectors, then an IVF index narrows unfiltered searches
+  to the nearest clusters. The local store lives in one process, so it suits a single
+  worker, offline development and recall benchmarks.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
+INDEX_NAME = os.getenv("PINECONE_INDEX")
+
+VECTOR_STORE = os.getenv('VECTOR_STORE', 'pinecone').lower()
+# Seconds to wait for a single Pinecone operation, and how many may run at once. Kept
+# below the default thread pool size so index calls cannot starve other to_thread work.
+VECTOR_INDEX_TIMEOUT = float(os.getenv('VECTOR_INDEX_TIMEOUT', '10'))
+VECTOR_INDEX_MAX_CONCURRENCY = int(os.getenv('VECTOR_INDEX_MAX_CONCURRENCY', '4'))
+
+LOCAL_VECTOR_STORE_PATH = os.getenv('LOCAL_VECTOR_STORE_PATH', 'vector_index')
+# Vector count at which the local store builds an IVF index
+LOCAL_VECTOR_IVF_THRESHOLD = int(os.getenv('LOCAL_VECTOR_IVF_THRESHOLD', '50000'))
+# Clusters searched per IVF query; higher is slower with better recall
+LOCAL_VECTOR_IVF_NPROBE = int(os.getenv('LOCAL_VECTOR_IVF_NPROBE', '8'))
+# Filtered searches matching at most this many vectors skip IVF and are exact
+LOCAL_VECTOR_EXACT_LIMIT = int(os.getenv('LOCAL_VECTOR_EXACT_LIMIT', '20000'))
+# Minimum seconds between snapshots to disk while writes are coming in
+LOCAL_VECTOR_FLUSH_INTERVAL = float(os.getenv('LOCAL_VECTOR_FLUSH_INTERVAL', '60'))
+
+# (vector_id, values, metadata), as accepted by Pinecone's upsert
+Vector = Tuple[str, List[float], Dict]
+
+class VectorStore(ABC):
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    async def query(self, vector: List[float], top_k: int = 10, filter: Optional[Dict] = None,
+                    include_metadata: bool = True) -> Dict:
+        pass
+
+    @abstractmethod
+    async def upsert(self, vectors: List[Vector]):
+        pass
+
+    @abstractmethod
+    async def update(self, id: str, values: Optional[List[float]] = None, set_metadata: Optional[Dict] = None):
+        pass
+
+    @abstractmethod
+    async def delete(self, ids: List[str]):
+        pass
+
+class PineconeVectorStore(VectorStore):
+    """Runs Pinecone index operations on worker threads so they never block the event loop"""
+    def __init__(self, api_key: Optional[str] = PINECONE_API_KEY, index_name: Optional[str] = INDEX_NAME):
+        self.api_key = api_key
+        self.index_name = index_name
+        self._index = None
+        self._semaphore = asyncio.Semaphore(VECTOR_INDEX_MAX_CONCURRENCY)
+
+    @property
+    def index(self):
+        # Connecting looks the index up over the network, so it waits until first use
+        if self._index is None:
+            from pinecone import Pinecone
+            self._index = Pinecone(api_key=self.api_key).Index(self.index_name)
+        return self._index
+
+    async def _run(self, method: str, **kwargs) -> Any:
+        # Resolve the index on the worker thread too, since the first access connects
+        async with self._semaphore:
+            return await asyncio.wait_for(
+                asyncio.to_thread(lambda: getattr(self.index, method)(**kwargs)),
+                timeout=VECTOR_INDEX_TIMEOUT
+            )
+
+    async def query(self, vector, top_k=10, filter=None, include_metadata=True):
+        return await self._run("query", vector=vector, top_k=top_k, filter=filter, include_metadata=include_metadata)
+
+    async def upsert(self, vectors):
+        return await self._run("upsert", vectors=vectors)
+
+    async def update(self, id, values=None, set_metadata=None):
+        kwargs = {"id": id}
+        if values is not None:
+            kwargs["values"] = values
+        if set_metadata is not None:
+            kwargs["set_metadata"] = set_metadata
+        return await self._run("update", **kwargs)
+
+    async def delete(self, ids):
+        return await self._run("delete", ids=ids)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+class IVFIndex:
+    """Inverted file index: vectors are grouped by their nearest k-means centroid and a
+    query only scores the vectors in its nprobe nearest clusters."""
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray, trained_size: int):
+        self.centroids = centroids
+        self.assignments = assignments
+        self.trained_size = trained_size
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, rows: np.ndarray, iterations: int = 10, seed: int = 0) -> "IVFIndex":
+        nlist = max(1, int(np.sqrt(len(rows))))
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(rows, size=min(len(rows), nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+        for _ in range(iterations):
+            nearest = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = sample[nearest == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        index = cls(centroids, np.full(len(vectors), -1, dtype=np.int32), len(rows))
+        for start in range(0, len(rows), 10000):
+            batch = rows[start:start + 10000]
+            index.assignments[batch] = np.argmax(vectors[batch] @ centroids.T, axis=1)
+        return index
+
+    def assign(self, row: int, vector: np.ndarray):
+        if row >= len(self.assignments):
+            grown = np.full(max(row + 1, len(self.assignments) * 2), -1, dtype=np.int32)
+            grown[:len(self.assignments)] = self.assignments
+            self.assignments = grown
+        self.assignments[row] = int(np.argmax(self.centroids @ vector))
+
+    def probe_mask(self, query: np.ndarray, nprobe: int, size: int) -> np.ndarray:
+        nprobe = min(nprobe, len(self.centroids))
+        clusters = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.isin(self.assignments[:size], clusters)
+
+def _matches(value: Any, op: str, expected: Any) -> bool:
+    if op == "$eq":
+        return value == expected
+    if op == "$ne":
+        return value != expected
+    if op == "$in":
+        return value in expected
+    if op == "$nin":
+        return value not in expected
+    raise ValueError(f"Unsupported filter operator {op}")
+
+class LocalVectorStore(VectorStore):
+    """In-process vector store with Pinecone-compatible filters ($eq, $ne, $in, $nin)"""
+    # Integer metadata fields kept as NumPy columns so filtering on them is vectorized
+    FILTER_COLUMNS = ("channel_id", "user_id", "message_id")
+
+    def __init__(
+        self,
+        path: str = LOCAL_VECTOR_STORE_PATH,
+        ivf_threshold: int = LOCAL_VECTOR_IVF_THRESHOLD,
+        nprobe: int = LOCAL_VECTOR_IVF_NPROBE,
+        exact_limit: int = LOCAL_VECTOR_EXACT_LIMIT
+    ):
+        self.path = path
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.exact_limit = exact_limit
+        self._lock = threading.RLock()
+        self.size = 0
+        self.dim: Optional[int] = None
+        self.ids: List[str] = []
+        self.metadata: List[Optional[Dict]] = []
+        self.rows: Dict[str, int] = {}
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.columns = {name: np.zeros(0, dtype=np.int64) for name in self.FILTER_COLUMNS}
+        self.ivf: Optional[IVFIndex] = None
+        self._writable = True
+        self._pending_writes = 0
+        self._flushed_at = time.monotonic()
+
+    # Lifecycle and persistence
+
+    async def start(self):
+        await asyncio.to_thread(self.load)
+
+    async def stop(self):
+        await asyncio.to_thread(self.flush)
+
+    def load(self):
+        """Load the last snapshot; vectors stay memory-mapped until the first write"""
+        records_path = os.path.join(self.path, "records.json")
+        if not os.path.exists(records_path):
+            return
+        with self._lock:
+            with open(records_path) as f:
+                records = json.load(f)
+            self.ids = records["ids"]
+            self.metadata = records["metadata"]
+            self.dim = records["dim"]
+            self.size = len(self.ids)
+            self.rows = {vector_id: row for row, vector_id in enumerate(self.ids) if self.metadata[row] is not None}
+            self.vectors = np.load(os.path.join(self.path, "vectors.npy"), mmap_mode="r")
+            self.alive = np.array([meta is not None for meta in self.metadata], dtype=bool)
+            for name in self.FILTER_COLUMNS:
+                self.columns[name] = np.array([self._column_value(meta, name) for meta in self.metadata], dtype=np.int64)
+            ivf_path = os.path.join(self.path, "ivf.npz")
+            if os.path.exists(ivf_path):
+                data = np.load(ivf_path)
+                self.ivf = IVFIndex(data["centroids"], data["assignments"], int(data["trained_size"]))
+            self._writable = False
+        logger.info(f"Loaded local vector store with {len(self.rows)} vectors from {self.path}")
+
+    def flush(self):
+        """Write a snapshot to disk, retraining the IVF index if the store outgrew it"""
+        with self._lock:
+            if self.dim is None or not self._pending_writes:
+                return
+            self._maybe_train()
+            os.makedirs(self.path, exist_ok=True)
+            self._atomic_write("vectors.npy", lambda f: np.save(f, np.asarray(self.vectors[:self.size])))
+            self._atomic_write("records.json", lambda f: f.write(json.dumps({
+                "dim": self.dim, "ids": self.ids, "metadata": self.metadata
+            }).encode()))
+            if self.ivf is not None:
+                self._atomic_write("ivf.npz", lambda f: np.savez(
+                    f, centroids=self.ivf.centroids, assignments=self.ivf.assignments[:self.size],
+                    trained_size=self.ivf.trained_size
+                ))
+            self._pending_writes = 0
+            self._flushed_at = time.monotonic()
+
+    def _atomic_write(self, name: str, write):
+        tmp_path = os.path.join(self.path, f"{name}.tmp")
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, os.path.join(self.path, name))
+
+    def _maybe_train(self):
+        live = len(self.rows)
+        if live < self.ivf_threshold:
+            self.ivf = None
+        elif self.ivf is None or live > 2 * self.ivf.trained_size:
+            self.train_ivf()
+
+    def train_ivf(self):
+        """(Re)build the IVF index over all live vectors"""
+        with self._lock:
+            logger.info(f"Training IVF index over {len(self.rows)} vectors")
+            self.ivf = IVFIndex.train(np.asarray(self.vectors[:self.size]), np.flatnonzero(self.alive[:self.size]))
+
+    # Writes
+
+    @staticmethod
+    def _column_value(metadata: Optional[Dict], name: str) -> int:
+        value = (metadata or {}).get(name)
+        return value if isinstance(value, int) and not isinstance(value, bool) else -1
+
+    def _ensure_capacity(self, needed: int):
+        if not self._writable or needed > len(self.vectors):
+            capacity = max(needed, 2 * len(self.vectors), 1024)
+            vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            if self.size:
+                vectors[:self.size] = self.vectors[:self.size]
+            self.vectors = vectors
+            self.alive = np.concatenate([self.alive[:self.size], np.zeros(capacity - self.size, dtype=bool)])
+            for name in self.FILTER_COLUMNS:
+                column = self.columns[name][:self.size]
+                self.columns[name] = np.concatenate([column, np.full(capacity - self.size, -1, dtype=np.int64)])
+            self._writable = True
+
+    def _set_row(self, row: int, values: Optional[List[float]], metadata: Dict):
+        if values is not None:
+            vector = _normalize(np.asarray(values, dtype=np.float32))
+            self.vectors[row] = vector
+            if self.ivf is not None:
+                self.ivf.assign(row, vector)
+        self.metadata[row] = metadata
+        self.alive[row] = True
+        for name in self.FILTER_COLUMNS:
+            self.columns[name][row] = self._column_value(metadata, name)
+
+    def _after_write(self, count: int):
+        self._pending_writes += count
+        if time.monotonic() - self._flushed_at >= LOCAL_VECTOR_FLUSH_INTERVAL:
+            self.flush()
+
+    def upsert_sync(self, vectors: List[Vector]):
+        with self._lock:
+            if self.dim is None and vectors:
+                self.dim = len(vectors[0][1])
+            self._ensure_capacity(self.size + len(vectors))
+            for vector_id, values, metadata in vectors:
+                row = self.rows.get(vector_id)
+                if row is None:
+                    row = self.size
+                    self.size += 1
+                    self.ids.append(vector_id)
+                    self.metadata.append(None)
+                    self.rows[vector_id] = row
+                self._set_row(row, values, dict(metadata))
+            self._after_write(len(vectors))
+
+    def update_sync(self, id: str, values: Optional[List[float]] = None, set_metadata: Optional[Dict] = None):
+        with self._lock:
+            row = self.rows.get(id)
+            if row is None:
+                return
+            self._ensure_capacity(self.size)
+            self._set_row(row, values, {**self.metadata[row], **(set_metadata or {})})
+            self._after_write(1)
+
+    def delete_sync(self, ids: List[str]):
+        with self._lock:
+            self._ensure_capacity(self.size)
+            for vector_id in ids:
+                row = self.rows.pop(vector_id, None)
+                if row is not None:
+                    self.alive[row] = False
+                    self.metadata[row] = None
+            self._after_write(len(ids))
+
+    # Search
+
+    def _filter_mask(self, filter: Optional[Dict]) -> np.ndarray:
+        mask = self.alive[:self.size].copy()
+        for field, condition in (filter or {}).items():
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, expected in condition.items():
+                if field in self.columns:
+                    column = self.columns[field][:self.size]
+                    if op == "$eq":
+                        mask &= column == expected
+                    elif op == "$ne":
+                        mask &= column != expected
+                    elif op == "$in":
+                        mask &= np.isin(column, list(expected))
+                    elif op == "$nin":
+                        mask &= ~np.isin(column, list(expected))
+                    else:
+                        raise ValueError(f"Unsupported filter operator {op}")
+                else:
+                    mask &= np.fromiter(
+                        (meta is not None and _matches(meta.get(field), op, expected) for meta in self.metadata),
+                        dtype=bool, count=self.size
+                    )
+        return mask
+
+    def query_sync(self, vector: List[float], top_k: int = 10, filter: Optional[Dict] = None,
+                   include_metadata: bool = True, exact: bool = False) -> Dict:
+        with self._lock:
+            if self.size == 0:
+                return {"matches": []}
+            query = _normalize(np.asarray(vector, dtype=np.float32))
+            mask = self._filter_mask(filter)
+            if not exact and self.ivf is not None and mask.sum() > self.exact_limit:
+                mask &= self.ivf.probe_mask(query, self.nprobe, self.size)
+            rows = np.flatnonzero(mask)
+            if rows.size == 0:
+                return {"matches": []}
+
+            scores = self.vectors[rows] @ query
+            k = min(top_k, rows.size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return {"matches": [
+                {
+                    "id": self.ids[rows[i]],
+                    "score": float(scores[i]),
+                    "metadata": dict(self.metadata[rows[i]]) if include_metadata else {}
+                }
+                for i in top
+            ]}
+
+    async def query(self, vector, top_k=10, filter=None, include_metadata=True):
+        return await asyncio.to_thread(self.query_sync, vector, top_k, filter, include_metadata)
+
+    async def upsert(self, vectors):
+        await asyncio.to_thread(self.upsert_sync, vectors)
+
+    async def update(self, id, values=None, set_metadata=None):
+        await asyncio.to_thread(self.update_sync, id, values, set_metadata)
+
+    async def delete(self, ids):
+        await asyncio.to_thread(self.delete_sync, ids)
+
+def create_vector_store() -> VectorStore:
+    """Build the vector store selected by VECTOR_STORE ('pinecone' or 'local')"""
+    if VECTOR_STORE == 'local':
+        return LocalVectorStore(LOCAL_VECTOR_STORE_PATH)
+    return PineconeVectorStore()
+
+# Create a singleton instance
+vector_store = create_vector_store()
@@ -1,12 +1,17 @@
-from typing import Dict, List, Set, Literal
+from typing import Callable, Dict, Iterable, List, Optional, Set, Literal, Tuple
 from fastapi import WebSocket, status
 from datetime import datetime, timedelta
 from . import models
 from . import schemas
 from .database import SessionLocal
 from .ai_service import generate_user_persona_profile
+from .backplane import create_backplane
+from .search_cache import search_cache
+from .membership import membership
 import asyncio
+import json
 import logging
+import os
 
 # Configure logging
 # logging.basicConfig(level=logging.DEBUG)
@@ -16,15 +21,33 @@ logger = logging.getLogger(__name__)
 # Define possible user statuses
 UserStatus = Literal["online", "away", "offline"]
 
+# Outbound frames buffered per socket before the client is treated as a slow consumer and dropped
+SEND_QUEUE_SIZE = int(os.getenv('WEBSOCKET_SEND_QUEUE_SIZE', '256'))
+# Presence reported by other workers expires unless they re-announce it within this window
+PRESENCE_TTL = timedelta(seconds=int(os.getenv('WEBSOCKET_PRESENCE_TTL', '90')))
+
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[WebSocket, int] = {}
         self.user_connections: Dict[int, List[WebSocket]] = {}
         self.user_channels: Dict[int, Set[int]] = {}
+        # Reverse index of channel_id -> live sockets, so fan-out only touches subscribers
+        self.channel_connections: Dict[int, Set[WebSocket]] = {}
+        # Bounded outbound queue and its writer task per socket
+        self.send_queues: Dict[WebSocket, asyncio.Queue] = {}
+        self.writer_tasks: Dict[WebSocket, asyncio.Task] = {}
         self.total_connections = 0
         # Add status tracking
         self.user_statuses: Dict[int, UserStatus] = {}
         self.last_activity: Dict[int, datetime] = {}
+        # Presence of users connected to other workers: user_id -> {node_id: (status, reported_at)}
+        self.remote_statuses: Dict[int, Dict[str, Tuple[UserStatus, datetime]]] = {}
+        self.presence_announced_at: Dict[int, datetime] = {}
+        # Called with (user_id, status) when a user's presence changes on this or another worker
+        self.status_listeners: List[Callable[[int, UserStatus], None]] = []
+        # Shared bus carrying channel events, presence and subscriptions between workers
+        self.backplane = create_backplane()
+        self.backplane.set_handler(self.handle_backplane_event)
         # Status timeouts
         self.AWAY_TIMEOUT = timedelta(seconds=5)  # setting to 30 seconds for testing
         # self.AWAY_TIMEOUT = timedelta(minutes=5)  # Mark as away after 5 minutes of inactivity
@@ -45,8 +68,18 @@ class ConnectionManager:
             self.user_connections[user_id] = []
         
         self.user_connections[user_id].append(websocket)
+        self.active_connections[websocket] = user_id
+        self.send_queues[websocket] = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.writer_tasks[websocket] = asyncio.create_task(self._socket_writer(websocket, user_id))
+        # A new connection refreshes the user's channel set; unsubscribe their sockets from stale channels
+        for channel_id in self.user_channels.get(user_id, set()) - set(channels):
+            for existing_socket in self.user_connections[user_id]:
+                self._unindex_socket(existing_socket, channel_id)
         self.user_channels[user_id] = set(channels)
         self.total_connections += 1
+
+        for channel_id in self.user_channels[user_id]:
+            self._index_user_sockets(user_id, channel_id)
         
         # Set initial status
         self.user_statuses[user_id] = "online"
@@ -60,18 +93,26 @@ class ConnectionManager:
         if user_id in self.user_connections:
             if websocket in self.user_connections[user_id]:
                 self.user_connections[user_id].remove(websocket)
+                self.active_connections.pop(websocket, None)
+                self.send_queues.pop(websocket, None)
+                writer_task = self.writer_tasks.pop(websocket, None)
+                if writer_task and writer_task is not asyncio.current_task():
+                    writer_task.cancel()
                 self.total_connections -= 1
+
+                for channel_id in self.user_channels.get(user_id, ()):
+                    self._unindex_socket(websocket, channel_id)
                 
                 if not self.user_connections[user_id]:
                     del self.user_connections[user_id]
-                    del self.user_channels[user_id]
+                    channel_ids = self.user_channels.pop(user_id)
                     # Clean up status tracking
                     if user_id in self.user_statuses:
                         del self.user_statuses[user_id]
                     if user_id in self.last_activity:
                         del self.last_activity[user_id]
-                    # Broadcast offline status
-                    asyncio.create_task(self.broadcast_status_change(user_id, "offline"))
+                    # Broadcast offline status to the channels the user was in
+                    asyncio.create_task(self.broadcast_status_change(user_id, "offline", channel_ids))
                     # Generate user profile in background
                     asyncio.create_task(self._generate_profile_on_disconnect(user_id))
 
@@ -115,51 +156,197 @@ class ConnectionManager:
                 await self.broadcast_status_change(user_id, "away")
                 logger.info(f"User {user_id} status broadcast complete")
 
+            # Keep presence fresh on the other workers
+            announced_at = self.presence_announced_at.get(user_id)
+            if announced_at is None or current_time - announced_at >= PRESENCE_TTL / 3:
+                await self._publish_presence(user_id, self.user_statuses[user_id])
+
     def is_user_connected(self, user_id: int) -> bool:
         """Check if a user is still connected"""
         return user_id in self.user_connections and len(self.user_connections[user_id]) > 0
 
     def get_user_status(self, user_id: int) -> UserStatus:
-        """Get the current status of a user"""
-        if user_id not in self.user_connections:
+        """Get the current status of a user across all workers"""
+        if user_id in self.user_connections:
+            return self.user_statuses.get(user_id, "offline")
+        return self._remote_status(user_id)
+
+    def _remote_status(self, user_id: int) -> UserStatus:
+        """Best status reported for a user by other workers, ignoring expired reports"""
+        reports = self.remote_statuses.get(user_id)
+        if not reports:
             return "offline"
-        return self.user_statuses.get(user_id, "offline")
+        now = datetime.now()
+        live = [status for status, reported_at in reports.values() if now - reported_at < PRESENCE_TTL]
+        if "online" in live:
+            return "online"
+        if "away" in live:
+            return "away"
+        return "offline"
+
+    def add_status_listener(self, listener: Callable[[int, UserStatus], None]):
+        """Register a callback for presence changes reported by any worker"""
+        self.status_listeners.append(listener)
+
+    def _notify_status_listeners(self, user_id: int, status: UserStatus):
+        for listener in self.status_listeners:
+            try:
+                listener(user_id, status)
+            except Exception as e:
+                logger.error(f"Error in status listener for user {user_id}: {e}")
+
+    async def _publish_presence(self, user_id: int, status: UserStatus):
+        if status == "offline":
+            self.presence_announced_at.pop(user_id, None)
+        else:
+            self.presence_announced_at[user_id] = datetime.now()
+        await self.backplane.publish({
+            "kind": "presence",
+            "user_id": user_id,
+            "status": status
+        })
 
-    async def broadcast_status_change(self, user_id: int, status: UserStatus):
+    async def broadcast_status_change(self, user_id: int, status: UserStatus, channel_ids: Optional[Iterable[int]] = None):
         """Broadcast a user's status change to relevant channels"""
+        self._notify_status_listeners(user_id, status)
+        await self._publish_presence(user_id, status)
         message = {
             "type": "user_status_change",
             "user_id": user_id,
             "status": status
         }
         # Broadcast to all channels the user is in
-        if user_id in self.user_channels:
-            for channel_id in self.user_channels[user_id]:
-                await self.broadcast_to_channel(message, channel_id)
+        if channel_ids is None:
+            channel_ids = self.user_channels.get(user_id, ())
+        for channel_id in list(channel_ids):
+            await self.broadcast_to_channel(message, channel_id)
 
-    def add_channel_for_user(self, user_id: int, channel_id: int):
+    def _index_user_sockets(self, user_id: int, channel_id: int):
+        """Register all of a user's live sockets as subscribers of a channel"""
+        sockets = self.user_connections.get(user_id)
+        if sockets:
+            self.channel_connections.setdefault(channel_id, set()).update(sockets)
+
+    def _unindex_socket(self, websocket: WebSocket, channel_id: int):
+        """Drop a socket from a channel's subscribers, pruning empty channels"""
+        subscribers = self.channel_connections.get(channel_id)
+        if subscribers is not None:
+            subscribers.discard(websocket)
+            if not subscribers:
+                del self.channel_connections[channel_id]
+
+    def _subscribe_local(self, user_id: int, channel_id: int):
         if user_id in self.user_channels:
             self.user_channels[user_id].add(channel_id)
+            self._index_user_sockets(user_id, channel_id)
+
+    def _unsubscribe_local(self, user_id: int, channel_id: int):
+        if user_id in self.user_channels:
+            self.user_channels[user_id].discard(channel_id)
+            for websocket in self.user_connections.get(user_id, []):
+                self._unindex_socket(websocket, channel_id)
+
+    def _publish_nowait(self, event: dict):
+        """Publish from synchronous code paths without blocking the caller"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        asyncio.create_task(self.backplane.publish(event))
+
+    def add_channel_for_user(self, user_id: int, channel_id: int):
+        self._subscribe_local(user_id, channel_id)
+        # The user's sockets may live on another worker
+        self._publish_nowait({"kind": "subscription", "action": "add", "user_id": user_id, "channel_id": channel_id})
+
+    def remove_channel_for_user(self, user_id: int, channel_id: int):
+        self._unsubscribe_local(user_id, channel_id)
+        self._publish_nowait({"kind": "subscription", "action": "remove", "user_id": user_id, "channel_id": channel_id})
+
+    async def handle_backplane_event(self, event: dict, origin: str):
+        """Apply an event from the backplane to this worker's connections"""
+        kind = event.get("kind")
+        if kind == "channel":
+            search_cache.invalidate_for_event(event["message"], event["channel_id"])
+            membership.invalidate_for_event(event["message"])
+            await self.deliver_to_channel(event["message"], event["channel_id"])
+            return
+
+        # Presence and subscription changes made on this worker were already applied locally
+        if origin == self.backplane.node_id:
+            return
+
+        if kind == "presence":
+            user_id = event["user_id"]
+            if event["status"] == "offline":
+                self.remote_statuses.get(user_id, {}).pop(origin, None)
+                if not self.remote_statuses.get(user_id):
+                    self.remote_statuses.pop(user_id, None)
+            else:
+                self.remote_statuses.setdefault(user_id, {})[origin] = (event["status"], datetime.now())
+            self._notify_status_listeners(user_id, event["status"])
+        elif kind == "subscription":
+            membership.invalidate(event["user_id"])
+            if event["action"] == "add":
+                self._subscribe_local(event["user_id"], event["channel_id"])
+            else:
+                self._unsubscribe_local(event["user_id"], event["channel_id"])
+
+    async def start(self):
+        """Start listening on the backplane"""
+        await self.backplane.start()
+
+    async def stop(self):
+        await self.backplane.stop()
+
+    async def _socket_writer(self, websocket: WebSocket, user_id: int):
+        """Drain a socket's outbound queue so a slow client only delays itself"""
+        queue = self.send_queues[websocket]
+        try:
+            while True:
+                payload = await queue.get()
+                await websocket.send_text(payload)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.info(f"Send failed for user {user_id}, dropping socket: {e}")
+            self.disconnect(websocket, user_id)
+
+    async def _drop_slow_consumer(self, websocket: WebSocket, user_id: int):
+        """Disconnect a client whose outbound queue overflowed; it is expected to reconnect and resync"""
+        logger.warning(f"Send queue full for user {user_id}, dropping slow consumer")
+        self.disconnect(websocket, user_id)
+        try:
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        except Exception:
+            pass
 
     async def broadcast_to_channel(self, message: dict, channel_id: int):
-        # Create a list of tuples (user_id, websocket) to iterate over
-        connections_to_process = [
-            (user_id, websocket)
-            for user_id, channels in self.user_channels.items()
-            if channel_id in channels
-            for websocket in self.user_connections.get(user_id, [])
-        ]
-        
-        disconnected_websockets = []
-        for user_id, websocket in connections_to_process:
+        """Publish a channel event to every worker, including this one"""
+        await self.backplane.publish({
+            "kind": "channel",
+            "channel_id": channel_id,
+            "message": message
+        })
+
+    async def deliver_to_channel(self, message: dict, channel_id: int):
+        """Fan a channel event out to the sockets held by this worker"""
+        # Encode once per broadcast; every subscriber receives the same text frame
+        payload = json.dumps(message)
+
+        # Snapshot the subscribers, since dropping slow consumers mutates the index
+        slow_consumers = []
+        for websocket in list(self.channel_connections.get(channel_id, ())):
+            queue = self.send_queues.get(websocket)
+            if queue is None:
+                continue
             try:
-                await websocket.send_json(message)
-            except RuntimeError:
-                disconnected_websockets.append((websocket, user_id))
-        
-        # Handle disconnections after the broadcast is complete
-        for websocket, user_id in disconnected_websockets:
-            self.disconnect(websocket, user_id)
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                slow_consumers.append((websocket, self.active_connections.get(websocket)))
+
+        for websocket, user_id in slow_consumers:
+            await self._drop_slow_consumer(websocket, user_id)
 
     async def broadcast_member_joined(self, channel_id: int, user: schemas.User):
         message = {
@@ -0,0 +1,80 @@
+import sys
+import argparse
+import asyncio
+import statistics
+import time
+from pathlib import Path
+
+# Add the parent directory to the Python path so we can import our app modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+from app.database import SessionLocal, AsyncSessionLocal
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Each simulated request runs one query that holds the database for `delay` seconds,
+# standing in for a slow CRUD call inside an async route handler.
+QUERY = text("SELECT pg_sleep(:delay)")
+
+async def sync_request(delay: float) -> float:
+    """How routes behaved before: a sync session called directly from async code"""
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        db.execute(QUERY, {"delay": delay})
+    finally:
+        db.close()
+    return time.perf_counter() - started
+
+async def async_request(delay: float) -> float:
+    """The async path: the same query on an AsyncSession over asyncpg"""
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        await db.execute(QUERY, {"delay": delay})
+    return time.perf_counter() - started
+
+async def heartbeat(stop: asyncio.Event, lags: list):
+    """Measure how late the event loop wakes up, i.e. how long other sockets would stall"""
+    interval = 0.01
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+async def run(mode: str, requests: int, delay: float):
+    request_fn = sync_request if mode == "sync" else async_request
+    stop = asyncio.Event()
+    lags = []
+    beat = asyncio.create_task(heartbeat(stop, lags))
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(request_fn(delay) for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await beat
+
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{mode:>5}: {requests} requests in {elapsed:.2f}s "
+        f"({requests / elapsed:.1f} req/s), "
+        f"latency p50={statistics.median(latencies) * 1000:.0f}ms p99={p99 * 1000:.0f}ms, "
+        f"max event loop stall={max(lags, default=0) * 1000:.0f}ms"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare request concurrency of sync vs async database sessions")
+    parser.add_argument("--requests", type=int, default=50, help="Concurrent simulated requests")
+    parser.add_argument("--delay", type=float, default=0.05, help="Seconds each query holds the database")
+    args = parser.parse_args()
+
+    print(f"Running {args.requests} concurrent requests, {args.delay * 1000:.0f}ms per query")
+    asyncio.run(run("sync", args.requests, args.delay))
+    asyncio.run(run("async", args.requests, args.delay))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import sys
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+# Add the parent directory to the Python path so we can import our app modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+from app.vector_store import LocalVectorStore, LOCAL_VECTOR_STORE_PATH, PINECONE_API_KEY, INDEX_NAME
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+def match_ids(result) -> set:
+    return {match["id"] for match in result["matches"]}
+
+def latency_report(name: str, latencies: list) -> str:
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return f"{name:>8}: p50={statistics.median(latencies) * 1000:.1f}ms p99={p99 * 1000:.1f}ms"
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure recall and latency of the local vector store")
+    parser.add_argument("--path", default=LOCAL_VECTOR_STORE_PATH, help="Directory of the local vector store")
+    parser.add_argument("--queries", type=int, default=200, help="Query vectors sampled from the store")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=None, help="Override LOCAL_VECTOR_IVF_NPROBE")
+    parser.add_argument("--ivf", action="store_true", help="Train and use an IVF index even below the size threshold")
+    parser.add_argument("--remote", action="store_true", help="Also compare against the Pinecone index")
+    args = parser.parse_args()
+
+    store = LocalVectorStore(args.path)
+    store.load()
+    if not store.rows:
+        print(f"No vectors in {args.path}; run build_local_vector_index.py first")
+        return
+    if args.nprobe:
+        store.nprobe = args.nprobe
+    if args.ivf:
+        store.exact_limit = 0
+        if store.ivf is None:
+            store.train_ivf()
+
+    index = None
+    if args.remote:
+        from pinecone import Pinecone
+        index = Pinecone(api_key=PINECONE_API_KEY).Index(INDEX_NAME)
+
+    rng = np.random.default_rng(0)
+    live_rows = np.flatnonzero(store.alive[:store.size])
+    sample = rng.choice(live_rows, size=min(args.queries, len(live_rows)), replace=False)
+    # Perturb the stored vectors so queries are near, not identical to, indexed vectors
+    queries = np.asarray(store.vectors[sample]) + rng.normal(0, 0.01, (len(sample), store.dim)).astype(np.float32)
+
+    latencies = {"exact": [], "local": [], "remote": []}
+    recall_local, recall_remote = [], []
+    for query in queries:
+        exact, elapsed = timed(store.query_sync, query.tolist(), args.top_k, exact=True)
+        latencies["exact"].append(elapsed)
+        expected = match_ids(exact)
+
+        local, elapsed = timed(store.query_sync, query.tolist(), args.top_k)
+        latencies["local"].append(elapsed)
+        recall_local.append(len(match_ids(local) & expected) / len(expected))
+
+        if index is not None:
+            remote, elapsed = timed(index.query, vector=query.tolist(), top_k=args.top_k)
+            latencies["remote"].append(elapsed)
+            recall_remote.append(len({match["id"] for match in remote["matches"]} & expected) / len(expected))
+
+    mode = f"IVF, nprobe={store.nprobe}" if store.ivf is not None and store.exact_limit < len(store.rows) else "exact"
+    print(f"{len(queries)} queries over {len(store.rows)} vectors, top_k={args.top_k}, local mode: {mode}")
+    print(latency_report("exact", latencies["exact"]))
+    print(latency_report("local", latencies["local"]) + f" recall@{args.top_k}={statistics.mean(recall_local):.3f}")
+    if index is not None:
+        print(latency_report("remote", latencies["remote"]) + f" recall@{args.top_k}={statistics.mean(recall_remote):.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import sys
+import argparse
+from pathlib import Path
+
+# Add the parent directory to the Python path so we can import our app modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from pinecone import Pinecone
+from app.database import SessionLocal
+import app.models as models
+from app.vector_store import LocalVectorStore, LOCAL_VECTOR_STORE_PATH, PINECONE_API_KEY, INDEX_NAME
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main():
+    """Copy every message vector from Pinecone into a local vector store without re-embedding"""
+    parser = argparse.ArgumentParser(description="Build the local vector store from the Pinecone index")
+    parser.add_argument("--path", default=LOCAL_VECTOR_STORE_PATH, help="Directory of the local vector store")
+    parser.add_argument("--batch-size", type=int, default=100, help="Vectors fetched from Pinecone per request")
+    args = parser.parse_args()
+
+    index = Pinecone(api_key=PINECONE_API_KEY).Index(INDEX_NAME)
+    store = LocalVectorStore(args.path)
+    store.load()
+
+    db = SessionLocal()
+    try:
+        last_id = 0
+        copied = 0
+        while True:
+            rows = (db.query(models.Message.id, models.Message.vector_id)
+                    .filter(models.Message.id > last_id, models.Message.vector_id.isnot(None))
+                    .order_by(models.Message.id)
+                    .limit(args.batch_size)
+                    .all())
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            fetched = index.fetch(ids=[row.vector_id for row in rows]).vectors
+            store.upsert_sync([
+                (vector_id, vector.values, vector.metadata or {})
+                for vector_id, vector in fetched.items()
+            ])
+            copied += len(fetched)
+            logger.info(f"Copied {copied} vectors (through message {last_id})")
+    finally:
+        db.close()
+
+    store.flush()
+    logger.info(f"Local vector store at {args.path} holds {len(store.rows)} vectors")
+
+if __name__ == "__main__":
+    main()
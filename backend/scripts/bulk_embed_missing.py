@@ -1,97 +1,41 @@
-import os
 import sys
+import argparse
+import asyncio
 from pathlib import Path
 
 # Add the parent directory to the Python path so we can import our app modules
 sys.path.append(str(Path(__file__).parent.parent))
 
-from sqlalchemy.orm import Session
-from app.database import SessionLocal
-import app.models as models
-from app.embedding_service import embedding_service
+from app.bulk_embedding import BulkEmbedder, MISSING
 import logging
-from time import sleep
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_messages_without_vectors(db: Session, batch_size: int = 100):
-    """Get all messages that don't have vector IDs"""
-    return (db.query(models.Message)
-            .filter(models.Message.vector_id.is_(None))
-            .filter(models.Message.from_ai.is_(False))
-            .limit(batch_size)
-            .all())
-
-def process_message_batch(db: Session, messages: list[models.Message]):
-    """Process a batch of messages to create their embeddings"""
-    for message in messages:
-        try:
-            # Get channel and user information
-            channel = db.query(models.Channel).filter(models.Channel.id == message.channel_id).first()
-            user = db.query(models.User).filter(models.User.id == message.user_id).first()
-            
-            # Generate embedding and get vector_id
-            vector_id = embedding_service.create_message_embedding(
-                message_content=message.content,
-                channel_name=channel.name,
-                user_name=user.name,
-                message_id=message.id,
-                user_id=message.user_id,
-                channel_id=message.channel_id,
-                parent_id=message.parent_id,
-                file_name=message.files[0].file_name if message.files else None
-            )
-            
-            # Update message with vector_id
-            message.vector_id = vector_id
-            db.commit()
-            logger.info(f"Created embedding for message {message.id} with vector_id {vector_id}")
-            
-            # Small delay to avoid rate limits
-            sleep(0.1)
-            
-        except Exception as e:
-            logger.error(f"Error creating embedding for message {message.id}: {e}")
-            db.rollback()
-            continue
-
 def main():
-    """Main function to process all messages without vectors"""
-    logger.info("Starting bulk embedding process...")
-    
-    db = SessionLocal()
-    try:
-        # Get initial count of messages without vectors
-        total_messages = db.query(models.Message).filter(models.Message.vector_id.is_(None)).count()
-        logger.info(f"Found {total_messages} messages without vector embeddings")
-        
-        if total_messages == 0:
-            logger.info("No messages need processing. Exiting.")
-            return
-        
-        # Process messages in batches
-        batch_size = 100
-        
-        while True:
-            # Get next batch of messages
-            messages = get_messages_without_vectors(db, batch_size)
-            if not messages:
-                break
-                
-            # Process the batch
-            process_message_batch(db, messages)
-            
-        
-        # Final count check
-        remaining = db.query(models.Message).filter(models.Message.vector_id.is_(None)).count()
-        logger.info(f"Bulk embedding complete. {remaining} messages remaining without vectors.")
-        
-    except Exception as e:
-        logger.error(f"Error during bulk embedding: {e}")
-        raise
-    finally:
-        db.close()
+    """Embed every message that has no vector yet"""
+    parser = argparse.ArgumentParser(description="Create embeddings for messages without a vector_id")
+    parser.add_argument("--batch-size", type=int, default=100, help="Messages per embeddings request and index upsert")
+    parser.add_argument("--workers", type=int, default=4, help="Batches processed concurrently")
+    parser.add_argument("--rpm", type=float, default=3000, help="Embedding requests per minute allowed by the OpenAI account")
+    parser.add_argument("--tpm", type=float, default=1_000_000, help="Embedding tokens per minute allowed by the OpenAI account")
+    parser.add_argument("--checkpoint", default="bulk_embed_missing.checkpoint.json", help="File recording progress so the run can be resumed")
+    parser.add_argument("--resume", action="store_true", help="Continue after the message id stored in the checkpoint")
+    args = parser.parse_args()
+
+    embedder = BulkEmbedder(
+        mode=MISSING,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        checkpoint_path=args.checkpoint,
+        resume=args.resume
+    )
+    stats = asyncio.run(embedder.run())
+    print(stats.report())
+    if stats.failed_ids:
+        print(f"Failed message ids are listed in {args.checkpoint}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
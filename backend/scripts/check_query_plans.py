@@ -0,0 +1,197 @@
+"""Query plan regression check for the read queries in app/crud.
+
+Runs each CRUD read function against the configured database, captures every SELECT
+it issues and EXPLAINs it. Exits non-zero when a plan falls back to a sequential
+scan of a large table, so a dropped index or a query rewritten past its index
+shows up before it reaches production.
+
+The planner only prefers indexes once tables are big enough, so run it against a
+seeded database:
+
+    python scripts/seed_data.py --large
+    python scripts/check_query_plans.py
+
+The same cases run under pytest as tests/test_query_plans.py (marker `postgres`),
+which is skipped unless DB_URL points at Postgres.
+"""
+import sys
+import argparse
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Set
+
+# Add the parent directory to the Python path so we can import our app modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import event, func, text
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import engine, SessionLocal
+from app.crud import users, channels, messages, reactions, ai
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PlanCase:
+    name: str
+    run: Callable[[Session, Dict], object]
+    # Tables this query may scan sequentially, e.g. unordered LIMIT reads that stop early
+    allow_seq_scan: Set[str] = field(default_factory=set)
+
+CASES = [
+    PlanCase("users.get_user", lambda db, s: users.get_user(db, s["user_id"])),
+    PlanCase("users.get_user_by_email", lambda db, s: users.get_user_by_email(db, s["email"])),
+    PlanCase("users.get_user_by_auth0_id", lambda db, s: users.get_user_by_auth0_id(db, s["auth0_id"])),
+    PlanCase("users.get_users", lambda db, s: users.get_users(db), allow_seq_scan={"users"}),
+    PlanCase("users.get_users_by_last_dm", lambda db, s: users.get_users_by_last_dm(db, s["user_id"]),
+             allow_seq_scan={"users"}),
+    PlanCase("channels.get_channel", lambda db, s: channels.get_channel(db, s["channel_id"])),
+    PlanCase("channels.get_user_channels", lambda db, s: channels.get_user_channels(db, s["user_id"])),
+    PlanCase("channels.get_channel_members", lambda db, s: channels.get_channel_members(db, s["channel_id"])),
+    PlanCase("channels.get_available_channels", lambda db, s: channels.get_available_channels(db, s["user_id"])),
+    PlanCase("channels.user_in_channel", lambda db, s: channels.user_in_channel(db, s["user_id"], s["channel_id"])),
+    PlanCase("channels.get_user_dms", lambda db, s: channels.get_user_dms(db, s["user_id"])),
+    PlanCase("channels.get_existing_dm_channel",
+             lambda db, s: channels.get_existing_dm_channel(db, s["dm_user_ids"][0], s["dm_user_ids"][1])),
+    PlanCase("channels.get_common_channels",
+             lambda db, s: channels.get_common_channels(db, s["dm_user_ids"][0], s["dm_user_ids"][1])),
+    PlanCase("messages.get_channel_messages", lambda db, s: messages.get_channel_messages(db, s["channel_id"])),
+    PlanCase("messages.get_channel_messages (cursor)",
+             lambda db, s: messages.get_channel_messages(db, s["channel_id"], before=s["cursor"], include_total=False)),
+    PlanCase("messages.get_channel_messages (with replies)",
+             lambda db, s: messages.get_channel_messages(db, s["channel_id"], parent_only=False,
+                                                         include_reactions=True, include_total=False)),
+    PlanCase("messages.get_channel_messages (reaction summary)",
+             lambda db, s: messages.get_channel_messages(db, s["channel_id"], reaction_summary=True,
+                                                         current_user_id=s["user_id"], include_total=False)),
+    PlanCase("messages.count_channel_messages",
+             lambda db, s: messages.count_channel_messages(db, s["channel_id"], parent_only=False)),
+    PlanCase("messages.get_message", lambda db, s: messages.get_message(db, s["message_id"])),
+    PlanCase("messages.get_message_reply_chain", lambda db, s: messages.get_message_reply_chain(db, s["message_id"])),
+    PlanCase("messages.get_thread_root", lambda db, s: messages.get_thread_root(db, s["message_id"])),
+    PlanCase("messages.find_last_reply_in_chain", lambda db, s: messages.find_last_reply_in_chain(db, s["message_id"])),
+    PlanCase("reactions.get_all_reactions", lambda db, s: reactions.get_all_reactions(db)),
+    PlanCase("ai.get_conversation", lambda db, s: ai.get_conversation(db, s["conversation_id"], s["conversation_user_id"])),
+    PlanCase("ai.get_channel_conversations",
+             lambda db, s: ai.get_channel_conversations(db, s["conversation_channel_id"], s["conversation_user_id"])),
+    PlanCase("ai.get_chat_history", lambda db, s: ai.get_chat_history(db, s["conversation_id"])),
+]
+
+def load_samples(db: Session) -> Dict:
+    """Pick representative ids: the busiest channel, one of its members, a reply thread and so on"""
+    channel_id = (db.query(models.Message.channel_id)
+                  .group_by(models.Message.channel_id)
+                  .order_by(func.count().desc())
+                  .limit(1).scalar())
+    if channel_id is None:
+        raise SystemExit("No messages found; seed the database first (scripts/seed_data.py --large)")
+    user = (db.query(models.User)
+            .join(models.UserChannel, models.UserChannel.user_id == models.User.id)
+            .filter(models.UserChannel.channel_id == channel_id)
+            .first())
+    reply = db.query(models.Message).filter(models.Message.parent_id.isnot(None)).first()
+    dm_members = (db.query(models.UserChannel.user_id)
+                  .join(models.Channel, models.Channel.id == models.UserChannel.channel_id)
+                  .filter(models.Channel.is_dm == True)
+                  .order_by(models.UserChannel.channel_id)
+                  .limit(2).all())
+    conversation = db.query(models.AIConversation).first()
+    page = messages.get_channel_messages(db, channel_id, include_total=False)
+    return {
+        "channel_id": channel_id,
+        "user_id": user.id,
+        "email": user.email,
+        "auth0_id": user.auth0_id,
+        "message_id": reply.parent_id if reply else page.messages[0].id,
+        "cursor": page.next_cursor,
+        "dm_user_ids": [row[0] for row in dm_members] if len(dm_members) == 2 else [user.id, user.id],
+        "conversation_id": conversation.id if conversation else 0,
+        "conversation_user_id": conversation.user_id if conversation else user.id,
+        "conversation_channel_id": conversation.channel_id if conversation else channel_id,
+    }
+
+def large_tables(db: Session, min_rows: int) -> Dict[str, int]:
+    """Tables whose planner row estimate is at least min_rows"""
+    rows = db.execute(text(
+        "SELECT relname, reltuples::bigint FROM pg_class "
+        "WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace AND reltuples >= :min_rows"
+    ), {"min_rows": min_rows})
+    return {name: count for name, count in rows}
+
+def seq_scans(plan: Dict) -> List[str]:
+    """Relations read by Seq Scan nodes anywhere in an EXPLAIN (FORMAT JSON) plan"""
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+def capture_selects(db: Session, case: PlanCase, samples: Dict) -> List[tuple]:
+    """Run a case and return the (statement, parameters) of every SELECT it issued"""
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        case.run(db, samples)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        db.rollback()
+    return captured
+
+def check_case(db: Session, case: PlanCase, samples: Dict, large: Dict[str, int], verbose: bool) -> List[str]:
+    failures = []
+    for statement, parameters in capture_selects(db, case, samples):
+        with engine.connect() as conn:
+            plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        scanned = [table for table in seq_scans(plan[0]["Plan"])
+                   if table in large and table not in case.allow_seq_scan]
+        for table in scanned:
+            failures.append(f"Seq Scan on {table} (~{large[table]} rows) in:\n    {' '.join(statement.split())}")
+        if verbose:
+            print(json.dumps(plan[0]["Plan"], indent=2))
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when a CRUD read query falls back to a sequential scan")
+    parser.add_argument("--min-rows", type=int, default=10000, help="Only flag scans of tables at least this large")
+    parser.add_argument("--case", help="Only run cases whose name contains this string")
+    parser.add_argument("--verbose", action="store_true", help="Print every plan")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        large = large_tables(db, args.min_rows)
+        if not large:
+            raise SystemExit(f"No table has {args.min_rows}+ rows; seed the database first (scripts/seed_data.py --large)")
+        samples = load_samples(db)
+
+        failed = 0
+        for case in CASES:
+            if args.case and args.case not in case.name:
+                continue
+            failures = check_case(db, case, samples, large, args.verbose)
+            print(f"{'FAIL' if failures else 'ok':>4}  {case.name}")
+            for failure in failures:
+                print(f"      {failure}")
+            failed += bool(failures)
+    finally:
+        db.close()
+
+    if failed:
+        print(f"\n{failed} quer{'y' if failed == 1 else 'ies'} scan large tables sequentially")
+        sys.exit(1)
+    print("\nAll query plans use indexes on large tables")
+
+if __name__ == "__main__":
+    main()
@@ -7,16 +7,18 @@ import sys
 # Add the parent directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import argparse
 from faker import Faker
 from datetime import datetime, timedelta
 import random
+from sqlalchemy import insert, text
 from sqlalchemy.orm import Session
 from typing import List, Dict
 import logging
 import uuid
 import string
 
-from app.models import User, Channel, Message, UserChannel, MessageReaction, Reaction
+from app.models import User, Channel, Message, UserChannel, MessageReaction, Reaction, AIConversation, AIMessage
 from app.database import SessionLocal
 
 # Configure logging
@@ -252,11 +254,15 @@ def create_fake_messages(db: Session, channels: List[Channel], users: List[User]
                         updated_at=reply_created_at,
                         user_id=reply_author_id,
                         channel_id=channel.id,
-                        parent_id=message.id
+                        parent_id=message.id,
+                        thread_root_id=message.id,
+                        thread_position=1
                     )
                     
                     db.add(reply)
                     messages.append(reply)
+                    message.reply_count = 1
+                    message.last_reply_at = reply_created_at
             
         # Commit all messages at once
         db.commit()
@@ -359,8 +365,172 @@ def verify_reactions_exist(db: Session) -> bool:
     logger.info(f"Found {len(reactions)} system reactions")
     return True
 
+def bulk_insert(db: Session, model, rows: List[Dict], batch_size: int = 5000) -> None:
+    """Insert plain row dicts in batches, bypassing the ORM unit of work."""
+    for start in range(0, len(rows), batch_size):
+        db.execute(insert(model), rows[start:start + batch_size])
+    db.commit()
+
+def seed_large_dataset(
+    db: Session,
+    user_count: int = 2000,
+    channel_count: int = 500,
+    messages_per_channel: int = 2000,
+    members_per_channel: int = 40,
+    conversations: int = 2000,
+    messages_per_conversation: int = 20
+) -> Dict[str, int]:
+    """
+    Seed a dataset large enough for the query planner to prefer indexes, for
+    query plan checks and load tests. Rows are generated in bulk with Core inserts;
+    replies and reactions are derived from the inserted messages in SQL.
+    
+    Args:
+        db (Session): SQLAlchemy database session
+        user_count (int): Number of users to create
+        channel_count (int): Number of channels to create (20% are DMs)
+        messages_per_channel (int): Top-level messages per channel
+        members_per_channel (int): Members of each non-DM channel
+        conversations (int): Number of AI conversations to create
+        messages_per_conversation (int): Messages in each AI conversation
+        
+    Returns:
+        Dict[str, int]: Row counts per seeded table
+    """
+    logger.info(f"Seeding {user_count} users and {channel_count} channels in bulk...")
+    run_id = uuid.uuid4().hex[:8]
+    sentences = [fake.sentence() for _ in range(1000)]
+    now = datetime.utcnow()
+    
+    bulk_insert(db, User, [{
+        "auth0_id": f"auth0|seed-{run_id}-{i}",
+        "email": f"seed-{run_id}-{i}@example.com",
+        "is_active": True,
+        "name": fake.name(),
+        "created_at": now - timedelta(days=random.randint(0, 365))
+    } for i in range(user_count)])
+    user_ids = [row[0] for row in db.query(User.id).filter(User.auth0_id.like(f"auth0|seed-{run_id}-%"))]
+    
+    channel_rows = []
+    for i in range(channel_count):
+        is_dm = random.random() < 0.2
+        channel_rows.append({
+            "name": f"seed-{run_id}-{'dm' if is_dm else 'channel'}-{i}",
+            "description": None if is_dm else random.choice(sentences),
+            "owner_id": random.choice(user_ids),
+            "is_private": is_dm or random.random() < 0.3,
+            "is_dm": is_dm,
+            "ai_channel": False,
+            "created_at": now - timedelta(days=random.randint(0, 365))
+        })
+    bulk_insert(db, Channel, channel_rows)
+    channels = db.query(Channel.id, Channel.owner_id, Channel.is_dm).filter(Channel.name.like(f"seed-{run_id}-%")).all()
+    
+    logger.info("Adding channel memberships...")
+    memberships = []
+    members_by_channel = {}
+    for channel in channels:
+        size = 2 if channel.is_dm else min(members_per_channel, len(user_ids))
+        members = set(random.sample(user_ids, size - 1)) | {channel.owner_id}
+        members_by_channel[channel.id] = list(members)
+        memberships.extend({"user_id": user_id, "channel_id": channel.id} for user_id in members)
+    bulk_insert(db, UserChannel, memberships)
+    
+    logger.info(f"Creating {channel_count * messages_per_channel} messages...")
+    for channel in channels:
+        members = members_by_channel[channel.id]
+        rows = []
+        for _ in range(messages_per_channel):
+            created_at = now - timedelta(seconds=random.randint(0, 365 * 24 * 3600))
+            rows.append({
+                "content": random.choice(sentences),
+                "created_at": created_at,
+                "updated_at": created_at,
+                "user_id": random.choice(members),
+                "channel_id": channel.id,
+                "from_ai": False
+            })
+        bulk_insert(db, Message, rows)
+    
+    channel_ids = [channel.id for channel in channels]
+    logger.info("Deriving replies and reactions...")
+    # One reply for roughly 20% of top-level messages (parent_id is unique)
+    db.execute(text("""
+        INSERT INTO messages (content, created_at, updated_at, user_id, channel_id, parent_id,
+                              thread_root_id, thread_position, from_ai)
+        SELECT m.content, m.created_at + interval '5 minutes', m.created_at + interval '5 minutes',
+               m.user_id, m.channel_id, m.id, m.id, 1, false
+        FROM messages m
+        WHERE m.channel_id = ANY(:channel_ids) AND m.parent_id IS NULL AND random() < 0.2
+    """), {"channel_ids": channel_ids})
+    db.execute(text("""
+        UPDATE messages
+        SET reply_count = 1, last_reply_at = replies.created_at
+        FROM messages replies
+        WHERE replies.thread_root_id = messages.id AND messages.channel_id = ANY(:channel_ids)
+    """), {"channel_ids": channel_ids})
+    reaction_ids = [row[0] for row in db.query(Reaction.id).filter(Reaction.is_system == True)]
+    if reaction_ids:
+        db.execute(text("""
+            INSERT INTO message_reactions (message_id, reaction_id, user_id, created_at)
+            SELECT m.id, (:reaction_ids)[1 + floor(random() * cardinality(:reaction_ids))::int], m.user_id, m.created_at
+            FROM messages m
+            WHERE m.channel_id = ANY(:channel_ids) AND random() < 0.4
+            ON CONFLICT DO NOTHING
+        """), {"channel_ids": channel_ids, "reaction_ids": reaction_ids})
+    db.commit()
+    
+    logger.info(f"Creating {conversations} AI conversations...")
+    bulk_insert(db, AIConversation, [{
+        "channel_id": channel_id,
+        "user_id": random.choice(members_by_channel[channel_id])
+    } for channel_id in random.choices(channel_ids, k=conversations)])
+    conversation_rows = (db.query(AIConversation.id, AIConversation.channel_id, AIConversation.user_id)
+                         .filter(AIConversation.channel_id.in_(channel_ids)).all())
+    ai_messages = []
+    for conversation in conversation_rows:
+        for i in range(messages_per_conversation):
+            ai_messages.append({
+                "conversation_id": conversation.id,
+                "channel_id": conversation.channel_id,
+                "user_id": conversation.user_id,
+                "role": "user" if i % 2 == 0 else "ai",
+                "message": random.choice(sentences),
+                "created_at": now - timedelta(minutes=messages_per_conversation - i)
+            })
+    bulk_insert(db, AIMessage, ai_messages)
+    
+    db.execute(text("ANALYZE"))
+    db.commit()
+    
+    counts = {
+        "users": len(user_ids),
+        "channels": len(channels),
+        "memberships": len(memberships),
+        "messages": db.query(Message.id).filter(Message.channel_id.in_(channel_ids)).count(),
+        "ai_messages": len(ai_messages)
+    }
+    logger.info(f"Seeded {counts}")
+    return counts
+
 def main():
     """Main function to orchestrate the data seeding process."""
+    parser = argparse.ArgumentParser(description="Populate the database with test data")
+    parser.add_argument("--large", action="store_true", help="Seed a large dataset in bulk (for query plan checks and load tests)")
+    parser.add_argument("--users", type=int, default=2000, help="Users to create with --large")
+    parser.add_argument("--channels", type=int, default=500, help="Channels to create with --large")
+    parser.add_argument("--messages-per-channel", type=int, default=2000, help="Top-level messages per channel with --large")
+    args = parser.parse_args()
+    
+    if args.large:
+        db = SessionLocal()
+        try:
+            seed_large_dataset(db, user_count=args.users, channel_count=args.channels,
+                               messages_per_channel=args.messages_per_channel)
+        finally:
+            db.close()
+        return
+    
     logger.info("Starting data seeding process...")
     logger.info("Step 1/6: Initializing database connection")
     db = SessionLocal()
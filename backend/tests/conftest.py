@@ -0,0 +1,66 @@
+import os
+
+# The app modules read these at import time
+os.environ.setdefault("DB_URL", "sqlite://")
+os.environ.setdefault("ASYNC_DB_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("AUTH0_DOMAIN", "test")
+os.environ.setdefault("AUTH0_API_IDENTIFIER", "test")
+
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+
+@compiles(TSVECTOR, "sqlite")
+def _compile_tsvector_sqlite(type_, compiler, **kw):
+    return "TEXT"
+
+TABLES = ["users", "channels", "messages", "reactions", "message_reactions", "file_uploads", "embedding_outbox"]
+
+def _on_connect(dbapi_connection, connection_record):
+    dbapi_connection.create_function("to_tsvector", 2, lambda config, text: text, deterministic=True)
+    dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+def _create_tables(engine):
+    models.Base.metadata.create_all(engine, tables=[models.Base.metadata.tables[name] for name in TABLES])
+
+@pytest.fixture
+def db():
+    """Session on an in-memory SQLite database that enforces foreign keys like Postgres"""
+    engine = create_engine("sqlite://")
+    event.listen(engine, "connect", _on_connect)
+    _create_tables(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+@pytest.fixture
+def file_db(tmp_path):
+    """Sync session and async session factory sharing one SQLite file, for code that
+    runs on AsyncSessionLocal"""
+    path = tmp_path / "test.db"
+    engine = create_engine(f"sqlite:///{path}")
+    event.listen(engine, "connect", _on_connect)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    event.listen(async_engine.sync_engine, "connect", _on_connect)
+    _create_tables(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session, sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+    finally:
+        session.close()
+        engine.dispose()
+        asyncio.run(async_engine.dispose())
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "postgres: needs a seeded Postgres database in DB_URL")
@@ -0,0 +1,43 @@
+import asyncio
+
+from app import embedding_pipeline as pipeline_module
+from app import models, schemas
+from app.crud.messages import create_message
+from app.embedding_pipeline import EmbeddingPipeline
+
+def test_poison_row_does_not_fail_its_batch(file_db, monkeypatch):
+    db, async_session_local = file_db
+    monkeypatch.setattr(pipeline_module, "AsyncSessionLocal", async_session_local)
+    user = models.User(auth0_id="auth0|1", email="a@example.com", name="A")
+    channel = models.Channel(name="general")
+    db.add_all([user, channel])
+    db.commit()
+    contents = ["good 1", "POISON", "good 2", "good 3"]
+    messages = [create_message(db, channel.id, user.id, schemas.MessageCreate(content=content)) for content in contents]
+    poison_id = messages[1].id
+
+    async def embed_many(texts):
+        if any("POISON" in text for text in texts):
+            raise ValueError("input too long")
+        return [[0.0] for _ in texts]
+
+    upserted = []
+    async def upsert(vectors):
+        upserted.extend(vector_id for vector_id, _, _ in vectors)
+
+    monkeypatch.setattr(pipeline_module.ai_client, "embed_many", embed_many)
+    monkeypatch.setattr(pipeline_module.vector_store, "upsert", upsert)
+
+    completed = asyncio.run(EmbeddingPipeline()._drain_once())
+
+    assert completed == 3
+    assert len(upserted) == 3
+    db.expire_all()
+    # next_attempt_at is only meaningful on Postgres, so leave it out of the query
+    Outbox = models.EmbeddingOutbox
+    (row,) = db.query(Outbox.message_id, Outbox.attempts, Outbox.last_error).all()
+    assert row.message_id == poison_id
+    assert row.attempts == 1
+    assert "input too long" in row.last_error
+    for message in messages:
+        assert (message.vector_id is None) == (message.id == poison_id)
@@ -0,0 +1,42 @@
+from app import models, schemas
+from app.crud.messages import create_message, create_reply, delete_message
+
+def _thread(db):
+    user = models.User(auth0_id="auth0|1", email="a@example.com", name="A")
+    channel = models.Channel(name="general")
+    db.add_all([user, channel])
+    db.commit()
+    root = create_message(db, channel.id, user.id, schemas.MessageCreate(content="root"))
+    replies = [create_reply(db, root.id, user.id, schemas.MessageReplyCreate(content=f"reply {i}"))[0] for i in range(3)]
+    return root, replies
+
+def test_delete_thread_root_with_replies(db):
+    root, replies = _thread(db)
+    root_id = root.id
+    first, second, third = [reply.id for reply in replies]
+
+    delete_message(db, root_id)
+
+    assert db.query(models.Message).get(root_id) is None
+    new_root = db.query(models.Message).get(first)
+    assert new_root.parent_id is None
+    assert new_root.thread_root_id is None
+    assert new_root.thread_position is None
+    assert new_root.reply_count == 2
+    assert new_root.last_reply_at is not None
+    chain = [db.query(models.Message).get(message_id) for message_id in (second, third)]
+    assert [(m.thread_root_id, m.thread_position) for m in chain] == [(first, 1), (first, 2)]
+    assert [m.parent_id for m in chain] == [first, second]
+
+def test_delete_thread_root_with_single_reply(db):
+    root, replies = _thread(db)
+    delete_message(db, replies[2].id)
+    delete_message(db, replies[1].id)
+
+    delete_message(db, root.id)
+
+    remaining = db.query(models.Message).get(replies[0].id)
+    assert remaining.parent_id is None
+    assert remaining.thread_root_id is None
+    assert remaining.reply_count == 0
+    assert remaining.last_reply_at is None
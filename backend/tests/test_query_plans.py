@@ -0,0 +1,39 @@
+"""Query plan regressions for the read queries in app/crud.
+
+Runs the cases from scripts/check_query_plans.py and fails when a plan scans a large
+table sequentially. Needs DB_URL pointing at a seeded Postgres database
+(scripts/seed_data.py --large); it is skipped everywhere else:
+
+    DB_URL=postgresql://... python -m pytest -q -m postgres tests
+"""
+import os
+
+import pytest
+
+from app.database import engine, SessionLocal
+from scripts.check_query_plans import CASES, check_case, large_tables, load_samples
+
+# Only scans of tables at least this large count as regressions
+PLAN_CHECK_MIN_ROWS = int(os.getenv("PLAN_CHECK_MIN_ROWS", "10000"))
+
+pytestmark = [
+    pytest.mark.postgres,
+    pytest.mark.skipif(engine.dialect.name != "postgresql", reason="query plans are only checked on Postgres"),
+]
+
+@pytest.fixture(scope="module")
+def plan_context():
+    db = SessionLocal()
+    try:
+        large = large_tables(db, PLAN_CHECK_MIN_ROWS)
+        if not large:
+            pytest.skip(f"No table has {PLAN_CHECK_MIN_ROWS}+ rows; seed the database first")
+        yield db, load_samples(db), large
+    finally:
+        db.close()
+
+@pytest.mark.parametrize("case", CASES, ids=[case.name for case in CASES])
+def test_query_plan_avoids_sequential_scans(plan_context, case):
+    db, samples, large = plan_context
+    failures = check_case(db, case, samples, large, verbose=False)
+    assert not failures, "\n".join(failures)
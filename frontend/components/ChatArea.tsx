@@ -1,5 +1,6 @@
 import { useState, useEffect, useRef, useCallback } from 'react';
 import { PaperAirplaneIcon, ArrowUturnLeftIcon } from '@heroicons/react/24/outline';
+import Image from 'next/image';
 import ChannelHeader from './ChannelHeader';
 import ChatMessage from './ChatMessage';
 import MemberListModal from './MemberListModal';
@@ -7,10 +8,11 @@ import AISidebar from './AISidebar';
 import { useConnection } from '../contexts/ConnectionContext';
 import { useApi } from '@/hooks/useApi';
 import type { Channel, ChannelRole } from '../types/channel';
-import type { Message } from '../types/message';
+import type { Message, StreamingMessage } from '../types/message';
 import { FileUploadButton } from './file/FileUploadButton';
 import { FilePreview } from './file/FilePreview';
 import { FileUploadProgress } from './file/FileUploadProgress';
+import { updateReactionSummary } from '../utils/reactions';
 
 interface ChatAreaProps {
   channelId: number | null;
@@ -22,12 +24,13 @@ interface ChatAreaProps {
 export default function ChatArea({ channelId, onChannelUpdate, onChannelDelete, onNavigateToDM }: ChatAreaProps) {
   const api = useApi();
   const [messages, setMessages] = useState<Message[]>([]);
+  const [streamingMessages, setStreamingMessages] = useState<StreamingMessage[]>([]);
   const [newMessage, setNewMessage] = useState('');
   const [channel, setChannel] = useState<Channel | null>(null);
   const [currentUserId, setCurrentUserId] = useState<number | null>(null);
   const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [hasMore, setHasMore] = useState(true);
-  const [skip, setSkip] = useState(0);
+  const [cursor, setCursor] = useState<string | null>(null);
   const [showMembers, setShowMembers] = useState(false);
   const [isInitialLoad, setIsInitialLoad] = useState(true);
   const messagesEndRef = useRef<HTMLDivElement>(null);
@@ -54,12 +57,13 @@ export default function ChatArea({ channelId, onChannelUpdate, onChannelDelete,
     }
   }, [channelId, api]);
 
-  const fetchMessages = useCallback(async (skipCount: number, isInitial: boolean) => {
+  const fetchMessages = useCallback(async (before: string | null, isInitial: boolean) => {
     if (!channelId) return;
     try {
       setIsLoadingMore(true);
       const response = await api.get(`/messages/${channelId}/messages`, {
-        params: { skip: skipCount, limit: 50 },
+        // Reaction counts come from one grouped query instead of every reaction row with its user
+        params: { limit: 50, include_total: false, reaction_summary: true, ...(before ? { before } : {}) },
         signal: abortControllerRef.current?.signal
       });
       const newMessages = response.data.messages;
@@ -69,8 +73,8 @@ export default function ChatArea({ channelId, onChannelUpdate, onChannelDelete,
           new Date(a.created_at).getTime() - new Date(b.created_at).getTime()
         );
       });
-      setHasMore(newMessages.length === 50);
-      setSkip(skipCount + newMessages.length);
+      setHasMore(response.data.has_more);
+      setCursor(response.data.next_cursor ?? null);
     } catch (error: unknown) {
       if (error && typeof error === 'object' && 'name' in error && error.name !== 'AbortError') {
         console.error('Failed to fetch messages:', error);
@@ -82,8 +86,8 @@ export default function ChatArea({ channelId, onChannelUpdate, onChannelDelete,
 
   const loadMoreMessages = useCallback(async () => {
     if (!hasMore || isLoadingMore) return;
-    await fetchMessages(skip, false);
-  }, [hasMore, isLoadingMore, fetchMessages, skip]);
+    await fetchMessages(cursor, false);
+  }, [hasMore, isLoadingMore, fetchMessages, cursor]);
 
   useEffect(() => {
     // Cleanup function to abort any pending requests when unmounting
@@ -105,7 +109,8 @@ export default function ChatArea({ channelId, onChannelUpdate, onChannelDelete,
     if (channelId) {
       // Reset state for new channel
       setMessages([]);
-      setSkip(0);
+      setStreamingMessages([]);
+      setCursor(null);
       setHasMore(true);
       setChannel(null);
       setIsInitialLoad(true);
@@ -114,7 +119,7 @@ export default function ChatArea({ channelId, onChannelUpdate, onChannelDelete,
       // Create new abort controller for this channel's requests
       abortControllerRef.current = new AbortController();
       
-      fetchMessages(0, true);
+      fetchMessages(null, true);
       fetchChannelDetails();
 
       // Set up WebSocket message listener
@@ -126,6 +131,10 @@ export default function ChatArea({ channelId, onChannelUpdate, onChannelDelete,
           switch (data.type) {
             case 'new_message':
               console.log('Processing new message:', data.message);
+              // A saved AI reply replaces the partial text it was streamed as
+              if (data.stream_id) {
+                setStreamingMessages(prev => prev.filter(m => m.stream_id !== data.stream_id));
+              }
               setMessages(prev => {
                 // Check if message already exists to prevent duplicates
                 if (prev.some(m => m.id === data.message.id)) {
@@ -152,12 +161,28 @@ export default function ChatArea({ channelId, onChannelUpdate, onChannelDelete,
                 return newMessages;
               });
               break;
+            case 'ai_message_delta':
+              setStreamingMessages(prev => {
+                if (!prev.some(m => m.stream_id === data.stream_id)) {
+                  return [...prev, { stream_id: data.stream_id, user_id: data.user_id, content: data.delta }];
+                }
+                return prev.map(m =>
+                  m.stream_id === data.stream_id
+                    ? { ...m, content: m.content + data.delta }
+                    : m
+                );
+              });
+              break;
+            case 'ai_message_cancelled':
+              setStreamingMessages(prev => prev.filter(m => m.stream_id !== data.stream_id));
+              break;
             case 'message_update':
               setMessages(prev => prev.map(msg => 
                 msg.id === data.message.id 
                   ? {
                       ...data.message,
-                      reactions: msg.reactions // Preserve existing reactions
+                      reactions: msg.reactions, // Preserve existing reactions
+                      reaction_summary: msg.reaction_summary
                     }
                   : msg
               ));
@@ -167,7 +192,18 @@ export default function ChatArea({ channelId, onChannelUpdate, onChannelDelete,
               break;
             case 'message_reaction_add':
               setMessages(prev => prev.map(msg =>
-                msg.id === data.message_id
+                msg.id === data.message_id && msg.reaction_summary
+                  ? {
+                      ...msg,
+                      reaction_summary: updateReactionSummary(
+                        msg.reaction_summary,
+                        data.reaction.reaction_id,
+                        data.reaction.reaction?.code || data.reaction.code || 'unknown',
+                        true,
+                        data.reaction.user_id === currentUserId
+                      )
+                    }
+                  : msg.id === data.message_id
                   ? {
                       ...msg,
                       reactions: [...(msg.reactions || []), {
@@ -185,7 +221,14 @@ export default function ChatArea({ channelId, onChannelUpdate, onChannelDelete,
               break;
             case 'message_reaction_remove':
               setMessages(prev => prev.map(msg =>
-                msg.id === data.message_id
+                msg.id === data.message_id && msg.reaction_summary
+                  ? {
+                      ...msg,
+                      reaction_summary: updateReactionSummary(
+                        msg.reaction_summary, data.reaction_id, null, false, data.user_id === currentUserId
+                      )
+                    }
+                  : msg.id === data.message_id
                   ? {
                       ...msg,
                       reactions: (msg.reactions || []).filter(r => 
@@ -244,7 +287,8 @@ export default function ChatArea({ channelId, onChannelUpdate, onChannelDelete,
     } else {
       setChannel(null);
       setMessages([]);
-      setSkip(0);
+      setStreamingMessages([]);
+      setCursor(null);
       setHasMore(true);
     }
   }, [channelId, addMessageListener, currentUserId, fetchChannelDetails, fetchMessages, onChannelUpdate]);
@@ -286,6 +330,20 @@ export default function ChatArea({ channelId, onChannelUpdate, onChannelDelete,
     }
   }, [messages, channel, isInitialLoad, isUserSentMessage]);
 
+  useEffect(() => {
+    const container = messagesContainerRef.current;
+    if (!container || streamingMessages.length === 0) return;
+
+    // Follow a streaming reply as it grows unless the user has scrolled up to read history
+    if (container.scrollHeight - container.scrollTop - container.clientHeight < 100) {
+      requestAnimationFrame(() => {
+        if (container) {
+          container.scrollTop = container.scrollHeight;
+        }
+      });
+    }
+  }, [streamingMessages]);
+
   useEffect(() => {
     const container = messagesContainerRef.current;
     if (!container) return;
@@ -475,6 +533,38 @@ export default function ChatArea({ channelId, onChannelUpdate, onChannelDelete,
               onReply={setReplyingTo}
             />
           ))}
+          {streamingMessages.map((streamingMessage) => {
+            const author = channel?.users.find(u => u.id === streamingMessage.user_id);
+            return (
+              <div key={streamingMessage.stream_id} className="flex items-start gap-3 px-2 py-1 -mx-2">
+                {author?.picture ? (
+                  <Image
+                    src={author.picture}
+                    alt={author.name}
+                    width={32}
+                    height={32}
+                    className="flex-none rounded-full object-cover"
+                  />
+                ) : (
+                  <div className="flex-none w-8 h-8 rounded-full bg-gray-300 flex items-center justify-center text-white font-medium text-sm">
+                    {(author?.name?.[0] || '?').toUpperCase()}
+                  </div>
+                )}
+                <div className="min-w-0 flex-1">
+                  <div className="flex items-baseline gap-2">
+                    <span className="font-medium truncate">
+                      {author?.name || 'Unknown User'}
+                    </span>
+                    <span className="px-1.5 py-0.5 text-xs font-medium bg-purple-100 text-purple-800 rounded-full">
+                      AI
+                    </span>
+                    <span className="text-xs text-gray-500 flex-none italic">typing...</span>
+                  </div>
+                  <p className="text-gray-800 break-words">{streamingMessage.content}</p>
+                </div>
+              </div>
+            );
+          })}
           <div ref={messagesEndRef} />
         </div>
         <div className="flex-none border-t border-gray-200 p-4 bg-white">
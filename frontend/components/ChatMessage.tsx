@@ -5,6 +5,8 @@ import { useApi } from '@/hooks/useApi';
 import UserProfilePopout from './UserProfilePopout';
 import EmojiSelector from './EmojiSelector';
 import { MessageAttachment } from './file/MessageAttachment';
+import type { ReactionSummary } from '../types/message';
+import { updateReactionSummary } from '../utils/reactions';
 
 interface User {
   id: number;
@@ -43,6 +45,7 @@ interface Message {
   from_ai?: boolean;
   user?: User;
   reactions?: Reaction[];
+  reaction_summary?: ReactionSummary[] | null;
   files?: Array<{
     id: number;
     message_id: number;
@@ -110,7 +113,10 @@ export default function ChatMessage({ message, currentUserId, channelId, onMessa
     try {
       await api.post(`/reactions/${message.id}`, { reaction_id: reactionId });
       
-      const updatedMessage = {
+      const updatedMessage = message.reaction_summary ? {
+        ...message,
+        reaction_summary: updateReactionSummary(message.reaction_summary, reactionId, null, true, true)
+      } : {
         ...message,
         reactions: [
           ...(message.reactions || []),
@@ -146,7 +152,10 @@ export default function ChatMessage({ message, currentUserId, channelId, onMessa
     try {
       await api.delete(`/reactions/${message.id}/${reactionId}`);
       
-      const updatedMessage = {
+      const updatedMessage = message.reaction_summary ? {
+        ...message,
+        reaction_summary: updateReactionSummary(message.reaction_summary, reactionId, null, false, true)
+      } : {
         ...message,
         reactions: (message.reactions || []).filter(r => 
           // Keep reactions that either have a different reaction_id OR are from a different user
@@ -189,6 +198,19 @@ export default function ChatMessage({ message, currentUserId, channelId, onMessa
 
   // Group reactions by type
   const groupedReactions = useMemo(() => {
+    type ReactionGroup = { code: string; count: number; users: Array<{ id: number; name: string }>; hasReacted: boolean };
+    // History pages carry counts only, so there are no reacting users to list
+    if (message.reaction_summary) {
+      return message.reaction_summary.reduce((acc, summary) => {
+        acc[summary.reaction_id] = {
+          code: summary.code,
+          count: summary.count,
+          users: [],
+          hasReacted: summary.reacted_by_me
+        };
+        return acc;
+      }, {} as Record<number, ReactionGroup>);
+    }
     return (message.reactions || []).reduce((acc, reaction) => {
       const key = reaction.reaction_id;
       if (!acc[key]) {
@@ -205,8 +227,8 @@ export default function ChatMessage({ message, currentUserId, channelId, onMessa
         acc[key].hasReacted = true;
       }
       return acc;
-    }, {} as Record<number, { code: string; count: number; users: Array<{ id: number; name: string }>; hasReacted: boolean }>);
-  }, [message.reactions, currentUserId]);
+    }, {} as Record<number, ReactionGroup>);
+  }, [message.reactions, message.reaction_summary, currentUserId]);
 
   const handleEdit = async () => {
     try {
@@ -16,6 +16,15 @@ export interface MessageReaction {
   user: User;
 }
 
+// Per-reaction counts returned instead of `reactions` when history is loaded with reaction_summary=true
+export interface ReactionSummary {
+  reaction_id: number;
+  code: string;
+  image_url: string | null;
+  count: number;
+  reacted_by_me: boolean;
+}
+
 export interface MessageFile {
   id: number;
   message_id: number;
@@ -39,5 +48,13 @@ export interface Message {
   from_ai?: boolean;
   user?: User;
   reactions?: MessageReaction[];
+  reaction_summary?: ReactionSummary[] | null;
   files?: MessageFile[];
-} 
\ No newline at end of file
+} 
+
+// An AI reply that is still being generated, built up from ai_message_delta events
+export interface StreamingMessage {
+  stream_id: string;
+  user_id: number;
+  content: string;
+}
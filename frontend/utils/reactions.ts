@@ -0,0 +1,35 @@
+import type { ReactionSummary } from '../types/message';
+
+// Apply one user's reaction add or remove to a message's reaction summary. The current
+// user's own changes are applied optimistically and then echoed back over the WebSocket,
+// so an echo that is already reflected in `reacted_by_me` is not counted again. `code` is
+// null when the caller only knows the reaction id.
+export function updateReactionSummary(
+  summary: ReactionSummary[],
+  reactionId: number,
+  code: string | null,
+  added: boolean,
+  isCurrentUser: boolean
+): ReactionSummary[] {
+  const existing = summary.find(s => s.reaction_id === reactionId);
+  if (!existing) {
+    return added
+      ? [...summary, { reaction_id: reactionId, code: code ?? '', image_url: null, count: 1, reacted_by_me: isCurrentUser }]
+      : summary;
+  }
+  if (isCurrentUser && existing.reacted_by_me === added) {
+    // Already applied; an echoed add still brings the real code for an optimistic entry
+    return added && code
+      ? summary.map(s => s.reaction_id === reactionId ? { ...s, code } : s)
+      : summary;
+  }
+  return summary
+    .map(s => s.reaction_id === reactionId
+      ? {
+          ...s,
+          count: s.count + (added ? 1 : -1),
+          reacted_by_me: isCurrentUser ? added : s.reacted_by_me
+        }
+      : s)
+    .filter(s => s.count > 0);
+}